@@ -0,0 +1,217 @@
+"""Admission control: per route class concurrency limits with bounded, timed queues."""
+import asyncio
+import math
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from starlette.responses import JSONResponse
+from app.core import metrics
+from app.core.config import get_settings
+
+settings = get_settings()
+
+PUBLIC = "public"
+DEFAULT = "default"
+BULK = "bulk"
+UPLOAD = "upload"
+PDF = "pdf"
+
+# Order in which freed capacity is handed to waiters
+ROUTE_CLASSES = (PUBLIC, DEFAULT, BULK, UPLOAD, PDF)
+
+_PDF_PATH = re.compile(r"^/api/(admin/)?files/download/\d+/pdf$")
+_BULK_PATHS = {"/api/files", "/api/admin/files", "/api/admin/folders/", "/api/search"}
+_PUBLIC_PATH = re.compile(r"^/($|files/|api/files/|api/folders/|api/suggest$|sitemap(-\d+)?\.xml$|feed\.atom$)")
+
+
+def classify(method: str, path: str) -> str:
+    """Route class of a request, decided from the method and path alone (before routing)."""
+    if _PDF_PATH.match(path):
+        return PDF
+    if method == "POST" and path.endswith("/upload"):
+        return UPLOAD
+    if method in ("GET", "HEAD"):
+        if path in _BULK_PATHS:
+            return BULK
+        if _PUBLIC_PATH.match(path):
+            return PUBLIC
+    return DEFAULT
+
+
+class Rejected(Exception):
+    """Raised when a request is shed; `reason` is "queue_full" or "timeout"."""
+    def __init__(self, reason: str):
+        self.reason = reason
+
+
+@dataclass
+class ClassState:
+    limit: int
+    queue_size: int
+    active: int = 0
+    admitted: int = 0
+    rejected_queue_full: int = 0
+    rejected_timeout: int = 0
+    waiters: deque = field(default_factory=deque)
+
+
+class AdmissionController:
+    """
+    Admits a request when its class is below its own limit and the worker
+    as a whole is below `capacity`. Only public reads may use the last
+    `public_reserved` slots, so expensive classes can never starve page views.
+    Requests that cannot start wait in a per-class FIFO of `queue_size` for
+    up to `queue_timeout` seconds; a full queue or an expired wait is shed.
+    Runs on a single event loop, so no locking is needed.
+    """
+    
+    def __init__(self, capacity: int, public_reserved: int, limits: dict[str, int],
+                 queue_size: int, queue_timeout: float):
+        self.capacity = capacity
+        self.public_reserved = min(public_reserved, capacity)
+        self.queue_timeout = queue_timeout
+        self.classes = {
+            name: ClassState(limit=min(limits.get(name, capacity), capacity), queue_size=queue_size)
+            for name in ROUTE_CLASSES
+        }
+        self.active = 0
+    
+    def _can_start(self, name: str) -> bool:
+        ceiling = self.capacity if name == PUBLIC else self.capacity - self.public_reserved
+        return self.classes[name].active < self.classes[name].limit and self.active < ceiling
+    
+    def _start(self, name: str) -> None:
+        state = self.classes[name]
+        state.active += 1
+        state.admitted += 1
+        self.active += 1
+    
+    async def acquire(self, name: str) -> None:
+        """Wait for a slot of class `name`; raises Rejected when shed."""
+        state = self.classes[name]
+        if not state.waiters and self._can_start(name):
+            self._start(name)
+            return
+        if len(state.waiters) >= state.queue_size:
+            state.rejected_queue_full += 1
+            raise Rejected("queue_full")
+        
+        waiter = asyncio.get_running_loop().create_future()
+        state.waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._abandon(name, waiter)
+            raise
+        if not waiter.done():
+            self._abandon(name, waiter)
+            state.rejected_timeout += 1
+            raise Rejected("timeout")
+    
+    def _abandon(self, name: str, waiter: asyncio.Future) -> None:
+        if waiter.done():
+            # Granted while we were giving up; hand the slot back
+            self.release(name)
+        else:
+            self.classes[name].waiters.remove(waiter)
+            waiter.cancel()
+    
+    def release(self, name: str) -> None:
+        self.classes[name].active -= 1
+        self.active -= 1
+        for other in ROUTE_CLASSES:
+            waiters = self.classes[other].waiters
+            while waiters and self._can_start(other):
+                self._start(other)
+                waiters.popleft().set_result(None)
+    
+    def snapshot(self) -> dict:
+        """Live in-flight and queued counts per class."""
+        return {
+            "capacity": self.capacity,
+            "public_reserved": self.public_reserved,
+            "active": self.active,
+            "queue_timeout": self.queue_timeout,
+            "classes": {
+                name: {
+                    "limit": state.limit,
+                    "active": state.active,
+                    "queued": len(state.waiters),
+                    "queue_size": state.queue_size,
+                    "admitted": state.admitted,
+                    "rejected_queue_full": state.rejected_queue_full,
+                    "rejected_timeout": state.rejected_timeout,
+                }
+                for name, state in self.classes.items()
+            },
+        }
+
+
+class AdmissionMiddleware:
+    """
+    Pure ASGI middleware putting every HTTP request through the controller.
+    The slot is held until the response body has been sent, so streamed
+    downloads count for their whole duration. Shed requests get 503 with
+    Retry-After. Paths starting with one of `exempt` bypass admission.
+    """
+    
+    def __init__(self, app, controller: AdmissionController, retry_after: float, exempt: tuple[str, ...] = ()):
+        self.app = app
+        self.controller = controller
+        self.retry_after = retry_after
+        self.exempt = exempt
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt):
+            await self.app(scope, receive, send)
+            return
+        
+        name = classify(scope["method"], scope["path"])
+        try:
+            await self.controller.acquire(name)
+        except Rejected:
+            response = JSONResponse(
+                {"detail": "Server busy, try again later"},
+                status_code=503,
+                headers={"Retry-After": str(math.ceil(self.retry_after))},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name)
+
+
+admission_controller = AdmissionController(
+    capacity=settings.ADMISSION_CAPACITY,
+    public_reserved=settings.ADMISSION_PUBLIC_RESERVED,
+    limits={
+        PDF: settings.ADMISSION_PDF_LIMIT,
+        BULK: settings.ADMISSION_BULK_LIMIT,
+        UPLOAD: settings.ADMISSION_UPLOAD_LIMIT,
+        DEFAULT: settings.ADMISSION_DEFAULT_LIMIT,
+    },
+    queue_size=settings.ADMISSION_QUEUE_SIZE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+)
+
+
+
+def _rejected_samples():
+    for name, state in admission_controller.classes.items():
+        yield (name, "queue_full"), state.rejected_queue_full
+        yield (name, "timeout"), state.rejected_timeout
+
+
+metrics.registry.register(metrics.Collected(
+    "admission_active_requests", "Requests holding an admission slot.", ("route_class",),
+    lambda: [((name,), state.active) for name, state in admission_controller.classes.items()]
+))
+metrics.registry.register(metrics.Collected(
+    "admission_queued_requests", "Requests waiting for an admission slot.", ("route_class",),
+    lambda: [((name,), len(state.waiters)) for name, state in admission_controller.classes.items()]
+))
+metrics.registry.register(metrics.Collected(
+    "admission_rejected_total", "Requests shed with 503.", ("route_class", "reason"), _rejected_samples, kind="counter"
+))
@@ -9,18 +9,86 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_CACHE_TTL: int = 60  # seconds a verified token/user lookup is reused; 0 disables
+    AUTH_CACHE_SIZE: int = 1024
+    PASSWORD_HASH_WORKERS: int = 2  # threads running argon2
+    PASSWORD_HASH_QUEUE: int = 8  # waiting verifications before logins get 503
+    LOGIN_FREE_ATTEMPTS: int = 5  # failures per username before backoff starts
+    LOGIN_FREE_ATTEMPTS_PER_IP: int = 20
+    LOGIN_BACKOFF_BASE: float = 1.0  # seconds, doubled per further failure
+    LOGIN_BACKOFF_MAX: float = 900.0
+    LOGIN_THROTTLE_ENTRIES: int = 10000  # tracked usernames/IPs, least recently seen evicted
     
     # Database
     DATABASE_URL: str
     
+    # Cross-worker cache coherence: writes are logged in change_log and each worker applies the others'
+    CHANGE_LISTENER_ENABLED: bool = True
+    CHANGE_POLL_INTERVAL: float = 1.0  # seconds between change_log polls; bounds how stale a cache may be
+    CHANGE_LOG_RETENTION: int = 3600  # seconds change_log rows are kept
+    CHANGE_NOTIFY_CHANNEL: str = "cms_changes"  # PostgreSQL LISTEN/NOTIFY channel that wakes workers early
+    
+    # Background jobs for derived work (search, tag and section indexing, PDF pre-rendering), stored in the jobs table
+    JOBS_ENABLED: bool = True  # False indexes search, tags and sections inline in the write and skips pre-rendering
+    JOB_WORKERS: int = 2  # threads per process running jobs; 0 leaves them to other processes
+    JOB_POLL_INTERVAL: float = 1.0  # seconds between checks for due jobs queued by other processes
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_RETRY_BASE: float = 5.0  # seconds before the first retry, doubled per further attempt
+    JOB_RETRY_MAX: float = 600.0
+    JOB_LEASE_SECONDS: int = 300  # a running job not finished by then is assumed lost and run again
+    JOB_RETENTION: int = 86400  # seconds finished jobs are kept for the status API
+    
     # Application
     APP_NAME: str = "FastAPI Markdown CMS"
     DEBUG: bool = True
+    SITE_URL: str = ""  # public base URL for sitemap/feed links; defaults to the request's
+    
+    # Observability
+    METRICS_ENABLED: bool = True  # serve /metrics and record request metrics
+    PROFILING_ENABLED: bool = True  # admins may profile a request with X-Profile: 1 or ?_profile=1
+    PROFILE_DIR: str = "profiles"
+    PROFILE_KEEP: int = 100  # newest reports kept
+    LOOP_MONITOR_ENABLED: bool = True  # measure event loop lag and capture stacks of blocking code
+    LOOP_MONITOR_INTERVAL: float = 0.1  # seconds between lag measurements
+    LOOP_STALL_THRESHOLD: float = 0.1  # seconds the loop may be blocked before its stack is captured
+    LOOP_STALLS_KEPT: int = 50  # most recent stalls kept for /api/admin/system/loop
+    
+    # Admission control (per worker process)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_CAPACITY: int = 64  # concurrent requests across all classes
+    ADMISSION_PUBLIC_RESERVED: int = 16  # slots only public page views may use
+    ADMISSION_PDF_LIMIT: int = 2
+    ADMISSION_BULK_LIMIT: int = 8  # list and search endpoints
+    ADMISSION_UPLOAD_LIMIT: int = 4
+    ADMISSION_DEFAULT_LIMIT: int = 32  # admin writes, auth and everything else
+    ADMISSION_QUEUE_SIZE: int = 32  # waiting requests per class before shedding
+    ADMISSION_QUEUE_TIMEOUT: float = 5.0  # seconds a request may wait for a slot
+    ADMISSION_RETRY_AFTER: int = 5  # Retry-After seconds on shed requests
     
     # File uploads
     UPLOAD_DIR: str = "uploads"
     MAX_IMAGE_SIZE: int = 10 * 1024 * 1024  # 10MB
     
+    # Content storage
+    CONTENT_COMPRESSION: str = "none"  # "none", "zlib" or "zstd"
+    CONTENT_COMPRESSION_THRESHOLD: int = 16 * 1024  # bytes
+    CONTENT_INLINE_MAX: int = 256 * 1024  # larger bodies go to the blob store
+    CONTENT_BLOB_BACKEND: str = "filesystem"
+    CONTENT_BLOB_DIR: str = "blobs"
+    
+    # Downloads
+    DOWNLOAD_CACHE_SIZE: int = 32 * 1024 * 1024  # bytes of encoded inline bodies kept in memory
+    PDF_PRERENDER: bool = False  # render each saved file's PDF as a background job (a WeasyPrint run per save)
+    PDF_CACHE_DIR: str = "pdf_cache"  # pre-rendered PDFs, named by file ID and content fingerprint
+    
+    # Listing APIs
+    PAGE_SIZE_DEFAULT: int = 100
+    PAGE_SIZE_MAX: int = 1000
+    
+    # Revision history
+    REVISION_SNAPSHOT_INTERVAL: int = 20  # full copy every N revisions
+    REVISION_KEEP_RECENT: int = 50  # compaction keeps these, then one per day
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,174 @@
+"""Event loop lag monitor with a watchdog thread that captures the stack of blocking code."""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional
+from app.core import metrics
+from app.core.config import get_settings
+
+settings = get_settings()
+
+MAX_STACK_FRAMES = 40
+
+LOOP_LAG_SECONDS = metrics.registry.register(metrics.Histogram(
+    "event_loop_lag_seconds", "How late the loop monitor's periodic wakeup ran."
+))
+LOOP_STALLS = metrics.registry.register(metrics.Counter(
+    "event_loop_stalls_total", "Wakeups late by more than the stall threshold."
+))
+
+
+def _short_path(filename: str) -> str:
+    cwd = os.getcwd() + os.sep
+    if filename.startswith(cwd):
+        return filename[len(cwd):]
+    index = filename.rfind("site-packages/")
+    return filename[index + len("site-packages/"):] if index != -1 else filename
+
+
+def format_stack(frame) -> list[str]:
+    """Innermost-last frames as "path:line in function: source"."""
+    lines = []
+    for entry in traceback.extract_stack(frame, limit=MAX_STACK_FRAMES):
+        line = f"{_short_path(entry.filename)}:{entry.lineno} in {entry.name}"
+        if entry.line:
+            line += f": {entry.line}"
+        lines.append(line)
+    return lines
+
+
+def _task_name(loop: asyncio.AbstractEventLoop) -> Optional[str]:
+    # Read from the watchdog thread: a plain dict lookup, so it is safe
+    # while the loop thread is blocked inside a task step
+    task = getattr(asyncio.tasks, "_current_tasks", {}).get(loop)
+    if task is None:
+        return None
+    coro = task.get_coro()
+    return f"{task.get_name()} ({getattr(coro, '__qualname__', type(coro).__name__)})"
+
+
+class LoopMonitor:
+    """
+    A task on the event loop sleeps `interval` seconds at a time and
+    records how late each wakeup is (the loop lag). A daemon thread checks
+    the task's heartbeat; once the loop has been blocked for `threshold`
+    seconds it captures the loop thread's stack and the running task, so
+    the blocking call is named while it is still on the stack. The cost is
+    one timer wakeup per interval on the loop and one per half threshold
+    on the thread.
+    """
+    
+    def __init__(self, interval: float, threshold: float, keep: int):
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls: deque = deque(maxlen=keep)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stall_count = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._heartbeat = 0.0
+        self._open_stall: Optional[dict] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[threading.Event] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+    
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._task = self._loop.create_task(self._tick(), name="loop-monitor")
+        self._stop = threading.Event()
+        threading.Thread(target=self._watch, args=(self._stop,), name="loop-watchdog", daemon=True).start()
+    
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+    
+    async def _tick(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(now - expected, 0.0)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            with self._lock:
+                self._heartbeat = now
+                stall, self._open_stall = self._open_stall, None
+            if lag >= self.threshold:
+                self.stall_count += 1
+                LOOP_STALLS.inc()
+                if stall is None:
+                    # Shorter than the watchdog's check period: timed, but no stack
+                    stall = self._new_stall(expected, task=None, stack=None)
+                    self.stalls.append(stall)
+            if stall is not None:
+                stall["duration_ms"] = round(lag * 1000, 3)
+    
+    def _new_stall(self, since: float, task: Optional[str], stack: Optional[list[str]]) -> dict:
+        started = datetime.utcnow() - timedelta(seconds=time.perf_counter() - since)
+        return {
+            "started_at": started.isoformat(timespec="milliseconds") + "Z",
+            "duration_ms": None,  # filled in when the loop wakes up again
+            "task": task,
+            "stack": stack,
+        }
+    
+    def _watch(self, stop: threading.Event) -> None:
+        while not stop.wait(self.threshold / 2):
+            with self._lock:
+                since = self._heartbeat + self.interval
+                if self._open_stall is not None or time.perf_counter() - since < self.threshold:
+                    continue
+            loop = self._loop
+            frame = sys._current_frames().get(self._loop_thread)
+            if loop is None or frame is None:
+                continue
+            stall = self._new_stall(since, _task_name(loop), format_stack(frame))
+            del frame
+            with self._lock:
+                if self._heartbeat + self.interval != since:
+                    continue  # the loop woke up while the stack was being captured
+                self._open_stall = stall
+            self.stalls.append(stall)
+    
+    def snapshot(self) -> dict:
+        """Current lag figures and the most recent stalls, newest first."""
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "stall_count": self.stall_count,
+            "stalls": list(reversed(self.stalls)),
+        }
+
+
+loop_monitor = LoopMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL,
+    threshold=settings.LOOP_STALL_THRESHOLD,
+    keep=settings.LOOP_STALLS_KEPT,
+)
@@ -0,0 +1,260 @@
+"""Process-local metrics rendered in the Prometheus text exposition format."""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+from typing import Callable, Iterable, Optional
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic count per label set."""
+    kind = "counter"
+    
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = Lock()
+    
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+    
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    """Bucketed observations per label set, with their sum and count."""
+    kind = "histogram"
+    
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last is +Inf), sum]
+        self._values: dict[tuple, list] = {}
+        self._lock = Lock()
+    
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+    
+    def time(self, labels: tuple = ()) -> "_Timer":
+        """Context manager observing the duration of its block in seconds."""
+        return _Timer(self, labels)
+    
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = 'le="{}"'.format(bound if bound == "+Inf" else _number(bound))
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+    
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, self.labels)
+
+
+class Collected:
+    """Values read from their owner at scrape time, e.g. queue depths or cache counters."""
+    
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...],
+                 collect: Callable[[], Iterable[tuple[tuple, float]]], kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.collect = collect
+        self.kind = kind
+    
+    def samples(self) -> Iterable[str]:
+        for labels, value in self.collect():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+    
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status")
+))
+REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending its last byte.", ("method", "route")
+))
+REQUEST_DB_QUERIES = registry.register(Histogram(
+    "http_request_db_queries", "Database queries issued per request.", ("route",), COUNT_BUCKETS
+))
+REQUEST_DB_SECONDS = registry.register(Histogram(
+    "http_request_db_seconds", "Time spent in database queries per request.", ("route",)
+))
+DB_QUERY_SECONDS = registry.register(Histogram(
+    "db_query_duration_seconds", "Duration of individual database queries.", (), QUERY_BUCKETS
+))
+MARKDOWN_RENDER_SECONDS = registry.register(Histogram(
+    "markdown_render_seconds", "Markdown to HTML conversion time."
+))
+PDF_RENDER_SECONDS = registry.register(Histogram(
+    "pdf_render_seconds", "PDF generation time, including markdown rendering."
+))
+UPLOAD_BYTES = registry.register(Counter(
+    "upload_bytes_total", "Bytes received by upload endpoints.", ("kind",)
+))
+
+_caches: dict[str, object] = {}
+
+
+def register_cache(name: str, cache) -> None:
+    """Export a cache's `hits` and `misses` counters under `name`."""
+    _caches[name] = cache
+
+
+def _cache_samples(attribute: str):
+    return lambda: [((name,), getattr(cache, attribute)) for name, cache in _caches.items()]
+
+
+def _cache_ratios():
+    for name, cache in _caches.items():
+        lookups = cache.hits + cache.misses
+        yield (name,), cache.hits / lookups if lookups else 0
+
+
+registry.register(Collected("cache_hits_total", "Cache lookups answered from the cache.", ("cache",),
+                            _cache_samples("hits"), kind="counter"))
+registry.register(Collected("cache_misses_total", "Cache lookups that missed.", ("cache",),
+                            _cache_samples("misses"), kind="counter"))
+registry.register(Collected("cache_hit_ratio", "Hits over lookups since start.", ("cache",), _cache_ratios))
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+    
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def observe_query(seconds: float) -> None:
+    """Record a database query; called from the engine's cursor events."""
+    DB_QUERY_SECONDS.observe(seconds)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += seconds
+
+
+def route_template(scope) -> str:
+    """Route path the request matched (e.g. /api/files/{file_id}), so labels stay bounded."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope and scope.get("root_path"):
+        # Mounted app such as /static
+        return scope["root_path"]
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request count, latency and database
+    usage per route template. The route is read from the scope after the
+    router has matched it.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        status = 500
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+        
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            route = route_template(scope)
+            method = scope["method"]
+            REQUESTS.inc((method, route, status))
+            REQUEST_SECONDS.observe(elapsed, (method, route))
+            REQUEST_DB_QUERIES.observe(stats.queries, (route,))
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, (route,))
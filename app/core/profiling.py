@@ -0,0 +1,137 @@
+"""Capture of SQL statements and timed spans for a request being profiled."""
+import cProfile
+import time
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Optional
+import jinja2
+from fastapi.concurrency import run_in_threadpool as _run_in_threadpool
+
+MAX_QUERIES = 1000  # statements kept per profile; the rest are only counted
+MAX_PARAMETER_LENGTH = 200
+MAX_PARAMETER_SETS = 5  # of an executemany
+
+_NOT_PROFILING = nullcontext()
+
+
+def _short(value) -> str:
+    text = repr(value)
+    return text if len(text) <= MAX_PARAMETER_LENGTH else text[:MAX_PARAMETER_LENGTH] + "…"
+
+
+def _format_parameters(parameters, many: bool):
+    if parameters is None:
+        return None
+    if many:
+        sets = [_format_parameters(item, False) for item in list(parameters)[:MAX_PARAMETER_SETS]]
+        return {"sets": len(parameters), "first": sets}
+    if isinstance(parameters, dict):
+        return {key: _short(value) for key, value in parameters.items()}
+    return [_short(value) for value in parameters]
+
+
+class Profile:
+    """SQL and spans recorded while one request runs."""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries: list[dict] = []
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.spans: list[dict] = []
+        # Set to a list while the request's call tree is recorded; gets the
+        # profilers of its work in threadpool threads
+        self.thread_profilers: Optional[list[cProfile.Profile]] = None
+    
+    def _offset_ms(self, at: float) -> float:
+        return round((at - self.started) * 1000, 3)
+    
+    def add_query(self, statement: str, parameters, seconds: float, many: bool = False) -> None:
+        self.query_count += 1
+        self.query_seconds += seconds
+        if len(self.queries) < MAX_QUERIES:
+            self.queries.append({
+                "start_ms": self._offset_ms(time.perf_counter() - seconds),
+                "duration_ms": round(seconds * 1000, 3),
+                "statement": statement,
+                "parameters": _format_parameters(parameters, many),
+            })
+    
+    def span(self, name: str) -> "_Span":
+        return _Span(self, name)
+
+
+class _Span:
+    __slots__ = ("profile", "name", "start")
+    
+    def __init__(self, profile: Profile, name: str):
+        self.profile = profile
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.profile.spans.append({
+            "name": self.name,
+            "start_ms": self.profile._offset_ms(self.start),
+            "duration_ms": round((time.perf_counter() - self.start) * 1000, 3),
+        })
+
+
+_current: ContextVar[Optional[Profile]] = ContextVar("profile", default=None)
+
+
+def current() -> Optional[Profile]:
+    """The profile of the request being handled, if it is being profiled."""
+    return _current.get()
+
+
+def activate(profile: Profile):
+    """Make `profile` current for this context; returns a token for deactivate()."""
+    return _current.set(profile)
+
+
+def deactivate(token) -> None:
+    _current.reset(token)
+
+
+def span(name: str):
+    """Context manager timing a block into the current profile; a no-op otherwise."""
+    profile = _current.get()
+    return profile.span(name) if profile is not None else _NOT_PROFILING
+
+
+async def run_in_threadpool(func, *args, **kwargs):
+    """
+    run_in_threadpool that profiles `func` in its worker thread when the
+    current request records a call tree, so CPU-bound work handed off the
+    event loop (e.g. PDF rendering) shows up in the request's report.
+    """
+    profile = _current.get()
+    if profile is None or profile.thread_profilers is None:
+        return await _run_in_threadpool(func, *args, **kwargs)
+    return await _run_in_threadpool(_profiled_call, profile, func, args, kwargs)
+
+
+def _profiled_call(profile: Profile, func, args, kwargs):
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one profiler per process, and it already sees every thread
+        return func(*args, **kwargs)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        profile.thread_profilers.append(profiler)
+
+
+class ProfiledTemplate(jinja2.Template):
+    """Jinja template class recording each top-level render as a span."""
+    
+    def render(self, *args, **kwargs):
+        with span(f"template:{self.name}"):
+            return super().render(*args, **kwargs)
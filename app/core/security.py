@@ -1,3 +1,6 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -20,6 +23,41 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+class HasherBusy(Exception):
+    """Raised when the password hashing queue is full."""
+
+
+class PasswordHasherPool:
+    """
+    Runs argon2 off the event loop on a few dedicated threads. At most
+    `workers + queue` calls are admitted at once; further calls fail fast
+    with HasherBusy instead of piling up behind a login burst.
+    """
+    
+    def __init__(self, workers: int, queue: int):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="argon2")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+    
+    async def run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+
+hasher_pool = PasswordHasherPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the hasher pool; raises HasherBusy when it is saturated."""
+    return await hasher_pool.run(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     to_encode = data.copy()
@@ -34,13 +72,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-def verify_token(token: str) -> Optional[str]:
-    """Verify a JWT token and return the username if valid."""
+def decode_token(token: str) -> Optional[dict]:
+    """Verify a JWT token and return its claims if valid and carrying a subject."""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        return username
     except JWTError:
         return None
+    if payload.get("sub") is None:
+        return None
+    return payload
+
+
+def verify_token(token: str) -> Optional[str]:
+    """Verify a JWT token and return the username if valid."""
+    payload = decode_token(token)
+    return payload["sub"] if payload else None
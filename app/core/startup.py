@@ -0,0 +1,82 @@
+"""Worker startup timing: module imports, app setup, database init and the first request."""
+import os
+import time
+from typing import Optional
+
+# Imported first by app.main, so this is when the application's imports began
+_started = time.perf_counter()
+_phases: dict[str, float] = {}
+_details: dict[str, object] = {}
+_first_request: Optional[float] = None
+
+
+def _process_age() -> Optional[float]:
+    """Seconds since the process started (interpreter and server boot), on Linux only."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22, counted after the parenthesised command name which may contain spaces
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+_before_app = _process_age()
+
+
+def mark(phase: str) -> None:
+    """Record the time since imports began at the end of a startup phase."""
+    _phases[phase] = time.perf_counter() - _started
+
+
+def note(name: str, value) -> None:
+    """Record a non-timing fact about startup, e.g. whether the schema was checked."""
+    _details[name] = value
+
+
+class PhaseTimer:
+    """Context manager recording the duration of a phase, e.g. database init."""
+    
+    def __init__(self, phase: str):
+        self.phase = phase
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        _phases[f"{self.phase}_seconds"] = time.perf_counter() - self.start
+
+
+def report() -> dict:
+    """Startup phases in seconds; cumulative marks are relative to the start of the app's imports."""
+    return {
+        "before_app_import": round(_before_app, 3) if _before_app is not None else None,
+        **{phase: round(seconds, 4) for phase, seconds in _phases.items()},
+        "first_request": round(_first_request, 4) if _first_request is not None else None,
+        **_details,
+    }
+
+
+class FirstRequestMiddleware:
+    """Records when the first HTTP response has been sent; a no-op afterwards."""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if _first_request is not None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _record_first_request()
+
+
+def _record_first_request() -> None:
+    global _first_request
+    if _first_request is None:
+        _first_request = time.perf_counter() - _started
@@ -0,0 +1,68 @@
+"""In-memory login throttling with exponential backoff."""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Hashable, Iterable
+
+
+@dataclass
+class _State:
+    failures: int = 0
+    blocked_until: float = 0.0
+    last_seen: float = 0.0
+
+
+class LoginThrottle:
+    """
+    Counts failed logins per key (username, client IP). Once a key exceeds
+    its free attempts, each further failure blocks it for
+    base_delay * 2**(extra failures - 1) seconds, capped at max_delay.
+    Keys are kept in LRU order and evicted beyond max_entries or once idle
+    for longer than max_delay.
+    """
+    
+    def __init__(self, base_delay: float, max_delay: float, max_entries: int):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_entries = max_entries
+        self._states: OrderedDict[Hashable, _State] = OrderedDict()
+        self._lock = Lock()
+    
+    def retry_after(self, keys: Iterable[Hashable]) -> float:
+        """Seconds until any of the keys may try again, 0 if none is blocked."""
+        now = time.monotonic()
+        with self._lock:
+            waits = [self._states[key].blocked_until - now for key in keys if key in self._states]
+        return max([0.0, *waits])
+    
+    def failure(self, limits: dict[Hashable, int]) -> None:
+        """Record a failed attempt for each key, given its number of free attempts."""
+        now = time.monotonic()
+        with self._lock:
+            for key, free_attempts in limits.items():
+                state = self._states.pop(key, None) or _State()
+                state.failures += 1
+                state.last_seen = now
+                extra = state.failures - free_attempts
+                if extra > 0:
+                    delay = min(self.base_delay * 2 ** min(extra - 1, 32), self.max_delay)
+                    state.blocked_until = now + delay
+                self._states[key] = state
+            self._evict(now)
+    
+    def success(self, keys: Iterable[Hashable]) -> None:
+        """Forget the failures of keys after a successful login."""
+        with self._lock:
+            for key in keys:
+                self._states.pop(key, None)
+    
+    def _evict(self, now: float) -> None:
+        while self._states:
+            key, state = next(iter(self._states.items()))
+            if len(self._states) <= self.max_entries and now - state.last_seen < self.max_delay:
+                break
+            del self._states[key]
+    
+    def __len__(self) -> int:
+        return len(self._states)
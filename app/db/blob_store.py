@@ -0,0 +1,121 @@
+"""Content-addressed storage for large markdown bodies."""
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterator
+from app.core.config import get_settings
+
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 hex digest used as a blob's address."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore(ABC):
+    """
+    Interface for blob backends. Blobs are immutable and addressed by content
+    hash. A backend missing a method cannot be instantiated.
+    """
+    
+    @abstractmethod
+    def put(self, data: bytes) -> str:
+        """Store data (a no-op if identical data is already stored) and return its hash."""
+    
+    @abstractmethod
+    def open(self, digest: str) -> memoryview:
+        """Read-only view of a blob's bytes."""
+    
+    @abstractmethod
+    def exists(self, digest: str) -> bool:
+        """Whether a blob is stored."""
+    
+    @abstractmethod
+    def delete(self, digest: str) -> None:
+        """Remove a blob; a missing blob is not an error."""
+    
+    @abstractmethod
+    def iter_blobs(self) -> Iterator[tuple[str, float]]:
+        """Yield (hash, modification time) for every stored blob."""
+
+
+class FileSystemBlobStore(BlobStore):
+    """
+    Blobs stored as files under root/ab/cd/<hash> and read through mmap,
+    so reads share the OS page cache and can be streamed without copying.
+    """
+    
+    def __init__(self, root: str):
+        self.root = Path(root)
+    
+    def _path(self, digest: str) -> Path:
+        if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+            raise ValueError(f"Invalid blob hash: {digest!r}")
+        return self.root / digest[:2] / digest[2:4] / digest
+    
+    def put(self, data: bytes) -> str:
+        digest = content_hash(data)
+        path = self._path(digest)
+        if path.exists():
+            # Refresh mtime so garbage collection's grace period restarts
+            os.utime(path)
+            return digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest
+    
+    def open(self, digest: str) -> memoryview:
+        with open(self._path(digest), "rb") as f:
+            return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    
+    def exists(self, digest: str) -> bool:
+        return self._path(digest).exists()
+    
+    def delete(self, digest: str) -> None:
+        self._path(digest).unlink(missing_ok=True)
+    
+    def iter_blobs(self) -> Iterator[tuple[str, float]]:
+        if not self.root.exists():
+            return
+        for path in self.root.glob("??/??/*"):
+            if not path.name.startswith(".tmp-"):
+                yield path.name, path.stat().st_mtime
+
+
+@lru_cache()
+def get_blob_store() -> BlobStore:
+    """Get the configured blob store."""
+    settings = get_settings()
+    if settings.CONTENT_BLOB_BACKEND == "filesystem":
+        return FileSystemBlobStore(settings.CONTENT_BLOB_DIR)
+    raise ValueError(f"Unknown CONTENT_BLOB_BACKEND: {settings.CONTENT_BLOB_BACKEND}")
+
+
+def collect_garbage(referenced: set[str], grace_seconds: float = 3600) -> list[str]:
+    """
+    Delete blobs that no row references. Blobs written within the grace
+    period are kept, since their row may not be committed yet.
+    Returns the deleted hashes.
+    """
+    store = get_blob_store()
+    cutoff = time.time() - grace_seconds
+    deleted = []
+    for digest, mtime in list(store.iter_blobs()):
+        if digest not in referenced and mtime < cutoff:
+            store.delete(digest)
+            deleted.append(digest)
+    return deleted
@@ -0,0 +1,73 @@
+"""Custom column types."""
+import base64
+import zlib
+from sqlalchemy.types import Text, TypeDecorator
+from app.core.config import get_settings
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+# Compressed values start with a codec tag. On SQLite they are stored as
+# BLOBs, which plain TEXT rows can never be; other databases get a
+# base64 string behind a marker that markdown text does not start with.
+_ZLIB = b"z"
+_ZSTD = b"s"
+_TEXT_MARKER = "\x01cz:"
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zlib":
+        return _ZLIB + zlib.compress(data, 6)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("CONTENT_COMPRESSION=zstd requires the 'zstandard' package")
+        return _ZSTD + zstandard.ZstdCompressor(level=6).compress(data)
+    raise ValueError(f"Unknown compression codec: {codec}")
+
+
+def _decompress(data: bytes) -> bytes:
+    tag, payload = data[:1], data[1:]
+    if tag == _ZLIB:
+        return zlib.decompress(payload)
+    if tag == _ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Reading zstd-compressed content requires the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise ValueError("Unknown compressed content format")
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text column that transparently compresses large values.
+    Values of at least CONTENT_COMPRESSION_THRESHOLD bytes are compressed
+    with CONTENT_COMPRESSION ("none", "zlib" or "zstd") when written; any
+    compressed value is decompressed on read regardless of the setting.
+    """
+    
+    impl = Text
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        settings = get_settings()
+        if settings.CONTENT_COMPRESSION == "none":
+            return value
+        data = value.encode("utf-8")
+        if len(data) < settings.CONTENT_COMPRESSION_THRESHOLD:
+            return value
+        compressed = _compress(data, settings.CONTENT_COMPRESSION)
+        if len(compressed) >= len(data):
+            return value
+        if dialect.name == "sqlite":
+            return compressed
+        return _TEXT_MARKER + base64.b64encode(compressed).decode("ascii")
+    
+    def process_result_value(self, value, dialect):
+        if isinstance(value, bytes):
+            return _decompress(value).decode("utf-8")
+        if isinstance(value, str) and value.startswith(_TEXT_MARKER):
+            return _decompress(base64.b64decode(value[len(_TEXT_MARKER):])).decode("utf-8")
+        return value
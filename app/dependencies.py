@@ -4,8 +4,7 @@ from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 from app.db.database import get_db
-from app.core.security import verify_token
-from app.services.auth_service import get_user_by_username
+from app.services.auth_service import get_user_by_token
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
@@ -35,11 +34,7 @@ async def get_current_user(
     if not auth_token:
         raise credentials_exception
     
-    username = verify_token(auth_token)
-    if username is None:
-        raise credentials_exception
-    
-    user = get_user_by_username(db, username=username)
+    user = get_user_by_token(db, auth_token)
     if user is None:
         raise credentials_exception
     
@@ -58,13 +53,9 @@ async def get_current_user_redirect(
     if not auth_token:
         raise AuthenticationRequired("Please log in to access this page")
     
-    username = verify_token(auth_token)
-    if username is None:
-        raise AuthenticationRequired("Session expired. Please log in again")
-    
-    user = get_user_by_username(db, username=username)
+    user = get_user_by_token(db, auth_token)
     if user is None:
-        raise AuthenticationRequired("User not found. Please log in again")
+        raise AuthenticationRequired("Session expired. Please log in again")
     
     return user
 
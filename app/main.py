@@ -1,23 +1,34 @@
 """Main FastAPI application."""
+# First, so the startup report's import timing covers everything below
+from app.core import startup
+
 from fastapi import FastAPI, Request, Depends, Form, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
 from fastapi.openapi.utils import get_openapi
 from sqlalchemy.orm import Session
 from starlette.middleware.base import BaseHTTPMiddleware
-import markdown
 
 from pathlib import Path
+import math
 
 from app.db.database import get_db, init_db
+from app.core.admission import AdmissionMiddleware, admission_controller
+from app.core.loop_monitor import loop_monitor
+from app.core import metrics, profiling
 from app.core.config import get_settings
-from app.routers import auth, admin, public, folders, images
-from app.services import auth_service, markdown_service
+from app.routers import auth, admin, public, folders, images, search, system
+from app.services import (
+    auth_service, feed_service, link_service, markdown_service, profile_service, render_service, section_service
+)
+from app.services.change_service import change_listener
+from app.services.job_service import runner as job_runner
 from app.dependencies import get_current_user, get_current_user_redirect, AuthenticationRequired
 from app.models.user import User
 
+startup.mark("imports")
 settings = get_settings()
 
 # Create FastAPI app with docs_url and redoc_url disabled (we'll add auth)
@@ -42,6 +53,28 @@ class NoCacheMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(NoCacheMiddleware)
 
+if settings.PROFILING_ENABLED:
+    app.add_middleware(profile_service.ProfilingMiddleware)
+
+# Middleware added later wraps middleware added earlier, so requests pass
+# through FirstRequestMiddleware, metrics, admission, profiling and no-cache
+# in that order. Admission sits outside profiling and the routes, so a shed
+# request never reaches them; only the two cheap outer layers see it.
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission_controller,
+        retry_after=settings.ADMISSION_RETRY_AFTER,
+        exempt=("/static/", "/uploads/", "/api/admin/system/", "/metrics")
+    )
+
+# Deliberately outside admission control: shed requests are counted (as
+# 503s) and latency includes time spent queued for a slot
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+app.add_middleware(startup.FirstRequestMiddleware)
+
 # Exception handler for authentication required on web pages
 @app.exception_handler(AuthenticationRequired)
 async def authentication_required_handler(request: Request, exc: AuthenticationRequired):
@@ -80,6 +113,8 @@ app.mount("/uploads", StaticFiles(directory=str(uploads_dir)), name="uploads")
 
 # Setup Jinja2 templates
 templates = Jinja2Templates(directory="app/templates")
+# Template renders show up as spans in request profiles
+templates.env.template_class = profiling.ProfiledTemplate
 
 # Include API routers
 app.include_router(auth.router, prefix="/api", tags=["auth"])
@@ -87,23 +122,44 @@ app.include_router(admin.router)
 app.include_router(folders.router)
 app.include_router(images.router)
 app.include_router(public.router, prefix="/api")
+app.include_router(public.folders_router, prefix="/api")
+app.include_router(search.router, prefix="/api")
+app.include_router(system.router)
+
+startup.mark("app_setup")
 
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup."""
-    init_db()
+    with startup.PhaseTimer("init_db"):
+        startup.note("schema_checked", init_db())
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    if settings.CHANGE_LISTENER_ENABLED:
+        change_listener.start()
+    if settings.JOBS_ENABLED:
+        job_runner.start()
+    startup.mark("startup_complete")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await loop_monitor.stop()
+    change_listener.stop()
+    job_runner.stop()
 
 
 # Web routes for serving HTML pages
 
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request, db: Session = Depends(get_db)):
-    """Home page showing all active files organized by folders."""
+    """Home page showing root folders and root files; folder contents load on demand."""
     from app.services import folder_service
     
-    files = markdown_service.get_all_files(db, include_archived=False)
-    folders = folder_service.get_all_folders(db, include_archived=False)
+    tree = folder_service.get_folder_tree(db, include_archived=False)
+    folders = [node for node in tree.values() if node.parent_id is None]
+    files = markdown_service.get_folder_files(db, None, include_archived=False)
     
     return templates.TemplateResponse(
         "index.html",
@@ -114,61 +170,19 @@ async def home(request: Request, db: Session = Depends(get_db)):
 @app.get("/files/{file_path:path}", response_class=HTMLResponse)
 async def view_file(request: Request, file_path: str, db: Session = Depends(get_db)):
     """View a single markdown file by path (supports folders)."""
-    from app.services import folder_service
-    
-    # Split the path into parts
-    parts = file_path.strip('/').split('/')
-    
-    if len(parts) == 0:
-        raise HTTPException(status_code=404, detail="File not found")
-    
-    # Last part is the file slug
-    file_slug = parts[-1]
-    folder_path = parts[:-1] if len(parts) > 1 else []
-    
-    # If no folder path, search in root
-    if not folder_path:
-        file = markdown_service.get_file_by_slug(db, file_slug, folder_id=None, active_only=True)
-    else:
-        # Navigate through folder hierarchy
-        current_folder = None
-        for folder_slug in folder_path:
-            if current_folder is None:
-                # Looking for root folder
-                folder = folder_service.get_folder_by_slug(db, folder_slug)
-                if not folder or folder.parent_id is not None:
-                    raise HTTPException(status_code=404, detail=f"Folder '{folder_slug}' not found")
-                current_folder = folder
-            else:
-                # Looking for subfolder
-                found = False
-                for subfolder in current_folder.subfolders:
-                    if subfolder.slug == folder_slug:
-                        current_folder = subfolder
-                        found = True
-                        break
-                if not found:
-                    raise HTTPException(status_code=404, detail=f"Folder '{folder_slug}' not found")
-        
-        # Now search for file in the final folder
-        file = markdown_service.get_file_by_slug(db, file_slug, folder_id=current_folder.id, active_only=True)
-    
+    file = markdown_service.get_file_by_path(db, file_path)
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
-    # Convert markdown to HTML
-    md = markdown.Markdown(extensions=[
-        'extra',
-        'codehilite',
-        'nl2br',
-        'sane_lists',
-        'tables'
-    ])
-    html_content = md.convert(file.content)
-    
     return templates.TemplateResponse(
         "public_view.html",
-        {"request": request, "file": file, "content": html_content}
+        {
+            "request": request,
+            "file": file,
+            "content": render_service.render_markdown(file.content),
+            "sections": section_service.get_sections(file),
+            "backlinks": link_service.get_backlinks(db, file.id)
+        }
     )
 
 
@@ -198,7 +212,25 @@ async def login_submit(
     db: Session = Depends(get_db)
 ):
     """Handle login form submission."""
-    user = auth_service.authenticate_user(db, username, password)
+    from app.core.security import HasherBusy
+    
+    client_ip = request.client.host if request.client else None
+    try:
+        user = await auth_service.login(db, username, password, client_ip)
+    except auth_service.LoginThrottled as exc:
+        return templates.TemplateResponse(
+            "login.html",
+            {"request": request, "error": f"Too many failed attempts. Try again in {math.ceil(exc.retry_after)} seconds"},
+            status_code=429,
+            headers={"Retry-After": str(math.ceil(exc.retry_after))}
+        )
+    except HasherBusy:
+        return templates.TemplateResponse(
+            "login.html",
+            {"request": request, "error": "The server is busy. Please try again in a moment"},
+            status_code=503,
+            headers={"Retry-After": "1"}
+        )
     
     if not user:
         return templates.TemplateResponse(
@@ -330,28 +362,82 @@ async def admin_view_file(
     if not file:
         raise HTTPException(status_code=404, detail="File not found")
     
-    # Convert markdown to HTML
-    md = markdown.Markdown(extensions=[
-        'extra',
-        'codehilite',
-        'nl2br',
-        'sane_lists',
-        'tables'
-    ])
-    html_content = md.convert(file.content)
-    
     return templates.TemplateResponse(
         "public_view.html",
-        {"request": request, "file": file, "content": html_content, "is_admin": True}
+        {
+            "request": request,
+            "file": file,
+            "content": render_service.render_markdown(file.content),
+            "sections": section_service.get_sections(file),
+            "backlinks": link_service.get_backlinks(db, file.id, active_only=False),
+            "is_admin": True
+        }
+    )
+
+
+@app.get("/admin/profiles", response_class=HTMLResponse)
+async def profile_list(
+    request: Request,
+    current_user: User = Depends(get_current_user_redirect)
+):
+    """Stored request profiles, newest first."""
+    return templates.TemplateResponse(
+        "profiles.html",
+        {"request": request, "reports": profile_service.list_reports()}
     )
 
 
+@app.get("/admin/profiles/{report_id}", response_class=HTMLResponse)
+async def profile_detail(
+    request: Request,
+    report_id: str,
+    current_user: User = Depends(get_current_user_redirect)
+):
+    """One request profile: timings, SQL statements and call tree."""
+    report = profile_service.get_report(report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return templates.TemplateResponse(
+        "profile_report.html",
+        {"request": request, "report": report}
+    )
+
+
+@app.get("/sitemap.xml", include_in_schema=False)
+async def sitemap(request: Request, db: Session = Depends(get_db)):
+    """Sitemap of active files, or a sitemap index when there are too many for one file."""
+    return feed_service.sitemap_response(db, request)
+
+
+@app.get("/sitemap-{page:int}.xml", include_in_schema=False)
+async def sitemap_page(request: Request, page: int, db: Session = Depends(get_db)):
+    """One page of a split sitemap."""
+    if page < 1:
+        raise HTTPException(status_code=404, detail="Not found")
+    return feed_service.sitemap_response(db, request, page)
+
+
+@app.get("/feed.atom", include_in_schema=False)
+async def feed(request: Request, db: Session = Depends(get_db)):
+    """Atom feed of recently updated files."""
+    return feed_service.feed_response(db, request)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus metrics of this worker process."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
 # Protected API documentation endpoints
 @app.get("/docs", include_in_schema=False)
 async def get_documentation(current_user: User = Depends(get_current_user)):
@@ -1,5 +1,14 @@
 """Database models."""
 from app.models.user import User
 from app.models.markdown import MarkdownFile, FileStatus
+from app.models.metadata import FileTag, FileMetadata
+from app.models.revision import FileRevision
+from app.models.section import FileSection
+from app.models.link import FileLink
+from app.models.change import ChangeLog
+from app.models.job import Job
 
-__all__ = ["User", "MarkdownFile", "FileStatus"]
+__all__ = [
+    "User", "MarkdownFile", "FileStatus", "FileTag", "FileMetadata", "FileRevision", "FileSection", "FileLink",
+    "ChangeLog", "Job"
+]
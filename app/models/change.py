@@ -0,0 +1,25 @@
+from datetime import datetime
+from sqlalchemy import Column, DateTime, Integer, String
+from app.db.database import Base
+
+
+class ChangeLog(Base):
+    """
+    One write to cached data, recorded in the writer's transaction so other
+    worker processes can invalidate their in-process caches. IDs only grow
+    (AUTOINCREMENT on SQLite), so a worker reads the rows after the last ID
+    it has applied.
+    """
+    
+    __tablename__ = "change_log"
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(16), nullable=False)  # see change_service: file, folder, tree, user
+    key = Column(String, nullable=True)  # file/folder ID or username
+    origin = Column(String(32), nullable=False)  # process that wrote it; skips its own changes
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    def __repr__(self):
+        return f"<ChangeLog(id={self.id}, kind='{self.kind}', key={self.key!r})>"
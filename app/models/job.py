@@ -0,0 +1,38 @@
+from datetime import datetime
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, String, Text
+from app.db.database import Base
+
+
+class Job(Base):
+    """
+    A unit of derived work (search, tag and section indexing, PDF rendering)
+    queued by a write and run by the job workers. Jobs with the same key
+    replace each other while pending, so repeated saves of a file queue its
+    work once.
+    """
+    
+    __tablename__ = "jobs"
+    
+    id = Column(Integer, primary_key=True)
+    kind = Column(String(32), nullable=False)  # handler name, see job_service.handler
+    key = Column(String, nullable=True)  # dedup key, e.g. "file_index:42"
+    payload = Column(JSON, nullable=False, default=dict)
+    priority = Column(Integer, default=0, nullable=False)  # higher runs first
+    status = Column(String(10), default="pending", nullable=False)  # pending, running, done or failed
+    attempts = Column(Integer, default=0, nullable=False)
+    run_after = Column(DateTime, default=datetime.utcnow, nullable=False)  # not before; pushed back on retry
+    locked_until = Column(DateTime, nullable=True)  # lease of a running job; expired means its worker died
+    worker = Column(String(32), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_jobs_status_priority_id", "status", "priority", "id"),
+        Index("ix_jobs_key_status", "key", "status"),
+        Index("ix_jobs_finished_at", "finished_at"),
+    )
+    
+    def __repr__(self):
+        return f"<Job(id={self.id}, kind='{self.kind}', status='{self.status}')>"
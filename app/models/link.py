@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from app.db.database import Base
+
+
+class FileLink(Base):
+    """
+    Internal link from one markdown file to another, resolved by path.
+    `target_id` is NULL while nothing exists at `target_path` (a broken link).
+    """
+    
+    __tablename__ = "file_links"
+    
+    id = Column(Integer, primary_key=True)
+    source_id = Column(Integer, ForeignKey('markdown_files.id'), nullable=False, index=True)
+    target_id = Column(Integer, ForeignKey('markdown_files.id'), nullable=True, index=True)
+    target_path = Column(String, nullable=False)  # folder slugs and file slug, e.g. "guides/setup"
+    href = Column(String, nullable=False)  # as written in the source
+    
+    __table_args__ = (
+        Index("ix_file_links_target_path_target_id", "target_path", "target_id"),
+    )
+    
+    def __repr__(self):
+        return f"<FileLink(source_id={self.source_id}, target_path='{self.target_path}', target_id={self.target_id})>"
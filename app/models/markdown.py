@@ -1,7 +1,11 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, DateTime, Enum as SQLEnum, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Enum as SQLEnum, ForeignKey, Index
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import relationship
+from app.core.config import get_settings
+from app.db.blob_store import content_hash, get_blob_store
 from app.db.database import Base
+from app.db.types import CompressedText
 import enum
 
 
@@ -28,10 +32,23 @@ class Folder(Base):
     parent = relationship("Folder", remote_side=[id], backref="subfolders")
     files = relationship("MarkdownFile", back_populates="folder", cascade="all, delete-orphan")
     
+    # Keyset pagination indexes
+    __table_args__ = (
+        Index("ix_folders_name_id", "name", "id"),
+        Index("ix_folders_parent_name_id", "parent_id", "name", "id"),
+        Index("ix_folders_created_at_id", "created_at", "id"),
+    )
+    
     def __repr__(self):
         return f"<Folder(name='{self.name}', slug='{self.slug}')>"
 
 
+class ContentStorage(str, enum.Enum):
+    """Where a markdown file's body is kept."""
+    INLINE = "inline"
+    BLOB = "blob"
+
+
 class MarkdownFile(Base):
     """MarkdownFile model for content management."""
     
@@ -39,7 +56,14 @@ class MarkdownFile(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
+    # Inline body; empty when the body lives in the blob store (see `content`)
+    inline_content = Column("content", CompressedText, nullable=False, default="")
+    content_hash = Column(String(64), index=True, nullable=True)
+    content_size = Column(Integer, nullable=True)
+    content_storage = Column(String(10), nullable=True)  # ContentStorage value; NULL means inline
+    sections_hash = Column(String(64), nullable=True)  # content_hash the section rows were built from
+    search_revision = Column(Integer, nullable=True)  # revision whose title and body the search index holds
+    revision_number = Column(Integer, nullable=True)  # latest revision; bumped to hand out the next number
     slug = Column(String, index=True, nullable=False)
     folder_id = Column(Integer, ForeignKey('folders.id'), nullable=True)
     status = Column(SQLEnum(FileStatus), default=FileStatus.ACTIVE, nullable=False)
@@ -48,6 +72,51 @@ class MarkdownFile(Base):
     
     # Relationships
     folder = relationship("Folder", back_populates="files")
+    tags = relationship("FileTag", cascade="all, delete-orphan")
+    meta = relationship("FileMetadata", cascade="all, delete-orphan")
+    revisions = relationship("FileRevision", cascade="all, delete-orphan", order_by="FileRevision.number")
+    sections = relationship("FileSection", cascade="all, delete-orphan", order_by="FileSection.position")
+    links = relationship("FileLink", foreign_keys="FileLink.source_id", cascade="all, delete-orphan")
+    
+    # Keyset pagination indexes
+    __table_args__ = (
+        Index("ix_markdown_files_created_at_id", "created_at", "id"),
+        Index("ix_markdown_files_title_id", "title", "id"),
+        Index("ix_markdown_files_folder_created_at_id", "folder_id", "created_at", "id"),
+        Index("ix_markdown_files_folder_title_id", "folder_id", "title", "id"),
+        Index("ix_markdown_files_updated_at", "updated_at"),
+    )
+    
+    @hybrid_property
+    def content(self) -> str:
+        """The markdown body, read from the row or the blob store."""
+        if self.content_storage == ContentStorage.BLOB.value:
+            return str(self.content_view(), "utf-8")
+        return self.inline_content
+    
+    @content.setter
+    def content(self, value: str):
+        data = value.encode("utf-8")
+        self.content_hash = content_hash(data)
+        self.content_size = len(data)
+        if len(data) > get_settings().CONTENT_INLINE_MAX:
+            get_blob_store().put(data)
+            self.inline_content = ""
+            self.content_storage = ContentStorage.BLOB.value
+        else:
+            self.inline_content = value
+            self.content_storage = ContentStorage.INLINE.value
+    
+    @content.expression
+    def content(cls):
+        # SQL expressions only see the inline column
+        return cls.inline_content
+    
+    def content_view(self) -> memoryview:
+        """UTF-8 bytes of the body; blob-backed bodies are a zero-copy mmap view."""
+        if self.content_storage == ContentStorage.BLOB.value:
+            return get_blob_store().open(self.content_hash)
+        return memoryview(self.inline_content.encode("utf-8"))
     
     def __repr__(self):
         return f"<MarkdownFile(title='{self.title}', slug='{self.slug}', status='{self.status}')>"
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from app.db.database import Base
+
+
+class FileTag(Base):
+    """Tag parsed from a markdown file's front matter."""
+    
+    __tablename__ = "file_tags"
+    
+    id = Column(Integer, primary_key=True)
+    file_id = Column(Integer, ForeignKey('markdown_files.id'), nullable=False, index=True)
+    tag = Column(String, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_file_tags_tag_file_id", "tag", "file_id"),
+    )
+    
+    def __repr__(self):
+        return f"<FileTag(file_id={self.file_id}, tag='{self.tag}')>"
+
+
+class FileMetadata(Base):
+    """Scalar front matter field of a markdown file (one row per value)."""
+    
+    __tablename__ = "file_metadata"
+    
+    id = Column(Integer, primary_key=True)
+    file_id = Column(Integer, ForeignKey('markdown_files.id'), nullable=False, index=True)
+    key = Column(String, nullable=False)
+    value = Column(String, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_file_metadata_key_value_file_id", "key", "value", "file_id"),
+    )
+    
+    def __repr__(self):
+        return f"<FileMetadata(file_id={self.file_id}, key='{self.key}', value='{self.value}')>"
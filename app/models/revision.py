@@ -0,0 +1,30 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
+from app.db.database import Base
+from app.db.types import CompressedText
+
+
+class FileRevision(Base):
+    """
+    Saved version of a markdown file.
+    Snapshots store the full content; other revisions store a delta
+    against the previous revision (see revision_service).
+    """
+    
+    __tablename__ = "file_revisions"
+    
+    id = Column(Integer, primary_key=True)
+    file_id = Column(Integer, ForeignKey('markdown_files.id'), nullable=False)
+    number = Column(Integer, nullable=False)
+    title = Column(String, nullable=False)
+    is_snapshot = Column(Boolean, nullable=False, default=False)
+    data = Column(CompressedText, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_file_revisions_file_id_number", "file_id", "number", unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<FileRevision(file_id={self.file_id}, number={self.number}, snapshot={self.is_snapshot})>"
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from app.db.database import Base
+
+
+class FileSection(Base):
+    """
+    Heading of a markdown file with the byte range of its section
+    (the heading up to the next heading of the same or a higher level).
+    """
+    
+    __tablename__ = "file_sections"
+    
+    id = Column(Integer, primary_key=True)
+    file_id = Column(Integer, ForeignKey('markdown_files.id'), nullable=False)
+    position = Column(Integer, nullable=False)
+    level = Column(Integer, nullable=False)
+    title = Column(String, nullable=False)
+    anchor = Column(String, nullable=False)
+    start = Column(Integer, nullable=False)  # byte offsets into the UTF-8 body
+    end = Column(Integer, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_file_sections_file_id_anchor", "file_id", "anchor"),
+    )
+    
+    def __repr__(self):
+        return f"<FileSection(file_id={self.file_id}, anchor='{self.anchor}', level={self.level})>"
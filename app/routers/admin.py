@@ -1,25 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import Optional
 import re
+from app.core.config import get_settings
+from app.core.metrics import UPLOAD_BYTES
 from app.db.database import get_db
 from app.dependencies import get_current_user
+from app.models.markdown import FileStatus
 from app.models.user import User
-from app.schemas.markdown import MarkdownCreate, MarkdownUpdate, MarkdownResponse, MarkdownList
-from app.services import markdown_service, download_service
+from app.schemas.markdown import (
+    MarkdownCreate, MarkdownUpdate, MarkdownResponse, MarkdownList, RevisionInfo, RevisionResponse,
+    Backlink, BrokenLink
+)
+from app.services import markdown_service, download_service, link_service, revision_service
+from app.services.pagination import InvalidCursor, page_headers
 
 router = APIRouter(prefix="/api/admin/files", tags=["admin"])
+settings = get_settings()
 
 
 @router.get("", response_model=list[MarkdownList])
 async def list_all_files(
+    response: Response,
+    folder_id: Optional[int] = None,
+    root_only: bool = False,
+    file_status: Optional[FileStatus] = Query(None, alias="status"),
+    updated_since: Optional[datetime] = None,
+    tag: Optional[list[str]] = Query(None),
+    owner: Optional[str] = None,
+    product: Optional[str] = None,
+    sort: str = Query("-created_at", pattern=r"^-?(created_at|name)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    include_total: bool = True,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """List all markdown files (including archived) - Admin only."""
-    files = markdown_service.get_all_files(db, include_archived=True)
-    return files
+    """
+    List markdown files (including archived) - Admin only.
+    Paginated by cursor: pass the X-Next-Cursor response header back as `cursor`.
+    `tag` (repeatable), `owner` and `product` filter on front matter.
+    """
+    try:
+        page = markdown_service.list_files(
+            db,
+            include_archived=True,
+            folder_id=folder_id,
+            root_only=root_only,
+            status=file_status,
+            updated_since=updated_since,
+            tags=tag,
+            metadata={key: value for key, value in (("owner", owner), ("product", product)) if value},
+            sort=sort,
+            cursor=cursor,
+            limit=limit,
+            with_total=include_total
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    response.headers.update(page_headers(page))
+    return page.items
 
 
 @router.get("/{file_id}", response_model=MarkdownResponse)
@@ -61,22 +103,13 @@ async def upload_markdown_file(
         raise HTTPException(status_code=400, detail="Only .md files are allowed")
     
     content = await file.read()
+    UPLOAD_BYTES.inc(("markdown",), len(content))
     content_str = content.decode('utf-8')
     
     filename = file.filename[:-3]
     slug = re.sub(r'[^a-z0-9]+', '-', filename.lower()).strip('-')
     
-    existing_file = markdown_service.get_file_by_slug(db, slug, folder_id, active_only=False)
-    if existing_file:
-
-        counter = 1
-        while existing_file:
-            new_slug = f"{slug}-{counter}"
-            existing_file = markdown_service.get_file_by_slug(db, new_slug, folder_id, active_only=False)
-            if not existing_file:
-                slug = new_slug
-                break
-            counter += 1
+    slug = markdown_service.available_slug(db, slug, folder_id)
     
     file_data = MarkdownCreate(
         title=filename,
@@ -92,6 +125,7 @@ async def upload_markdown_file(
 async def update_file(
     file_id: int,
     file_update: MarkdownUpdate,
+    rewrite_links: bool = Query(False, description="Rewrite links to this file if its path changes"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -106,7 +140,7 @@ async def update_file(
         if existing_file and existing_file.id != file_id:
             raise HTTPException(status_code=400, detail="Slug already exists")
     
-    updated_file = markdown_service.update_file(db, file_id, file_update)
+    updated_file = markdown_service.update_file(db, file_id, file_update, rewrite_links=rewrite_links)
     return updated_file
 
 
@@ -136,9 +170,83 @@ async def toggle_archive_status(
     return db_file
 
 
+@router.get("/links/broken", response_model=list[BrokenLink])
+async def list_broken_links(
+    limit: Optional[int] = Query(None, ge=1),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Internal links whose target does not exist - Admin only."""
+    return link_service.get_broken_links(db, limit=limit)
+
+
+@router.get("/{file_id}/backlinks", response_model=list[Backlink])
+async def list_backlinks(
+    file_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Files linking to a markdown file, including archived ones - Admin only."""
+    if not markdown_service.get_file_by_id(db, file_id):
+        raise HTTPException(status_code=404, detail="File not found")
+    return link_service.get_backlinks(db, file_id, active_only=False)
+
+
+@router.get("/{file_id}/revisions", response_model=list[RevisionInfo])
+async def list_revisions(
+    file_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """List saved versions of a markdown file, newest first - Admin only."""
+    if not markdown_service.get_file_by_id(db, file_id):
+        raise HTTPException(status_code=404, detail="File not found")
+    return revision_service.list_revisions(db, file_id)
+
+
+@router.get("/{file_id}/revisions/{number}", response_model=RevisionResponse)
+async def get_revision(
+    file_id: int,
+    number: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a saved version of a markdown file - Admin only."""
+    result = revision_service.get_revision_content(db, file_id, number)
+    if not result:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    
+    revision, content = result
+    return RevisionResponse(
+        number=revision.number,
+        title=revision.title,
+        is_snapshot=revision.is_snapshot,
+        size=revision.size,
+        created_at=revision.created_at,
+        content=content
+    )
+
+
+@router.post("/{file_id}/revisions/{number}/restore", response_model=MarkdownResponse)
+async def restore_revision(
+    file_id: int,
+    number: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Restore a saved version; this is recorded as a new revision - Admin only."""
+    result = revision_service.get_revision_content(db, file_id, number)
+    if not result:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    
+    revision, content = result
+    return markdown_service.update_file(db, file_id, MarkdownUpdate(title=revision.title, content=content))
+
+
 @router.get("/download/{file_id}/markdown")
 async def download_markdown(
     file_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -147,15 +255,7 @@ async def download_markdown(
     if not db_file:
         raise HTTPException(status_code=404, detail="File not found")
     
-    content_bytes, filename = download_service.generate_markdown_file(db_file)
-    
-    return StreamingResponse(
-        content_bytes,
-        media_type="text/markdown",
-        headers={
-            "Content-Disposition": f"attachment; filename={filename}"
-        }
-    )
+    return download_service.markdown_response(db_file, request)
 
 
 @router.get("/download/{file_id}/pdf")
@@ -169,12 +269,4 @@ async def download_pdf(
     if not db_file:
         raise HTTPException(status_code=404, detail="File not found")
     
-    content_bytes, filename = download_service.generate_pdf_file(db_file)
-    
-    return StreamingResponse(
-        content_bytes,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename={filename}"
-        }
-    )
+    return await download_service.pdf_response(db_file)
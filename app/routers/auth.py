@@ -1,11 +1,12 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.schemas.user import Token
-from app.services.auth_service import authenticate_user
-from app.core.security import create_access_token
+from app.services.auth_service import LoginThrottled, login as authenticate_login
+from app.core.security import HasherBusy, create_access_token
 from app.core.config import get_settings
 
 router = APIRouter()
@@ -14,11 +15,26 @@ settings = get_settings()
 
 @router.post("/token", response_model=Token)
 async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
     """Login endpoint to get JWT token."""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    client_ip = request.client.host if request.client else None
+    try:
+        user = await authenticate_login(db, form_data.username, form_data.password, client_ip)
+    except LoginThrottled as exc:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many failed login attempts",
+            headers={"Retry-After": str(math.ceil(exc.retry_after))},
+        )
+    except HasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent logins, try again shortly",
+            headers={"Retry-After": "1"},
+        )
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
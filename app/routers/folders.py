@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
+from app.core.config import get_settings
 from app.db.database import get_db
 from app.dependencies import get_current_user
 from app.models.user import User
-from app.models.markdown import Folder
+from app.models.markdown import Folder, FileStatus
 from app.schemas.markdown import FolderCreate, FolderUpdate, FolderResponse
 from app.services import folder_service
+from app.services.pagination import InvalidCursor, page_headers
 
 router = APIRouter(prefix="/api/admin/folders", tags=["admin-folders"])
+settings = get_settings()
 
 
 @router.post("/", response_model=FolderResponse, status_code=status.HTTP_201_CREATED)
@@ -31,12 +34,42 @@ async def create_folder(
 
 @router.get("/", response_model=List[FolderResponse])
 async def list_folders(
+    response: Response,
     include_archived: bool = False,
+    parent_id: Optional[int] = None,
+    root_only: bool = False,
+    folder_status: Optional[FileStatus] = Query(None, alias="status"),
+    sort: str = Query("name", pattern=r"^-?(created_at|name)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    include_total: bool = True,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """List all folders."""
-    return folder_service.get_all_folders(db, include_archived=include_archived)
+    """
+    List folders.
+    Paginated by cursor: pass the X-Next-Cursor response header back as `cursor`.
+    """
+    try:
+        page = folder_service.list_folders(
+            db,
+            include_archived=include_archived or folder_status is not None,
+            parent_id=parent_id,
+            root_only=root_only,
+            status=folder_status,
+            sort=sort,
+            cursor=cursor,
+            limit=limit,
+            with_total=include_total
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(exc)
+        )
+    
+    response.headers.update(page_headers(page))
+    return page.items
 
 
 @router.get("/root", response_model=List[FolderResponse])
@@ -69,11 +102,12 @@ async def get_folder(
 async def update_folder(
     folder_id: int,
     folder_update: FolderUpdate,
+    rewrite_links: bool = Query(False, description="Rewrite links to files in this folder if its path changes"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Update a folder."""
-    folder = folder_service.update_folder(db, folder_id, folder_update)
+    folder = folder_service.update_folder(db, folder_id, folder_update, rewrite_links=rewrite_links)
     if not folder:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -85,11 +119,12 @@ async def update_folder(
 @router.delete("/{folder_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_folder(
     folder_id: int,
+    rewrite_links: bool = Query(False, description="Rewrite links to files in its subfolders, which move to the top level"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a folder."""
-    success = folder_service.delete_folder(db, folder_id)
+    success = folder_service.delete_folder(db, folder_id, rewrite_links=rewrite_links)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -11,6 +11,7 @@ from app.db.database import get_db
 from app.dependencies import get_current_user
 from app.models.user import User
 from app.core.config import get_settings
+from app.core.metrics import UPLOAD_BYTES
 
 router = APIRouter(prefix="/api/admin/images", tags=["images"])
 settings = get_settings()
@@ -51,6 +52,7 @@ async def upload_image(
     
     # Read file content
     content = await file.read()
+    UPLOAD_BYTES.inc(("image",), len(content))
     
     # Check file size
     if len(content) > settings.MAX_IMAGE_SIZE:
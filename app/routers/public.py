@@ -1,36 +1,99 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import StreamingResponse
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.core.config import get_settings
 from app.db.database import get_db
-from app.schemas.markdown import MarkdownResponse, MarkdownList
-from app.services import markdown_service, folder_service, download_service
+from app.schemas.markdown import (
+    MarkdownResponse, MarkdownList, FolderContents, FileSummary, SectionInfo, SectionResponse, Backlink
+)
+from app.services import (
+    markdown_service, folder_service, download_service, link_service, render_service, section_service
+)
+from app.services.pagination import InvalidCursor, page_headers
 
+# Per-file sub-resources end in a segment starting with "_", which no
+# slug can contain, so they never shadow a document at that path.
 router = APIRouter(prefix="/files", tags=["public"])
+folders_router = APIRouter(prefix="/folders", tags=["public"])
+settings = get_settings()
+
+
+@folders_router.get("/{folder_id}/contents", response_model=FolderContents)
+async def get_folder_contents(folder_id: int, db: Session = Depends(get_db)):
+    """Direct subfolders and files of an active folder - Public access."""
+    tree = folder_service.get_folder_tree(db, include_archived=False)
+    folder = tree.get(folder_id)
+    if not folder:
+        raise HTTPException(status_code=404, detail="Folder not found")
+    
+    files = markdown_service.get_folder_files(db, folder_id, include_archived=False)
+    return FolderContents(
+        folder=folder,
+        folders=folder.children,
+        files=[
+            FileSummary(
+                id=file.id,
+                title=file.title,
+                slug=file.slug,
+                url=f"/files/{folder.path}/{file.slug}",
+                created_at=file.created_at,
+                updated_at=file.updated_at
+            )
+            for file in files
+        ]
+    )
 
 
 @router.get("", response_model=list[MarkdownList])
-async def list_active_files(db: Session = Depends(get_db)):
-    """List all active markdown files - Public access."""
-    files = markdown_service.get_all_files(db, include_archived=False)
-    return files
+async def list_active_files(
+    response: Response,
+    folder_id: Optional[int] = None,
+    root_only: bool = False,
+    updated_since: Optional[datetime] = None,
+    tag: Optional[list[str]] = Query(None),
+    owner: Optional[str] = None,
+    product: Optional[str] = None,
+    sort: str = Query("-created_at", pattern=r"^-?(created_at|name)$"),
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    include_total: bool = True,
+    db: Session = Depends(get_db)
+):
+    """
+    List active markdown files - Public access.
+    Paginated by cursor: pass the X-Next-Cursor response header back as `cursor`.
+    `tag` (repeatable), `owner` and `product` filter on front matter.
+    """
+    try:
+        page = markdown_service.list_files(
+            db,
+            include_archived=False,
+            folder_id=folder_id,
+            root_only=root_only,
+            updated_since=updated_since,
+            tags=tag,
+            metadata={key: value for key, value in (("owner", owner), ("product", product)) if value},
+            sort=sort,
+            cursor=cursor,
+            limit=limit,
+            with_total=include_total
+        )
+    except InvalidCursor as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    
+    response.headers.update(page_headers(page))
+    return page.items
 
 
 @router.get("/download/{file_id}/markdown")
-async def download_markdown(file_id: int, db: Session = Depends(get_db)):
+async def download_markdown(file_id: int, request: Request, db: Session = Depends(get_db)):
     """Download a markdown file as .md"""
     db_file = markdown_service.get_file_by_id(db, file_id)
     if not db_file or db_file.status.value != "active":
         raise HTTPException(status_code=404, detail="File not found")
     
-    content_bytes, filename = download_service.generate_markdown_file(db_file)
-    
-    return StreamingResponse(
-        content_bytes,
-        media_type="text/markdown",
-        headers={
-            "Content-Disposition": f"attachment; filename={filename}"
-        }
-    )
+    return download_service.markdown_response(db_file, request)
 
 
 @router.get("/download/{file_id}/pdf")
@@ -40,57 +103,60 @@ async def download_pdf(file_id: int, db: Session = Depends(get_db)):
     if not db_file or db_file.status.value != "active":
         raise HTTPException(status_code=404, detail="File not found")
     
-    content_bytes, filename = download_service.generate_pdf_file(db_file)
+    return await download_service.pdf_response(db_file)
+
+
+@router.get("/{file_path:path}/_backlinks", response_model=List[Backlink])
+async def list_backlinks(file_path: str, db: Session = Depends(get_db)):
+    """Active files linking to an active file."""
+    db_file = markdown_service.get_file_by_path(db, file_path)
+    if not db_file:
+        raise HTTPException(status_code=404, detail="File not found")
+    return link_service.get_backlinks(db, db_file.id)
+
+
+@router.get("/{file_path:path}/_sections", response_model=List[SectionInfo])
+async def list_file_sections(file_path: str, db: Session = Depends(get_db)):
+    """Heading index of an active file: anchors and byte ranges of its sections."""
+    db_file = markdown_service.get_file_by_path(db, file_path)
+    if not db_file:
+        raise HTTPException(status_code=404, detail="File not found")
+    return section_service.get_sections(db_file)
+
+
+@router.get("/{file_path:path}/_sections/{anchor}", response_model=SectionResponse)
+async def get_file_section(
+    file_path: str,
+    anchor: str,
+    format: str = Query("raw", pattern=r"^(raw|html)$"),
+    db: Session = Depends(get_db)
+):
+    """One section of an active file (heading through its subsections), as markdown or HTML."""
+    db_file = markdown_service.get_file_by_path(db, file_path)
+    if not db_file:
+        raise HTTPException(status_code=404, detail="File not found")
+    section = section_service.get_section(db, db_file, anchor)
+    if not section:
+        raise HTTPException(status_code=404, detail="Section not found")
     
-    return StreamingResponse(
-        content_bytes,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename={filename}"
-        }
+    content = section_service.section_content(db_file, section)
+    if format == "html":
+        content = render_service.render_markdown(content)
+    return SectionResponse(
+        anchor=section.anchor,
+        title=section.title,
+        level=section.level,
+        start=section.start,
+        end=section.end,
+        format=format,
+        content=content
     )
 
 
 @router.get("/{file_path:path}", response_model=MarkdownResponse)
 async def get_file_by_path(file_path: str, db: Session = Depends(get_db)):
-
-    # Split the path into parts
-    parts = file_path.strip('/').split('/')
-    
-    if len(parts) == 0:
-        raise HTTPException(status_code=404, detail="File not found")
-    
-    # Last part is the file slug
-    file_slug = parts[-1]
-    folder_path = parts[:-1] if len(parts) > 1 else []
-    
-    # If no folder path, search in root
-    if not folder_path:
-        db_file = markdown_service.get_file_by_slug(db, file_slug, folder_id=None, active_only=True)
-    else:
-        # Navigate through folder hierarchy
-        current_folder = None
-        for folder_slug in folder_path:
-            if current_folder is None:
-                # Looking for root folder
-                folder = folder_service.get_folder_by_slug(db, folder_slug)
-                if not folder or folder.parent_id is not None:
-                    raise HTTPException(status_code=404, detail=f"Folder '{folder_slug}' not found")
-                current_folder = folder
-            else:
-                # Looking for subfolder
-                found = False
-                for subfolder in current_folder.subfolders:
-                    if subfolder.slug == folder_slug:
-                        current_folder = subfolder
-                        found = True
-                        break
-                if not found:
-                    raise HTTPException(status_code=404, detail=f"Folder '{folder_slug}' not found")
-        
-        # Now search for file in the final folder
-        db_file = markdown_service.get_file_by_slug(db, file_slug, folder_id=current_folder.id, active_only=True)
-    
+    """Get an active file by its folder path and slug."""
+    db_file = markdown_service.get_file_by_path(db, file_path)
     if not db_file:
         raise HTTPException(status_code=404, detail="File not found")
     
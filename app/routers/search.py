@@ -0,0 +1,60 @@
+"""Public full-text search API."""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import Optional
+from app.db.database import get_db
+from app.schemas.markdown import SearchResult, Suggestion
+from app.services import folder_service, search_service, suggest_service
+
+router = APIRouter(tags=["search"])
+
+
+@router.get("/search", response_model=list[SearchResult])
+async def search_files(
+    q: str = Query(..., min_length=1, max_length=200),
+    folder_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Search active files by title and content, best matches first.
+    `folder_id` limits results to that folder and its subfolders.
+    """
+    if not search_service.is_enabled(db):
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Search requires an SQLite database"
+        )
+    
+    if folder_id is not None and folder_id not in folder_service.get_folder_paths(db, [folder_id]):
+        raise HTTPException(status_code=404, detail="Folder not found")
+    
+    hits = search_service.search(db, q, folder_id=folder_id, limit=limit)
+    # Hits are only in visible folders, so every folder has a path
+    paths = folder_service.get_folder_paths(db, {hit.folder_id for hit in hits})
+    
+    results = []
+    for hit in hits:
+        url = f"/files/{paths[hit.folder_id]}/{hit.slug}" if hit.folder_id is not None else f"/files/{hit.slug}"
+        results.append(SearchResult(
+            id=hit.id,
+            title=hit.title,
+            slug=hit.slug,
+            url=url,
+            snippet=hit.snippet,
+            score=hit.score
+        ))
+    return results
+
+
+@router.get("/suggest", response_model=list[Suggestion])
+async def suggest(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    """
+    Autocomplete active file titles/slugs and folder names by prefix.
+    Served from an in-memory index; the database is only read to build it.
+    """
+    return suggest_service.get_index(db).suggest(q, limit=limit)
@@ -0,0 +1,100 @@
+"""Operational endpoints for tuning a running worker."""
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from app.core.admission import admission_controller
+from app.core import startup
+from app.core.loop_monitor import loop_monitor
+from app.db.database import get_db
+from app.dependencies import get_current_user
+from app.models.user import User
+from app.services import job_service, profile_service
+from app.services.change_service import change_listener
+
+router = APIRouter(prefix="/api/admin/system", tags=["system"])
+
+
+@router.get("/admission")
+async def admission_status(current_user: User = Depends(get_current_user)):
+    """
+    Live admission control state of this worker process: limit, in-flight,
+    queued, admitted and shed counts per route class - Admin only.
+    """
+    return admission_controller.snapshot()
+
+
+@router.get("/loop")
+async def loop_status(current_user: User = Depends(get_current_user)):
+    """
+    Event loop lag of this worker process and the most recent stalls, each
+    with the stack and task that blocked the loop when captured - Admin only.
+    """
+    return loop_monitor.snapshot()
+
+
+@router.get("/startup")
+async def startup_report(current_user: User = Depends(get_current_user)):
+    """
+    How long this worker took to start: seconds before the app was imported,
+    cumulative marks after imports and app setup, init_db duration, the
+    first response, and whether the schema had to be checked - Admin only.
+    """
+    return startup.report()
+
+
+@router.get("/changes")
+async def change_status(current_user: User = Depends(get_current_user)):
+    """
+    Cache coherence state of this worker process: its origin ID, the last
+    change_log row read and how many other workers' changes it applied - Admin only.
+    """
+    return change_listener.snapshot()
+
+
+@router.get("/jobs")
+async def job_status(
+    status: Optional[str] = Query(None, pattern="^(pending|running|done|failed)$"),
+    kind: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Background job queue: counts by status and kind, how long the oldest
+    due job has waited, this worker's job threads and the most recent jobs,
+    optionally filtered by status and kind - Admin only.
+    """
+    return job_service.status(db, status, kind, limit)
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """A background job with its attempts and last error - Admin only."""
+    job = job_service.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_service.describe(job)
+
+
+@router.post("/jobs/{job_id}/retry")
+async def retry_job(job_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Queue a failed job again - Admin only."""
+    job = job_service.retry(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=409, detail="Only failed jobs can be retried")
+    return job_service.describe(job)
+
+
+@router.get("/profiles")
+async def list_profiles(current_user: User = Depends(get_current_user)):
+    """Summaries of stored request profiles, newest first - Admin only."""
+    return profile_service.list_reports()
+
+
+@router.get("/profiles/{report_id}")
+async def get_profile(report_id: str, current_user: User = Depends(get_current_user)):
+    """A stored request profile: call tree, SQL statements and spans - Admin only."""
+    report = profile_service.get_report(report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return report
@@ -95,3 +95,111 @@ class MarkdownList(BaseModel):
         if not self.folder:
             return self.slug
         return f"{self.folder.slug}/{self.slug}"
+
+
+class FolderSummary(BaseModel):
+    """Schema for a folder entry in the public folder tree."""
+    id: int
+    name: str
+    slug: str
+    path: str
+    file_count: int
+    folder_count: int
+    
+    class Config:
+        from_attributes = True
+
+
+class FileSummary(BaseModel):
+    """Schema for a file entry in the public folder tree."""
+    id: int
+    title: str
+    slug: str
+    url: str
+    created_at: datetime
+    updated_at: datetime
+
+
+class FolderContents(BaseModel):
+    """Schema for the direct contents of a folder."""
+    folder: FolderSummary
+    folders: List[FolderSummary]
+    files: List[FileSummary]
+
+
+class SearchResult(BaseModel):
+    """Schema for a full-text search hit."""
+    id: int
+    title: str
+    slug: str
+    url: str
+    snippet: str
+    score: float
+
+
+class Suggestion(BaseModel):
+    """Schema for a title autocomplete match."""
+    kind: str
+    id: int
+    title: str
+    slug: str
+    path: str
+    url: str
+
+
+class RevisionInfo(BaseModel):
+    """Schema for a revision list item."""
+    number: int
+    title: str
+    is_snapshot: bool
+    size: int
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+
+class RevisionResponse(RevisionInfo):
+    """Schema for a revision with its full content."""
+    content: str
+
+
+class SectionInfo(BaseModel):
+    """Schema for a heading index entry; start/end are byte offsets into the body."""
+    anchor: str
+    title: str
+    level: int
+    start: int
+    end: int
+    
+    class Config:
+        from_attributes = True
+
+
+class SectionResponse(SectionInfo):
+    """Schema for a single section's content, raw markdown or rendered HTML."""
+    format: str
+    content: str
+
+
+class Backlink(BaseModel):
+    """Schema for a file linking to another file."""
+    id: int
+    title: str
+    path: str
+    href: str
+    
+    class Config:
+        from_attributes = True
+
+
+class BrokenLink(BaseModel):
+    """Schema for a link whose target path does not exist."""
+    source_id: int
+    source_title: str
+    source_path: str
+    href: str
+    target_path: str
+    
+    class Config:
+        from_attributes = True
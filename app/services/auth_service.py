@@ -1,12 +1,82 @@
+import hashlib
+import time
+from typing import Optional
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
+from app.core import metrics
+from app.core.cache import TTLCache
+from app.core.config import get_settings
 from app.models.user import User
 from app.schemas.user import UserCreate
-from app.core.security import verify_password, get_password_hash
+from app.core.security import decode_token, verify_password_async, get_password_hash
+from app.core.throttle import LoginThrottle
+from app.services import change_service
+
+settings = get_settings()
+
+# Verified token -> user, and username -> user. Cached users are detached
+# snapshots: read them freely, but query the user again to modify it.
+token_cache = TTLCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+user_cache = TTLCache(settings.AUTH_CACHE_SIZE, settings.AUTH_CACHE_TTL)
+metrics.register_cache("auth_tokens", token_cache)
+metrics.register_cache("auth_users", user_cache)
+
+login_throttle = LoginThrottle(
+    settings.LOGIN_BACKOFF_BASE, settings.LOGIN_BACKOFF_MAX, settings.LOGIN_THROTTLE_ENTRIES
+)
+
+
+class LoginThrottled(Exception):
+    """Raised when a username or client has failed too often; retry after `retry_after` seconds."""
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
 
 
 def get_user_by_username(db: Session, username: str) -> User | None:
-    """Get user by username."""
-    return db.query(User).filter(User.username == username).first()
+    """Get user by username (cached; see user_cache)."""
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+    user = db.query(User).filter(User.username == username).first()
+    if user is not None and settings.AUTH_CACHE_TTL > 0:
+        db.expunge(user)
+        user_cache.set(username, user)
+    return user
+
+
+def get_user_by_token(db: Session, token: str) -> User | None:
+    """
+    User for a valid access token. Verified tokens are cached until the
+    cache TTL or the token's expiry, whichever comes first.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    user = token_cache.get(key)
+    if user is not None:
+        return user
+    
+    payload = decode_token(token)
+    if payload is None:
+        return None
+    user = get_user_by_username(db, payload["sub"])
+    if user is not None and "exp" in payload:
+        token_cache.set(key, user, ttl=payload["exp"] - time.time())
+    return user
+
+
+def invalidate_user(username: str) -> None:
+    """Forget cached lookups and verified tokens of a user."""
+    user_cache.delete(username)
+    token_cache.delete_where(lambda user: user.username == username)
+
+
+@event.listens_for(User, "after_insert")
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target: User) -> None:
+    # Covers renames too: the old username is in the attribute history
+    for username in {target.username, *inspect(target).attrs.username.history.deleted}:
+        invalidate_user(username)
+        change_service.record_with_connection(connection, change_service.USER, username)
 
 
 def create_user(db: Session, user: UserCreate) -> User:
@@ -23,11 +93,22 @@ def create_user(db: Session, user: UserCreate) -> User:
     return db_user
 
 
-def authenticate_user(db: Session, username: str, password: str) -> User | None:
-    """Authenticate a user by username and password."""
+async def login(db: Session, username: str, password: str, client_ip: Optional[str]) -> User | None:
+    """
+    Authenticate for a login request. Throttled usernames and clients are
+    rejected with LoginThrottled before any hashing; verification runs on
+    the hasher pool (HasherBusy when saturated).
+    """
+    user_key, ip_key = ("user", username.lower()), ("ip", client_ip)
+    retry_after = login_throttle.retry_after([user_key, ip_key])
+    if retry_after > 0:
+        raise LoginThrottled(retry_after)
+    
     user = get_user_by_username(db, username)
-    if not user:
-        return None
-    if not verify_password(password, user.hashed_password):
-        return None
-    return user
+    if user and await verify_password_async(password, user.hashed_password):
+        # Only the username is cleared, so one valid account can't reset a client's failures
+        login_throttle.success([user_key])
+        return user
+    
+    login_throttle.failure({user_key: settings.LOGIN_FREE_ATTEMPTS, ip_key: settings.LOGIN_FREE_ATTEMPTS_PER_IP})
+    return None
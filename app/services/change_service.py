@@ -0,0 +1,271 @@
+"""
+Cross-worker cache coherence. Writes record what they changed in the
+change_log table within their own transaction; every worker process reads
+the rows written by other processes and invalidates the matching entries
+of its in-process caches. On PostgreSQL, writers also NOTIFY so workers
+wake up at once instead of at the next poll.
+
+Caches covered: the suggest index (entries of changed files and folders),
+feed and sitemap documents, and the auth user/token caches. Download
+bodies are keyed by content hash, so they never go stale.
+"""
+import asyncio
+import os
+import select
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy import delete, func, insert, or_, select as sql_select, text
+from sqlalchemy.orm import Session
+from app.core import metrics
+from app.core.config import get_settings
+from app.db.database import SessionLocal, engine
+from app.models.change import ChangeLog
+
+settings = get_settings()
+
+FILE = "file"
+FOLDER = "folder"
+TREE = "tree"  # bulk change below a folder; key is the folder ID
+USER = "user"
+
+BATCH_SIZE = 1000
+GAP_TIMEOUT = 30.0  # seconds an ID gap waits for a slower transaction to commit
+PRUNE_EVERY = 60  # polls between deletions of rows older than CHANGE_LOG_RETENTION
+
+# Identifies this process in change_log.origin
+ORIGIN = f"{socket.gethostname()[:16]}-{os.getpid()}-{uuid.uuid4().hex[:6]}"[:32]
+
+CHANGES_APPLIED = metrics.registry.register(metrics.Counter(
+    "cache_changes_applied_total", "Changes from other workers applied to local caches.", ("kind",)
+))
+
+
+def _notify(db_or_connection) -> None:
+    if engine.dialect.name == "postgresql":
+        # Delivered when the transaction commits, and dropped if it rolls back
+        db_or_connection.execute(text(f"NOTIFY {settings.CHANGE_NOTIFY_CHANNEL}"))
+
+
+def record(db: Session, kind: str, key=None) -> None:
+    """Record a change in the session's transaction; commit it with the write."""
+    db.add(ChangeLog(kind=kind, key=None if key is None else str(key), origin=ORIGIN))
+    _notify(db)
+
+
+def record_with_connection(connection, kind: str, key=None) -> None:
+    """record() for mapper events, which get the flush's connection rather than the session."""
+    connection.execute(insert(ChangeLog.__table__).values(
+        kind=kind, key=None if key is None else str(key), origin=ORIGIN, created_at=datetime.utcnow()
+    ))
+    _notify(connection)
+
+
+class ChangeListener:
+    """
+    Applies other workers' changes to this process's caches. A daemon
+    thread polls change_log every `interval` seconds (or waits on LISTEN
+    on PostgreSQL) and hands each batch to the event loop, where the
+    caches are used, so no cache is mutated from two threads.
+    
+    Rows are read in ID order after the last applied ID. An ID missing
+    from a batch may belong to a transaction that has not committed yet,
+    so it is looked for again for GAP_TIMEOUT seconds. A worker that falls
+    behind rows already pruned clears its caches instead.
+    """
+    
+    def __init__(self, interval: float, retention: float):
+        self.interval = interval
+        self.retention = retention
+        self.last_id = 0
+        self.applied = 0
+        self._gaps: dict[int, float] = {}  # missing ID -> when first noticed
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[threading.Event] = None
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+    
+    def start(self) -> None:
+        """Start listening from the current end of the log; call from the event loop."""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        with SessionLocal() as db:
+            self.last_id = db.query(func.max(ChangeLog.id)).scalar() or 0
+        self._gaps.clear()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name="change-listener", daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join(timeout=self.interval + 5)
+        self._thread = None
+        self._loop = None
+    
+    def _run(self, stop: threading.Event) -> None:
+        listener = _PostgresListener() if engine.dialect.name == "postgresql" else None
+        polls = 0
+        try:
+            while not stop.is_set():
+                try:
+                    self.poll()
+                    polls += 1
+                    if polls % PRUNE_EVERY == 0:
+                        self.prune()
+                except Exception:
+                    # The database may be briefly unavailable; try again next interval
+                    pass
+                if listener is not None and listener.wait(self.interval):
+                    continue
+                stop.wait(self.interval)
+        finally:
+            if listener is not None:
+                listener.close()
+    
+    def poll(self) -> int:
+        """Fetch new changes and schedule them on the event loop; returns how many were read."""
+        now = time.monotonic()
+        self._gaps = {gap: seen for gap, seen in self._gaps.items() if now - seen < GAP_TIMEOUT}
+        condition = ChangeLog.id > self.last_id
+        if self._gaps:
+            condition = or_(condition, ChangeLog.id.in_(list(self._gaps)))
+        with SessionLocal() as db:
+            rows = db.execute(
+                sql_select(ChangeLog.id, ChangeLog.kind, ChangeLog.key, ChangeLog.origin)
+                .where(condition)
+                .order_by(ChangeLog.id)
+                .limit(BATCH_SIZE)
+            ).all()
+            if not rows:
+                return 0
+            
+            overrun = False
+            if self.last_id and rows[0].id > self.last_id + 1 and not self._gaps:
+                oldest = db.query(func.min(ChangeLog.id)).scalar()
+                overrun = oldest is not None and oldest > self.last_id + 1
+            for row in rows:
+                self._gaps.pop(row.id, None)
+                if row.id > self.last_id:
+                    self._gaps.update((missing, now) for missing in range(self.last_id + 1, row.id))
+                    self.last_id = row.id
+            if overrun:
+                # Rows this worker never saw were pruned; nothing cached can be trusted
+                self._gaps.clear()
+                self._schedule(_reset_all)
+                return len(rows)
+            
+            changes = [row for row in rows if row.origin != ORIGIN]
+            if changes:
+                self._schedule(_prepare(db, changes))
+        return len(rows)
+    
+    def prune(self) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+        with SessionLocal() as db:
+            db.execute(delete(ChangeLog).where(ChangeLog.created_at < cutoff))
+            db.commit()
+    
+    def _schedule(self, apply: Callable[[], int]) -> None:
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._apply, apply)
+    
+    def _apply(self, apply: Callable[[], int]) -> None:
+        self.applied += apply()
+    
+    def snapshot(self) -> dict:
+        return {
+            "running": self.running,
+            "origin": ORIGIN,
+            "last_id": self.last_id,
+            "pending_gaps": len(self._gaps),
+            "applied": self.applied,
+        }
+
+
+def _prepare(db: Session, changes: list) -> Callable[[], int]:
+    """
+    Read what the changes need from the database (in the listener thread)
+    and return a function applying them to the caches (on the event loop).
+    """
+    from app.services import auth_service, feed_service, suggest_service
+    
+    file_ids = {int(row.key) for row in changes if row.kind == FILE and row.key}
+    folder_ids = {int(row.key) for row in changes if row.kind == FOLDER and row.key}
+    usernames = {row.key for row in changes if row.kind == USER and row.key}
+    bulk = any(row.kind == TREE for row in changes)
+    entries = None if bulk else suggest_service.load_entries(db, file_ids, folder_ids)
+    
+    def apply() -> int:
+        if file_ids or folder_ids or bulk:
+            feed_service.invalidate()
+        if bulk:
+            suggest_service.invalidate()
+        else:
+            suggest_service.apply_entries(*entries)
+        for username in usernames:
+            auth_service.invalidate_user(username)
+        for row in changes:
+            CHANGES_APPLIED.inc((row.kind,))
+        return len(changes)
+    
+    return apply
+
+
+def _reset_all() -> int:
+    from app.services import auth_service, feed_service, suggest_service
+    
+    feed_service.invalidate()
+    suggest_service.invalidate()
+    auth_service.token_cache.clear()
+    auth_service.user_cache.clear()
+    return 0
+
+
+class _PostgresListener:
+    """LISTEN on a dedicated psycopg2 connection; wait() returns True when notified."""
+    
+    def __init__(self):
+        self.connection = None
+        try:
+            raw = engine.raw_connection()
+            driver = raw.driver_connection
+            if not hasattr(driver, "notifies") or not hasattr(driver, "poll"):
+                raw.close()
+                return  # not psycopg2: fall back to polling
+            driver.autocommit = True
+            with driver.cursor() as cursor:
+                cursor.execute(f"LISTEN {settings.CHANGE_NOTIFY_CHANNEL}")
+            self.connection = raw
+        except Exception:
+            self.connection = None
+    
+    def wait(self, timeout: float) -> bool:
+        if self.connection is None:
+            return False
+        driver = self.connection.driver_connection
+        if select.select([driver], [], [], timeout) == ([], [], []):
+            return True  # timed out; poll now anyway
+        driver.poll()
+        driver.notifies.clear()
+        return True
+    
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+
+
+change_listener = ChangeListener(settings.CHANGE_POLL_INTERVAL, settings.CHANGE_LOG_RETENTION)
+metrics.registry.register(metrics.Collected(
+    "change_log_last_applied_id", "Highest change_log ID this worker has read.", (),
+    lambda: [((), change_listener.last_id)]
+))
@@ -1,19 +1,182 @@
+import hashlib
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from io import BytesIO
-from typing import Optional
-import markdown
-from weasyprint import HTML, CSS
+from pathlib import Path
+from threading import Lock
+from typing import BinaryIO, Iterator, Optional
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.models.markdown import MarkdownFile
+from app.core import metrics, profiling
+from app.core.config import get_settings
+from app.db.blob_store import content_hash
+from app.models.markdown import ContentStorage, MarkdownFile
+from app.services import job_service, render_service
 
 
-def generate_markdown_file(file: MarkdownFile) -> tuple[BytesIO, str]:
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+PDF_JOB = "pdf_render"
+
+
+class EncodedBodyCache:
+    """LRU of UTF-8 encoded inline bodies keyed by content hash, bounded by total bytes."""
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, digest: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get(digest)
+            if data is None:
+                self.misses += 1
+            else:
+                self._items.move_to_end(digest)
+                self.hits += 1
+            return data
+    
+    def put(self, digest: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            if digest in self._items:
+                return
+            self._items[digest] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._size -= len(evicted)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._size = 0
+
+
+encoded_bodies = EncodedBodyCache(get_settings().DOWNLOAD_CACHE_SIZE)
+metrics.register_cache("download_bodies", encoded_bodies)
+
+
+@dataclass
+class MarkdownDownload:
+    """Encoded body of a markdown file plus what is needed to serve it."""
+    body: memoryview
+    filename: str
+    etag: str
+
+
+class RangeNotSatisfiable(ValueError):
+    """Raised when a Range header lies entirely outside the body."""
+
+
+def _iter_chunks(view: memoryview, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[memoryview]:
+    """Slice a view into chunks without copying."""
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+
+def generate_markdown_file(file: MarkdownFile) -> MarkdownDownload:
     """
     Generate a downloadable markdown file.
-    Returns a tuple of (file_content, filename).
+    Blob-backed bodies are served straight from their memory map; inline
+    bodies are encoded once and cached by content hash.
     """
-    content_bytes = BytesIO(file.content.encode('utf-8'))
     filename = f"{file.slug}.md"
-    return content_bytes, filename
+    if file.content_storage == ContentStorage.BLOB.value:
+        body = file.content_view()
+        digest = file.content_hash
+    else:
+        digest = file.content_hash
+        data = encoded_bodies.get(digest) if digest else None
+        if data is None:
+            data = file.inline_content.encode("utf-8")
+            digest = digest or content_hash(data)
+            encoded_bodies.put(digest, data)
+        body = memoryview(data)
+    return MarkdownDownload(body=body, filename=filename, etag=f'"{digest}"')
+
+
+def parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into inclusive (start, end) offsets.
+    Returns None for headers that should be ignored (other units, multiple
+    or malformed ranges), in which case the full body is served.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    if not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if first:
+        start, end = int(first), int(last) if last else size - 1
+        if start >= size:
+            raise RangeNotSatisfiable(header)
+        if end < start:
+            return None
+    else:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable(header)
+        start, end = max(size - length, 0), size - 1
+        if size == 0:
+            raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match style header against an ETag."""
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def markdown_response(file: MarkdownFile, request: Request) -> Response:
+    """
+    Serve a markdown download with Content-Length and ETag, answering
+    conditional requests with 304 and Range requests with 206.
+    """
+    download = generate_markdown_file(file)
+    size = len(download.body)
+    headers = {
+        "Content-Disposition": f"attachment; filename={download.filename}",
+        "ETag": download.etag,
+        "Accept-Ranges": "bytes",
+    }
+    if etag_matches(request.headers.get("if-none-match"), download.etag):
+        return Response(status_code=304, headers=headers)
+    
+    body, status_code = download.body, 200
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == download.etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range:
+            start, end = byte_range
+            body, status_code = download.body[start:end + 1], 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    headers["Content-Length"] = str(len(body))
+    return StreamingResponse(
+        _iter_chunks(body),
+        status_code=status_code,
+        media_type="text/markdown",
+        headers=headers
+    )
 
 
 def generate_pdf_file(file: MarkdownFile) -> tuple[BytesIO, str]:
@@ -21,15 +184,10 @@ def generate_pdf_file(file: MarkdownFile) -> tuple[BytesIO, str]:
     Generate a PDF from markdown content.
     Returns a tuple of (file_content, filename).
     """
+    started = time.perf_counter()
+    
     # Convert markdown to HTML
-    md = markdown.Markdown(extensions=[
-        'extra',
-        'codehilite',
-        'nl2br',
-        'sane_lists',
-        'tables'
-    ])
-    html_content = md.convert(file.content)
+    html_content = render_service.render_markdown(file.content)
     
     # Create a complete HTML document with styling
     full_html = f"""
@@ -184,10 +342,104 @@ def generate_pdf_file(file: MarkdownFile) -> tuple[BytesIO, str]:
     </html>
     """
     
-    # Generate PDF
+    # Generate PDF. WeasyPrint loads Pango and fontconfig when imported, so it
+    # is imported on the first PDF request rather than at worker startup.
+    from weasyprint import HTML
+    
     pdf_bytes = BytesIO()
-    HTML(string=full_html).write_pdf(pdf_bytes)
+    with profiling.span("weasyprint"):
+        HTML(string=full_html).write_pdf(pdf_bytes)
     pdf_bytes.seek(0)
+    metrics.PDF_RENDER_SECONDS.observe(time.perf_counter() - started)
     
     filename = f"{file.slug}.pdf"
     return pdf_bytes, filename
+
+
+def pdf_fingerprint(file: MarkdownFile) -> str:
+    """Hash of everything the PDF shows: title, body and the dates in its header."""
+    digest = file.content_hash or content_hash(file.content.encode("utf-8"))
+    parts = (file.title, digest, file.created_at.date().isoformat(), file.updated_at.date().isoformat())
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+def _pdf_path(file_id: int, fingerprint: str) -> Path:
+    return Path(get_settings().PDF_CACHE_DIR) / f"{file_id}-{fingerprint}.pdf"
+
+
+def cached_pdf(file: MarkdownFile) -> Optional[BinaryIO]:
+    """
+    The pre-rendered PDF of the file's current version opened for reading,
+    if there is one. An open file stays readable when a newer version
+    replaces it.
+    """
+    try:
+        return _pdf_path(file.id, pdf_fingerprint(file)).open("rb")
+    except FileNotFoundError:
+        return None
+
+
+def _iter_file(handle: BinaryIO, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+    with handle:
+        while chunk := handle.read(chunk_size):
+            yield chunk
+
+
+def store_pdf(file: MarkdownFile, data: bytes) -> Path:
+    """Save a rendered PDF for the file's current version and drop older versions."""
+    path = _pdf_path(file.id, pdf_fingerprint(file))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=".pdf-", delete=False) as f:
+        f.write(data)
+    os.replace(f.name, path)
+    for old in path.parent.glob(f"{file.id}-*.pdf"):
+        if old != path:
+            old.unlink(missing_ok=True)
+    return path
+
+
+def discard_pdfs(file_ids) -> None:
+    """Delete the pre-rendered PDFs of deleted files."""
+    directory = Path(get_settings().PDF_CACHE_DIR)
+    for file_id in file_ids:
+        for path in directory.glob(f"{file_id}-*.pdf"):
+            path.unlink(missing_ok=True)
+
+
+def schedule_pdf(db: Session, file: MarkdownFile) -> None:
+    """Queue rendering of the file's PDF after a write, when pre-rendering is on."""
+    if get_settings().PDF_PRERENDER and job_service.deferred():
+        job_service.enqueue(db, PDF_JOB, {"file_id": file.id}, key=f"{PDF_JOB}:{file.id}")
+
+
+@job_service.handler(PDF_JOB)
+def _render_pdf_job(db: Session, payload: dict) -> None:
+    file = db.get(MarkdownFile, payload["file_id"])
+    if file is None:
+        discard_pdfs([payload["file_id"]])
+        return
+    cached = cached_pdf(file)
+    if cached is not None:
+        cached.close()
+        return
+    content, _ = generate_pdf_file(file)
+    store_pdf(file, content.getvalue())
+
+
+async def pdf_response(file: MarkdownFile) -> Response:
+    """
+    Serve the pre-rendered PDF when it matches the file's current version,
+    otherwise render it now (and keep it if pre-rendering is on).
+    """
+    filename = f"{file.slug}.pdf"
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    cached = cached_pdf(file)
+    if cached is not None:
+        headers["Content-Length"] = str(os.fstat(cached.fileno()).st_size)
+        return StreamingResponse(_iter_file(cached), media_type="application/pdf", headers=headers)
+    
+    # WeasyPrint is CPU bound; keep it off the event loop
+    content_bytes, filename = await profiling.run_in_threadpool(generate_pdf_file, file)
+    if get_settings().PDF_PRERENDER:
+        await profiling.run_in_threadpool(store_pdf, file, content_bytes.getvalue())
+    return StreamingResponse(content_bytes, media_type="application/pdf", headers=headers)
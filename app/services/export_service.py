@@ -0,0 +1,290 @@
+"""Static site export: renders active documents to HTML files mirroring /files/ URLs."""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+from fastapi.templating import Jinja2Templates
+from sqlalchemy.orm import Session, selectinload
+from app.core.config import get_settings
+from app.db.blob_store import content_hash
+from app.models.link import FileLink
+from app.models.markdown import FileStatus, MarkdownFile
+from app.schemas.markdown import FileSummary, FolderContents
+from app.services import folder_service, link_service, markdown_service, render_service, section_service
+
+TEMPLATES_DIR = Path("app/templates")
+PAGE_TEMPLATES = ("base.html", "public_view.html", "index.html")
+STATIC_DIRS = ("static",)
+MANIFEST_NAME = ".build-manifest.json"
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 100
+FOLDER_DATA_DIR = "folders"  # folder contents for the exported home page, as /api/folders/{id}/contents returns them
+
+templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+
+
+@dataclass
+class PageJob:
+    """A page to render and the fingerprint it will be recorded under."""
+    file_id: int
+    path: str
+    fingerprint: str
+    backlinks: list[link_service.Backlink] = field(default_factory=list)
+
+
+@dataclass
+class ExportResult:
+    rendered: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    seconds: float = 0.0
+
+
+def templates_hash() -> str:
+    """Hash of everything that affects every page: templates and markdown extensions."""
+    digest = hashlib.sha256()
+    for name in PAGE_TEMPLATES:
+        digest.update((TEMPLATES_DIR / name).read_bytes())
+    digest.update(json.dumps(render_service.MARKDOWN_EXTENSIONS).encode())
+    return digest.hexdigest()
+
+
+def _write(path: Path, text: str) -> None:
+    """Write a file atomically so a web server never serves a half-written page."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def page_file(output_dir: Path, path: str) -> Path:
+    """Output location of a document; serve with e.g. nginx `try_files $uri $uri.html`."""
+    return output_dir / "files" / f"{path}.html"
+
+
+def plan_pages(db: Session, templates_digest: str) -> list[PageJob]:
+    """
+    Fingerprint every document the app serves publicly (active, and not
+    inside an archived folder) from lightweight columns only: content
+    hash, title, dates, URL path and backlinks.
+    """
+    tree = folder_service.get_folder_tree(db, include_archived=False)
+    files = (
+        db.query(
+            MarkdownFile.id, MarkdownFile.title, MarkdownFile.slug, MarkdownFile.folder_id,
+            MarkdownFile.content_hash, MarkdownFile.created_at, MarkdownFile.updated_at,
+        )
+        .filter(MarkdownFile.status == FileStatus.ACTIVE)
+        .order_by(MarkdownFile.id)
+        .all()
+    )
+    # The tree leaves out archived folders and everything below them
+    files = [file for file in files if file.folder_id is None or file.folder_id in tree]
+    paths = {}
+    for file in files:
+        folder = tree.get(file.folder_id)
+        paths[file.id] = f"{folder.path}/{file.slug}" if folder else file.slug
+    titles = {file.id: file.title for file in files}
+    
+    backlinks: dict[int, list[link_service.Backlink]] = {}
+    edges = (
+        db.query(FileLink.target_id, FileLink.source_id, FileLink.href)
+        .filter(FileLink.target_id != None)
+        .order_by(FileLink.id)
+    )
+    for target_id, source_id, href in edges:
+        if source_id not in titles or target_id not in titles:
+            continue
+        links = backlinks.setdefault(target_id, [])
+        if all(link.id != source_id for link in links):
+            links.append(link_service.Backlink(source_id, titles[source_id], paths[source_id], href))
+    
+    jobs = []
+    for file in files:
+        file_backlinks = sorted(backlinks.get(file.id, []), key=lambda link: (link.title, link.id))
+        # Rows saved before content hashing existed are hashed on the fly
+        digest = file.content_hash or content_hash(db.get(MarkdownFile, file.id).content.encode("utf-8"))
+        fingerprint = hashlib.sha256(json.dumps([
+            templates_digest,
+            digest,
+            file.title,
+            paths[file.id],
+            file.created_at.isoformat(),
+            file.updated_at.isoformat(),
+            [(link.id, link.title, link.path) for link in file_backlinks],
+        ]).encode()).hexdigest()
+        jobs.append(PageJob(file.id, paths[file.id], fingerprint, file_backlinks))
+    return jobs
+
+
+def _init_worker() -> None:
+    # Connections inherited from the parent process must not be reused
+    from app.db.database import engine
+    engine.dispose(close=False)
+
+
+def render_pages(jobs: list[PageJob], output_dir: str) -> int:
+    """Render a batch of documents with the public_view.html template. Returns the count."""
+    from app.db.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        files = {
+            file.id: file for file in
+            db.query(MarkdownFile)
+            .options(selectinload(MarkdownFile.sections))
+            .filter(MarkdownFile.id.in_([job.file_id for job in jobs]))
+        }
+        template = templates.get_template("public_view.html")
+        for job in jobs:
+            file = files.get(job.file_id)
+            if not file:
+                continue
+            html = template.render(
+                file=file,
+                content=render_service.render_markdown(file.content),
+                sections=section_service.get_sections(file),
+                backlinks=job.backlinks
+            )
+            _write(page_file(Path(output_dir), job.path), html)
+        return len(jobs)
+    finally:
+        db.close()
+
+
+def render_index(db: Session, output_dir: Path) -> None:
+    """
+    Render the home page (root folders and files) and the contents of every
+    active folder as folders/<id>.json, which the page opens folders from,
+    so browsing works without the app.
+    """
+    tree = folder_service.get_folder_tree(db, include_archived=False)
+    folders = [node for node in tree.values() if node.parent_id is None]
+    files = markdown_service.get_folder_files(db, None, include_archived=False)
+    html = templates.get_template("index.html").render(
+        files=files, folders=folders, folder_contents_url=f"/{FOLDER_DATA_DIR}/{{id}}.json"
+    )
+    _write(output_dir / "index.html", html)
+    render_folder_data(db, output_dir, tree)
+
+
+def render_folder_data(db: Session, output_dir: Path, tree: dict[int, folder_service.FolderNode]) -> None:
+    """Write folders/<id>.json for each folder in `tree` and delete those of other folders."""
+    files_by_folder: dict[int, list] = {}
+    rows = (
+        db.query(
+            MarkdownFile.id, MarkdownFile.title, MarkdownFile.slug, MarkdownFile.folder_id,
+            MarkdownFile.created_at, MarkdownFile.updated_at,
+        )
+        .filter(MarkdownFile.status == FileStatus.ACTIVE, MarkdownFile.folder_id != None)
+        .order_by(MarkdownFile.created_at.desc(), MarkdownFile.id.desc())
+    )
+    for row in rows:
+        files_by_folder.setdefault(row.folder_id, []).append(row)
+    
+    directory = output_dir / FOLDER_DATA_DIR
+    written = set()
+    for folder in tree.values():
+        contents = FolderContents(
+            folder=folder,
+            folders=folder.children,
+            files=[
+                FileSummary(
+                    id=file.id,
+                    title=file.title,
+                    slug=file.slug,
+                    url=f"/files/{folder.path}/{file.slug}",
+                    created_at=file.created_at,
+                    updated_at=file.updated_at
+                )
+                for file in files_by_folder.get(folder.id, [])
+            ]
+        )
+        name = f"{folder.id}.json"
+        _write(directory / name, contents.model_dump_json())
+        written.add(name)
+    if directory.is_dir():
+        for path in directory.glob("*.json"):
+            if path.name not in written:
+                path.unlink()
+
+
+def copy_static(output_dir: Path) -> None:
+    """Mirror static assets and uploads, copying only new or changed files."""
+    sources = [Path(name) for name in STATIC_DIRS] + [Path(get_settings().UPLOAD_DIR)]
+    for source in sources:
+        if not source.is_dir():
+            continue
+        for path in source.rglob("*"):
+            if not path.is_file():
+                continue
+            target = output_dir / source.name / path.relative_to(source)
+            stat = path.stat()
+            if target.exists():
+                target_stat = target.stat()
+                if target_stat.st_size == stat.st_size and target_stat.st_mtime >= stat.st_mtime:
+                    continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(path, target)
+
+
+def _load_manifest(output_dir: Path) -> dict[str, str]:
+    """Pages of the last export by path, with their fingerprints."""
+    try:
+        manifest = json.loads((output_dir / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+    pages = manifest.get("pages", {})
+    if manifest.get("version") != MANIFEST_VERSION:
+        # Its fingerprints cannot match, but its pages may still need removing
+        return dict.fromkeys(pages, "")
+    return pages
+
+
+def export_site(
+    db: Session,
+    output_dir: str,
+    workers: Optional[int] = None,
+    force: bool = False
+) -> ExportResult:
+    """
+    Export every public document to `output_dir`. Pages whose fingerprint
+    matches the build manifest are skipped unless `force` is set; pages of
+    documents that are gone, moved or no longer public are removed either
+    way. Stale pages render in a process pool of `workers` processes
+    (default: one per CPU).
+    """
+    started = time.perf_counter()
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    previous = _load_manifest(output)
+    
+    jobs = plan_pages(db, templates_hash())
+    stale = [job for job in jobs if force or previous.get(job.path) != job.fingerprint]
+    result = ExportResult(unchanged=len(jobs) - len(stale))
+    
+    chunks = [stale[i:i + CHUNK_SIZE] for i in range(0, len(stale), CHUNK_SIZE)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_worker) as pool:
+            result.rendered = sum(pool.map(render_pages, chunks, [output_dir] * len(chunks)))
+    else:
+        result.rendered = sum(render_pages(chunk, output_dir) for chunk in chunks)
+    
+    current = {job.path: job.fingerprint for job in jobs}
+    for path in previous.keys() - current.keys():
+        page_file(output, path).unlink(missing_ok=True)
+        result.removed += 1
+    
+    render_index(db, output)
+    copy_static(output)
+    _write(output / MANIFEST_NAME, json.dumps({"version": MANIFEST_VERSION, "pages": current}))
+    result.seconds = time.perf_counter() - started
+    return result
@@ -0,0 +1,228 @@
+"""Sitemap and Atom feed documents, cached until the next content write."""
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Lock
+from typing import Callable, Optional
+from xml.sax.saxutils import escape
+from fastapi import Request, Response
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core import metrics
+from app.core.config import get_settings
+from app.models.markdown import FileStatus, MarkdownFile
+from app.services import folder_service
+from app.services.download_service import etag_matches
+
+SITEMAP_MAX_URLS = 50000  # per file, as allowed by the sitemap protocol
+FEED_ENTRIES = 50
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+ATOM_NS = "http://www.w3.org/2005/Atom"
+
+# Without SITE_URL, documents are cached with this in place of the site URL
+# and each response fills in its request's, so the cache holds one copy of
+# each document whatever Host headers clients send.
+SITE_PLACEHOLDER = "\ue002site\ue002"
+
+
+@dataclass
+class CachedDocument:
+    body: bytes
+    etag: str
+
+
+class DocumentCache:
+    """
+    Generated documents keyed by name. Writes bump the generation, so a
+    document built from data that changed mid-build is never stored.
+    """
+    
+    def __init__(self):
+        self._documents: dict[tuple, CachedDocument] = {}
+        self._generation = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: tuple, build: Callable[[], Optional[bytes]]) -> Optional[CachedDocument]:
+        with self._lock:
+            document = self._documents.get(key)
+            generation = self._generation
+            if document is not None:
+                self.hits += 1
+                return document
+            self.misses += 1
+        
+        body = build()
+        if body is None:
+            return None
+        document = CachedDocument(body, f'"{hashlib.sha256(body).hexdigest()}"')
+        with self._lock:
+            if generation == self._generation:
+                self._documents[key] = document
+        return document
+    
+    def invalidate(self) -> None:
+        with self._lock:
+            self._documents.clear()
+            self._generation += 1
+
+
+cache = DocumentCache()
+metrics.register_cache("feed_documents", cache)
+
+
+def invalidate() -> None:
+    """Drop cached documents; called after file and folder writes."""
+    cache.invalidate()
+
+
+def base_url(request: Request) -> str:
+    """Absolute site URL: SITE_URL if configured, otherwise the request's."""
+    return (get_settings().SITE_URL or str(request.base_url)).rstrip("/")
+
+
+def _cached_site() -> str:
+    """Site URL written into cached documents; see SITE_PLACEHOLDER."""
+    return get_settings().SITE_URL.rstrip("/") or SITE_PLACEHOLDER
+
+
+def _timestamp(value: datetime) -> str:
+    # Stored datetimes are naive UTC
+    return value.replace(microsecond=0).isoformat() + "Z"
+
+
+def _active_files(db: Session):
+    return db.query(MarkdownFile).filter(MarkdownFile.status == FileStatus.ACTIVE)
+
+
+def _file_urls(db: Session, site: str, rows) -> list[tuple[str, datetime, str]]:
+    """(URL, updated_at, title) for lightweight file rows."""
+    tree = folder_service.get_folder_tree(db, include_archived=True)
+    urls = []
+    for row in rows:
+        folder = tree.get(row.folder_id)
+        path = f"{folder.path}/{row.slug}" if folder else row.slug
+        urls.append((f"{site}/files/{path}", row.updated_at, row.title))
+    return urls
+
+
+def _urlset(urls: list[tuple[str, datetime, str]]) -> bytes:
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<urlset xmlns="{SITEMAP_NS}">']
+    for url, updated_at, _ in urls:
+        lines.append(f"<url><loc>{escape(url)}</loc><lastmod>{_timestamp(updated_at)}</lastmod></url>")
+    lines.append("</urlset>")
+    return "\n".join(lines).encode("utf-8")
+
+
+def _page_starts(db: Session) -> list[int]:
+    """ID of the first file on each sitemap page, found in one pass over the IDs."""
+    numbered = (
+        _active_files(db)
+        .with_entities(MarkdownFile.id, func.row_number().over(order_by=MarkdownFile.id).label("number"))
+        .subquery()
+    )
+    return [
+        row.id for row in
+        db.query(numbered.c.id)
+        .filter((numbered.c.number - 1) % SITEMAP_MAX_URLS == 0)
+        .order_by(numbered.c.id)
+    ]
+
+
+def build_sitemap(db: Session, site: str, page: int = 0) -> Optional[bytes]:
+    """
+    Page 0 is /sitemap.xml: a plain sitemap up to SITEMAP_MAX_URLS files,
+    otherwise an index of /sitemap-N.xml pages (1-based) ordered by file ID.
+    Each page is an ID range, so no page skips over the files before it.
+    Returns None for pages past the end.
+    """
+    starts = _page_starts(db)
+    pages = max(len(starts), 1)
+    if page == 0 and pages > 1:
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>', f'<sitemapindex xmlns="{SITEMAP_NS}">']
+        for number in range(1, pages + 1):
+            lines.append(f"<sitemap><loc>{escape(site)}/sitemap-{number}.xml</loc></sitemap>")
+        lines.append("</sitemapindex>")
+        return "\n".join(lines).encode("utf-8")
+    if page > pages or (page == 1 and pages == 1):
+        return None
+    
+    query = _active_files(db).with_entities(
+        MarkdownFile.slug, MarkdownFile.folder_id, MarkdownFile.updated_at, MarkdownFile.title
+    )
+    index = max(page - 1, 0)
+    if index < len(starts):
+        query = query.filter(MarkdownFile.id >= starts[index])
+    if index + 1 < len(starts):
+        query = query.filter(MarkdownFile.id < starts[index + 1])
+    rows = query.order_by(MarkdownFile.id).all()
+    return _urlset(_file_urls(db, site, rows))
+
+
+def build_feed(db: Session, site: str) -> bytes:
+    """Atom feed of the most recently updated active files."""
+    rows = (
+        _active_files(db)
+        .with_entities(MarkdownFile.slug, MarkdownFile.folder_id, MarkdownFile.updated_at, MarkdownFile.title)
+        .order_by(MarkdownFile.updated_at.desc())
+        .limit(FEED_ENTRIES)
+        .all()
+    )
+    entries = _file_urls(db, site, rows)
+    updated = _timestamp(entries[0][1]) if entries else _timestamp(datetime.utcnow())
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        f'<feed xmlns="{ATOM_NS}">',
+        f"<title>{escape(get_settings().APP_NAME)}</title>",
+        f"<id>{escape(site)}/feed.atom</id>",
+        f'<link rel="self" href="{escape(site)}/feed.atom"/>',
+        f'<link href="{escape(site)}/"/>',
+        f"<updated>{updated}</updated>",
+    ]
+    for url, updated_at, title in entries:
+        lines.extend([
+            "<entry>",
+            f"<title>{escape(title)}</title>",
+            f'<link href="{escape(url)}"/>',
+            f"<id>{escape(url)}</id>",
+            f"<updated>{_timestamp(updated_at)}</updated>",
+            "</entry>",
+        ])
+    lines.append("</feed>")
+    return "\n".join(lines).encode("utf-8")
+
+
+def document_response(document: Optional[CachedDocument], request: Request, media_type: str) -> Response:
+    """
+    Serve a cached document with its ETag; 304 when the client's copy is
+    current. A placeholder site URL is replaced with the request's, and the
+    ETag then covers that URL too, so a copy made for one host is never
+    confirmed as current for another.
+    """
+    if document is None:
+        return Response(status_code=404)
+    body, etag = document.body, document.etag
+    headers = {"Cache-Control": "no-cache"}
+    if not get_settings().SITE_URL:
+        site = escape(base_url(request))
+        etag = f'"{hashlib.sha256((document.etag + site).encode("utf-8")).hexdigest()}"'
+        headers["Vary"] = "Host"
+    headers["ETag"] = etag
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if not get_settings().SITE_URL:
+        body = body.replace(SITE_PLACEHOLDER.encode("utf-8"), site.encode("utf-8"))
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def sitemap_response(db: Session, request: Request, page: int = 0) -> Response:
+    site = _cached_site()
+    document = cache.get(("sitemap", page), lambda: build_sitemap(db, site, page))
+    return document_response(document, request, "application/xml")
+
+
+def feed_response(db: Session, request: Request) -> Response:
+    site = _cached_site()
+    document = cache.get(("feed",), lambda: build_feed(db, site))
+    return document_response(document, request, "application/atom+xml")
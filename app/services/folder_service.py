@@ -1,15 +1,28 @@
-from sqlalchemy.orm import Session
+from dataclasses import dataclass, field
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session, aliased, selectinload
 from typing import List, Optional
-from app.models.markdown import Folder, FileStatus
+from app.models.link import FileLink
+from app.models.markdown import Folder, FileStatus, MarkdownFile
+from app.models.metadata import FileMetadata, FileTag
+from app.models.revision import FileRevision
+from app.models.section import FileSection
 from app.schemas.markdown import FolderCreate, FolderUpdate
+from app.services import (
+    change_service, download_service, feed_service, link_service, markdown_service, search_service, suggest_service
+)
+from app.services.pagination import Page, paginate
 
 
 def create_folder(db: Session, folder: FolderCreate) -> Folder:
     """Create a new folder."""
     db_folder = Folder(**folder.model_dump())
     db.add(db_folder)
+    db.flush()
+    change_service.record(db, change_service.FOLDER, db_folder.id)
     db.commit()
     db.refresh(db_folder)
+    suggest_service.folder_changed(db_folder)
     return db_folder
 
 
@@ -31,6 +44,46 @@ def get_all_folders(db: Session, include_archived: bool = False) -> List[Folder]
     return query.order_by(Folder.name).all()
 
 
+# Sort keys accepted by list_folders, each paired with Folder.id as tie-breaker
+FOLDER_SORTS = {
+    "name": Folder.name,
+    "created_at": Folder.created_at,
+}
+
+
+def list_folders(
+    db: Session,
+    include_archived: bool = False,
+    parent_id: Optional[int] = None,
+    root_only: bool = False,
+    status: Optional[FileStatus] = None,
+    sort: str = "name",
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    with_total: bool = True,
+) -> Page:
+    """Get one page of folders."""
+    query = db.query(Folder)
+    if not include_archived:
+        query = query.filter(Folder.status == FileStatus.ACTIVE)
+    if status is not None:
+        query = query.filter(Folder.status == status)
+    if root_only:
+        query = query.filter(Folder.parent_id == None)
+    elif parent_id is not None:
+        query = query.filter(Folder.parent_id == parent_id)
+    
+    return paginate(
+        query,
+        sort,
+        FOLDER_SORTS[sort.lstrip("-")],
+        Folder.id,
+        cursor=cursor,
+        limit=limit,
+        with_total=with_total,
+    )
+
+
 def get_root_folders(db: Session, include_archived: bool = False) -> List[Folder]:
     """Get all root folders (folders without a parent)."""
     query = db.query(Folder).filter(Folder.parent_id == None)
@@ -39,50 +92,195 @@ def get_root_folders(db: Session, include_archived: bool = False) -> List[Folder
     return query.order_by(Folder.name).all()
 
 
-def update_folder(db: Session, folder_id: int, folder_update: FolderUpdate) -> Optional[Folder]:
-    """Update a folder."""
+@dataclass
+class FolderNode:
+    """Lightweight folder entry in the folder tree."""
+    id: int
+    name: str
+    slug: str
+    parent_id: Optional[int]
+    path: str = ""
+    file_count: int = 0
+    children: list["FolderNode"] = field(default_factory=list)
+    
+    @property
+    def folder_count(self) -> int:
+        return len(self.children)
+
+
+def get_folder_tree(db: Session, include_archived: bool = False) -> dict[int, FolderNode]:
+    """
+    Build the folder tree in a single pass over lightweight folder rows.
+    Returns every reachable folder by ID in depth-first name order, each with
+    its URL path, its direct file count and its children sorted by name.
+    Folders whose parent is hidden (e.g. archived) are left out.
+    """
+    query = db.query(Folder.id, Folder.name, Folder.slug, Folder.parent_id)
+    if not include_archived:
+        query = query.filter(Folder.status == FileStatus.ACTIVE)
+    rows = query.order_by(Folder.name, Folder.id).all()
+    
+    nodes = {row.id: FolderNode(row.id, row.name, row.slug, row.parent_id) for row in rows}
+    roots = []
+    for node in nodes.values():
+        if node.parent_id is None:
+            roots.append(node)
+        elif node.parent_id in nodes:
+            nodes[node.parent_id].children.append(node)
+    
+    # Assign paths top-down; anything not reached hangs off a hidden folder
+    tree = {}
+    stack = [(node, node.slug) for node in reversed(roots)]
+    while stack:
+        node, path = stack.pop()
+        node.path = path
+        tree[node.id] = node
+        stack.extend((child, f"{path}/{child.slug}") for child in reversed(node.children))
+    
+    counts = db.query(MarkdownFile.folder_id, func.count(MarkdownFile.id)).filter(MarkdownFile.folder_id != None)
+    if not include_archived:
+        counts = counts.filter(MarkdownFile.status == FileStatus.ACTIVE)
+    for folder_id, count in counts.group_by(MarkdownFile.folder_id):
+        if folder_id in tree:
+            tree[folder_id].file_count = count
+    
+    return tree
+
+
+def get_subtree_ids(folder: FolderNode) -> list[int]:
+    """IDs of a folder tree node and all of its descendants."""
+    ids = []
+    stack = [folder]
+    while stack:
+        node = stack.pop()
+        ids.append(node.id)
+        stack.extend(node.children)
+    return ids
+
+
+def get_folder_paths(db: Session, folder_ids, include_archived: bool = False) -> dict[int, str]:
+    """
+    Slug paths of the given folders in one query, walking up their parents
+    with a recursive CTE. Folders that are archived or below an archived
+    folder are left out unless `include_archived`.
+    """
+    folder_ids = {folder_id for folder_id in folder_ids if folder_id is not None}
+    if not folder_ids:
+        return {}
+    base = select(Folder.id.label("folder_id"), Folder.parent_id, Folder.slug.label("path")).where(
+        Folder.id.in_(folder_ids)
+    )
+    if not include_archived:
+        base = base.where(Folder.status == FileStatus.ACTIVE)
+    chain = base.cte("chain", recursive=True)
+    parent = aliased(Folder)
+    step = (
+        select(chain.c.folder_id, parent.parent_id, parent.slug + "/" + chain.c.path)
+        .join(parent, parent.id == chain.c.parent_id)
+    )
+    if not include_archived:
+        step = step.where(parent.status == FileStatus.ACTIVE)
+    chain = chain.union_all(step)
+    rows = db.execute(select(chain.c.folder_id, chain.c.path).where(chain.c.parent_id.is_(None)))
+    return dict(rows.all())
+
+
+def update_folder(
+    db: Session,
+    folder_id: int,
+    folder_update: FolderUpdate,
+    rewrite_links: bool = False
+) -> Optional[Folder]:
+    """
+    Update a folder. Renaming or moving it changes the paths of every file
+    below it; see markdown_service.relocate_files for `rewrite_links`.
+    """
     db_folder = get_folder(db, folder_id)
     if not db_folder:
         return None
     
+    previous_location = (db_folder.slug, db_folder.parent_id)
     update_data = folder_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_folder, field, value)
     
+    if (db_folder.slug, db_folder.parent_id) != previous_location:
+        db.flush()
+        tree = get_folder_tree(db, include_archived=True)
+        if folder_id in tree:
+            folder_ids = get_subtree_ids(tree[folder_id])
+            files = (
+                db.query(MarkdownFile)
+                .options(selectinload(MarkdownFile.links))
+                .filter(MarkdownFile.folder_id.in_(folder_ids))
+                .all()
+            )
+            markdown_service.relocate_files(db, files, rewrite_links)
+    change_service.record(db, change_service.FOLDER, folder_id)
+    
     db.commit()
     db.refresh(db_folder)
+    suggest_service.folder_changed(db_folder)
+    feed_service.invalidate()
     return db_folder
 
 
-def delete_folder(db: Session, folder_id: int) -> bool:
-    """Delete a folder and all its files."""
+def delete_folder(db: Session, folder_id: int, rewrite_links: bool = False) -> bool:
+    """
+    Delete a folder and all its files. Its subfolders are kept and become
+    top-level folders, which changes the paths of the files below them; see
+    markdown_service.relocate_files for `rewrite_links`. Rows belonging to
+    the deleted files are removed in bulk rather than loaded one file at a
+    time for the ORM cascade.
+    """
     db_folder = get_folder(db, folder_id)
     if not db_folder:
         return False
     
-    db.delete(db_folder)
+    # Subfolders move to the top level, and with them every file below them
+    tree = get_folder_tree(db, include_archived=True)
+    promoted_ids = get_subtree_ids(tree[folder_id])[1:] if folder_id in tree else []
+    
+    file_ids = [row.id for row in db.query(MarkdownFile.id).filter(MarkdownFile.folder_id == folder_id)]
+    search_service.remove_files(db, file_ids)
+    link_service.detach_inbound(db, file_ids)
+    if file_ids:
+        for column in (FileTag.file_id, FileMetadata.file_id, FileRevision.file_id,
+                       FileSection.file_id, FileLink.source_id):
+            db.execute(delete(column.class_).where(column.in_(file_ids)))
+        db.execute(delete(MarkdownFile).where(MarkdownFile.id.in_(file_ids)))
+    db.execute(update(Folder).where(Folder.parent_id == folder_id).values(parent_id=None))
+    db.execute(delete(Folder).where(Folder.id == folder_id))
+    if promoted_ids:
+        files = (
+            db.query(MarkdownFile)
+            .options(selectinload(MarkdownFile.links))
+            .filter(MarkdownFile.folder_id.in_(promoted_ids))
+            .all()
+        )
+        markdown_service.relocate_files(db, files, rewrite_links)
+    change_service.record(db, change_service.TREE, folder_id)
     db.commit()
+    suggest_service.invalidate()
+    feed_service.invalidate()
+    download_service.discard_pdfs(file_ids)
     return True
 
 
 def toggle_archive_folder(db: Session, folder_id: int) -> Optional[Folder]:
-    """Toggle archive status of a folder and all its files."""
+    """Toggle archive status of a folder; its subfolders and all their files follow it."""
     db_folder = get_folder(db, folder_id)
     if not db_folder:
         return None
     
-    # Toggle folder status
     new_status = FileStatus.ARCHIVED if db_folder.status == FileStatus.ACTIVE else FileStatus.ACTIVE
-    db_folder.status = new_status
-    
-    # Toggle status of all files in the folder
-    for file in db_folder.files:
-        file.status = new_status
-    
-    # Recursively toggle subfolders
-    for subfolder in db_folder.subfolders:
-        toggle_archive_folder(db, subfolder.id)
+    folder_ids = get_subtree_ids(get_folder_tree(db, include_archived=True)[folder_id])
+    db.execute(update(Folder).where(Folder.id.in_(folder_ids)).values(status=new_status))
+    db.execute(update(MarkdownFile).where(MarkdownFile.folder_id.in_(folder_ids)).values(status=new_status))
+    change_service.record(db, change_service.TREE, folder_id)
     
     db.commit()
     db.refresh(db_folder)
+    suggest_service.invalidate()
+    feed_service.invalidate()
     return db_folder
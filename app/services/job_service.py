@@ -0,0 +1,366 @@
+"""
+Durable background jobs for derived work, stored in the jobs table.
+
+Writes queue jobs with enqueue() in their own transaction, so a job
+exists exactly when the write committed. Worker threads started with the
+app claim jobs by priority, run their handler in a fresh session and
+commit; a failed job is retried with exponential backoff until
+JOB_MAX_ATTEMPTS. Claims take a lease: a job whose worker died (or whose
+process was restarted) is picked up again once the lease runs out, so
+queued work survives restarts. Several worker processes may share the
+table; a conditional UPDATE decides which one gets a job, and jobs with
+the same key never run concurrently.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy import and_, delete, event, exists, func, or_, select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, aliased
+from app.core import metrics
+from app.core.config import get_settings
+from app.db.database import SessionLocal
+from app.models.job import Job
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STATUSES = (PENDING, RUNNING, DONE, FAILED)
+
+CLAIM_CANDIDATES = 8  # jobs looked at per claim; others may be taking the first ones
+
+# Identifies this process in jobs.worker
+ORIGIN = f"{socket.gethostname()[:16]}-{os.getpid()}-{uuid.uuid4().hex[:6]}"[:32]
+
+JOBS_PROCESSED = metrics.registry.register(metrics.Counter(
+    "jobs_processed_total", "Background jobs run, by kind and result (done, retry, failed).", ("kind", "result")
+))
+JOB_SECONDS = metrics.registry.register(metrics.Histogram(
+    "job_duration_seconds", "Time to run a background job's handler.", ("kind",)
+))
+
+# kind -> handler(db, payload); the runner commits after the handler returns
+_handlers: dict[str, Callable[[Session, dict], None]] = {}
+
+
+def handler(kind: str):
+    """Register the function running jobs of `kind`; it gets a session and the payload."""
+    def register(function: Callable[[Session, dict], None]):
+        _handlers[kind] = function
+        return function
+    return register
+
+
+def deferred() -> bool:
+    """Whether derived work goes through the queue; when False, callers do it inline."""
+    return settings.JOBS_ENABLED
+
+
+def enqueue(db: Session, kind: str, payload: dict, key: Optional[str] = None,
+            priority: int = 0, delay: float = 0) -> None:
+    """
+    Queue a job in the session's transaction; it becomes visible when the
+    caller commits. A pending job with the same key is replaced (payload,
+    priority and start time) instead of queuing a second one.
+    """
+    run_after = datetime.utcnow() + timedelta(seconds=delay)
+    db.info["jobs_enqueued"] = True
+    if key is not None:
+        replaced = db.execute(
+            update(Job)
+            .where(Job.key == key, Job.status == PENDING)
+            .values(payload=payload, priority=priority, run_after=run_after, attempts=0, last_error=None)
+        ).rowcount
+        if replaced:
+            return
+    db.add(Job(kind=kind, key=key, payload=payload, priority=priority, run_after=run_after, status=PENDING))
+
+
+def _claimable(now: datetime):
+    """Pending jobs that are due, and running jobs whose lease expired, unless their key is running."""
+    other = aliased(Job)
+    key_running = exists().where(
+        other.key == Job.key, other.id != Job.id, other.status == RUNNING, other.locked_until >= now
+    )
+    return and_(
+        or_(
+            and_(Job.status == PENDING, Job.run_after <= now),
+            and_(Job.status == RUNNING, Job.locked_until < now, Job.attempts < settings.JOB_MAX_ATTEMPTS),
+        ),
+        or_(Job.key.is_(None), ~key_running),
+    )
+
+
+def claim(db: Session, worker: str = ORIGIN) -> Optional[Job]:
+    """Take the highest priority due job, or None. Commits the claim."""
+    now = datetime.utcnow()
+    candidates = db.execute(
+        select(Job.id).where(_claimable(now)).order_by(Job.priority.desc(), Job.id).limit(CLAIM_CANDIDATES)
+    ).scalars().all()
+    for job_id in candidates:
+        claimed = db.execute(
+            update(Job)
+            .where(Job.id == job_id, _claimable(now))
+            .values(
+                status=RUNNING,
+                attempts=Job.attempts + 1,
+                locked_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                worker=worker,
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed:
+            db.commit()
+            return db.get(Job, job_id)
+    db.rollback()
+    return None
+
+
+def backoff(attempts: int) -> float:
+    """Seconds before retry number `attempts`."""
+    return min(settings.JOB_RETRY_BASE * 2 ** (attempts - 1), settings.JOB_RETRY_MAX)
+
+
+def run(db: Session, job: Job) -> str:
+    """Run a claimed job and record the outcome; returns done, retry or failed."""
+    kind, job_id, attempts, payload = job.kind, job.id, job.attempts, dict(job.payload or {})
+    function = _handlers.get(kind)
+    error = None
+    with JOB_SECONDS.time((kind,)):
+        try:
+            if function is None:
+                raise LookupError(f"No handler for job kind {kind!r}")
+            function(db, payload)
+            db.commit()
+        except Exception:
+            db.rollback()
+            error = traceback.format_exc(limit=5)
+    
+    values = {"locked_until": None}
+    if error is None:
+        result = DONE
+        values.update(status=DONE, finished_at=datetime.utcnow(), last_error=None)
+    elif attempts < settings.JOB_MAX_ATTEMPTS and function is not None:
+        result = "retry"
+        values.update(
+            status=PENDING, last_error=error, run_after=datetime.utcnow() + timedelta(seconds=backoff(attempts))
+        )
+    else:
+        result = FAILED
+        values.update(status=FAILED, finished_at=datetime.utcnow(), last_error=error)
+    # Only if still ours: an expired lease may have handed the job to another worker
+    db.execute(
+        update(Job).where(Job.id == job_id, Job.status == RUNNING, Job.attempts == attempts).values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    JOBS_PROCESSED.inc((kind, result))
+    return result
+
+
+def run_pending(db: Session, limit: Optional[int] = None) -> int:
+    """Run due jobs in this thread until none is left (or `limit`); returns how many ran."""
+    count = 0
+    while limit is None or count < limit:
+        job = claim(db)
+        if job is None:
+            break
+        run(db, job)
+        db.expunge_all()
+        count += 1
+    return count
+
+
+def expire_abandoned(db: Session) -> int:
+    """Fail running jobs whose lease expired after their last attempt."""
+    now = datetime.utcnow()
+    count = db.execute(
+        update(Job)
+        .where(Job.status == RUNNING, Job.locked_until < now, Job.attempts >= settings.JOB_MAX_ATTEMPTS)
+        .values(status=FAILED, finished_at=now, locked_until=None, last_error="Worker stopped during the last attempt")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return count
+
+
+def prune(db: Session) -> int:
+    """Delete finished jobs older than JOB_RETENTION seconds."""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_RETENTION)
+    count = db.execute(
+        delete(Job).where(Job.status.in_([DONE, FAILED]), Job.finished_at < cutoff)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return count
+
+
+def retry(db: Session, job_id: int) -> Optional[Job]:
+    """Queue a failed job again with a fresh attempt count; None if it is not failed."""
+    updated = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == FAILED)
+        .values(status=PENDING, attempts=0, run_after=datetime.utcnow(), finished_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if not updated:
+        return None
+    runner.wake()
+    return db.get(Job, job_id)
+
+
+def get_job(db: Session, job_id: int) -> Optional[Job]:
+    return db.get(Job, job_id)
+
+
+def describe(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "key": job.key,
+        "payload": job.payload,
+        "priority": job.priority,
+        "status": job.status,
+        "attempts": job.attempts,
+        "run_after": job.run_after,
+        "locked_until": job.locked_until,
+        "worker": job.worker,
+        "last_error": job.last_error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def status(db: Session, job_status: Optional[str] = None, kind: Optional[str] = None, limit: int = 50) -> dict:
+    """Job counts by status and kind, age of the oldest due job, this process's workers and recent jobs."""
+    counts = {name: {} for name in STATUSES}
+    for row in db.query(Job.status, Job.kind, func.count()).group_by(Job.status, Job.kind):
+        counts.setdefault(row[0], {})[row[1]] = row[2]
+    oldest = db.query(func.min(Job.run_after)).filter(Job.status == PENDING).scalar()
+    
+    query = db.query(Job)
+    if job_status is not None:
+        query = query.filter(Job.status == job_status)
+    if kind is not None:
+        query = query.filter(Job.kind == kind)
+    jobs = query.order_by(Job.id.desc()).limit(limit).all()
+    return {
+        "counts": counts,
+        "oldest_pending_seconds": max((datetime.utcnow() - oldest).total_seconds(), 0) if oldest else None,
+        "workers": runner.snapshot(),
+        "jobs": [describe(job) for job in jobs],
+    }
+
+
+class JobRunner:
+    """
+    Worker threads of this process. Each claims and runs jobs until none
+    is due, then sleeps for `interval` seconds or until a commit in this
+    process queued a job. One thread also fails abandoned jobs and prunes
+    old ones every `maintenance_interval` seconds.
+    """
+    
+    def __init__(self, workers: int, interval: float, maintenance_interval: float = 60.0):
+        self.workers = workers
+        self.interval = interval
+        self.maintenance_interval = maintenance_interval
+        self.processed = 0
+        self.busy = 0
+        self._wake = threading.Event()
+        self._stop: Optional[threading.Event] = None
+        self._threads: list[threading.Thread] = []
+        self._lock = threading.Lock()
+    
+    @property
+    def running(self) -> bool:
+        return bool(self._threads)
+    
+    def start(self) -> None:
+        if self.running or self.workers <= 0:
+            return
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._work, args=(self._stop, n == 0), name=f"job-worker-{n}", daemon=True)
+            for n in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+    
+    def stop(self, timeout: float = 10.0) -> None:
+        """Stop after the current jobs; a job still running at `timeout` is rerun after its lease."""
+        if not self.running:
+            return
+        self._stop.set()
+        self._wake.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(timeout=max(deadline - time.monotonic(), 0))
+        self._threads = []
+    
+    def wake(self) -> None:
+        self._wake.set()
+    
+    def _work(self, stop: threading.Event, maintenance: bool) -> None:
+        last_maintenance = 0.0
+        while not stop.is_set():
+            try:
+                with SessionLocal() as db:
+                    if maintenance and time.monotonic() - last_maintenance > self.maintenance_interval:
+                        last_maintenance = time.monotonic()
+                        expire_abandoned(db)
+                        prune(db)
+                    while not stop.is_set():
+                        job = claim(db)
+                        if job is None:
+                            break
+                        with self._lock:
+                            self.busy += 1
+                        try:
+                            run(db, job)
+                        finally:
+                            with self._lock:
+                                self.busy -= 1
+                                self.processed += 1
+                        db.expunge_all()
+            except OperationalError as exc:
+                # The database may be briefly unavailable or locked; try again next interval
+                logger.warning("Job worker could not reach the database: %s", exc.orig)
+            except Exception:
+                logger.exception("Job worker failed while polling or claiming jobs")
+            if self._wake.wait(self.interval):
+                self._wake.clear()
+    
+    def snapshot(self) -> dict:
+        return {
+            "origin": ORIGIN,
+            "threads": len(self._threads),
+            "busy": self.busy,
+            "processed": self.processed,
+        }
+
+
+runner = JobRunner(settings.JOB_WORKERS, settings.JOB_POLL_INTERVAL)
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_runner(session: Session) -> None:
+    # Jobs queued by this process can run right away instead of at the next poll
+    if session.info.pop("jobs_enqueued", False):
+        runner.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_enqueued(session: Session) -> None:
+    session.info.pop("jobs_enqueued", None)
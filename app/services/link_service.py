@@ -0,0 +1,300 @@
+"""Internal link graph: links extracted at write time, resolved against folder/slug paths."""
+import posixpath
+import re
+from dataclasses import dataclass
+from typing import Iterator, Optional
+from urllib.parse import unquote
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm import Session, aliased
+from app.models.link import FileLink
+from app.models.markdown import FileStatus, Folder, MarkdownFile
+from app.services.section_service import FENCE
+
+FILES_PREFIX = "/files/"
+
+INLINE_LINK = re.compile(r"(?<!!)\[(?:[^\[\]]|\[[^\]]*\])*\]\(\s*<?([^)\s>]+)>?(?:\s+[\"'(][^)]*)?\)")
+REFERENCE_DEFINITION = re.compile(r"^[ ]{0,3}\[[^\]]+\]:\s*<?([^\s>]+)>?")
+INLINE_CODE = re.compile(r"(`+).+?\1")
+URL_SCHEME = re.compile(r"^[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+
+@dataclass
+class Backlink:
+    """A file linking to another file."""
+    id: int
+    title: str
+    path: str
+    href: str
+
+
+@dataclass
+class BrokenLink:
+    """A link whose target path does not exist."""
+    source_id: int
+    source_title: str
+    source_path: str
+    href: str
+    target_path: str
+
+
+def iter_hrefs(content: str) -> Iterator[tuple[int, int, str]]:
+    """
+    Yield (start, end, href) character spans of link destinations,
+    skipping images, fenced code blocks and inline code.
+    """
+    offset = 0
+    fence: Optional[str] = None
+    for line in content.splitlines(keepends=True):
+        start, offset = offset, offset + len(line)
+        fence_match = FENCE.match(line)
+        if fence:
+            if fence_match and fence_match.group(1)[0] == fence[0] and len(fence_match.group(1)) >= len(fence):
+                fence = None
+            continue
+        if fence_match:
+            fence = fence_match.group(1)
+            continue
+        
+        masked = INLINE_CODE.sub(lambda m: " " * len(m.group(0)), line)
+        definition = REFERENCE_DEFINITION.match(masked)
+        matches = [definition] if definition else INLINE_LINK.finditer(masked)
+        for match in matches:
+            yield start + match.start(1), start + match.end(1), match.group(1)
+
+
+def resolve_href(href: str, base_dir: str) -> Optional[str]:
+    """
+    Target path of an internal link, or None for external links and
+    anything outside /files/. Relative hrefs resolve against the source's
+    folder path, as a browser would on the file's page.
+    """
+    if href.startswith(("#", "//")) or URL_SCHEME.match(href):
+        return None
+    path = unquote(re.split(r"[?#]", href, 1)[0])
+    if not path:
+        return None
+    if not path.startswith("/"):
+        path = posixpath.join(FILES_PREFIX + base_dir, path)
+    path = posixpath.normpath(path)
+    if not path.startswith(FILES_PREFIX):
+        return None
+    return path[len(FILES_PREFIX):].strip("/") or None
+
+
+def folder_path(db: Session, folder_id: Optional[int], cache: Optional[dict] = None) -> str:
+    """Slug path of a folder ("" for the root)."""
+    if folder_id is None:
+        return ""
+    if cache is not None and folder_id in cache:
+        return cache[folder_id]
+    folder = db.query(Folder.slug, Folder.parent_id).filter(Folder.id == folder_id).first()
+    if not folder:
+        return ""
+    parent = folder_path(db, folder.parent_id, cache)
+    path = f"{parent}/{folder.slug}" if parent else folder.slug
+    if cache is not None:
+        cache[folder_id] = path
+    return path
+
+
+def preload_folder_paths(db: Session, folder_ids, cache: dict) -> dict:
+    """
+    Fill a folder_path cache for folders and all their ancestors with one
+    query per tree level, instead of one query per folder and level.
+    """
+    rows = {}
+    pending = {folder_id for folder_id in folder_ids if folder_id is not None and folder_id not in cache}
+    while pending:
+        level = db.query(Folder.id, Folder.slug, Folder.parent_id).filter(Folder.id.in_(pending)).all()
+        rows.update((row.id, row) for row in level)
+        pending = {
+            row.parent_id for row in level
+            if row.parent_id is not None and row.parent_id not in rows and row.parent_id not in cache
+        }
+    
+    def resolve(folder_id: int) -> str:
+        if folder_id in cache:
+            return cache[folder_id]
+        chain = []
+        while folder_id is not None and folder_id not in cache and folder_id in rows:
+            chain.append(rows[folder_id])
+            folder_id = rows[folder_id].parent_id
+        path = cache.get(folder_id, "") if folder_id is not None else ""
+        for row in reversed(chain):
+            path = f"{path}/{row.slug}" if path else row.slug
+            cache[row.id] = path
+        return path
+    
+    for folder_id in list(rows):
+        resolve(folder_id)
+    return cache
+
+
+def file_path(db: Session, file: MarkdownFile, cache: Optional[dict] = None) -> str:
+    """Slug path of a file, as used in /files/ URLs."""
+    parent = folder_path(db, file.folder_id, cache)
+    return f"{parent}/{file.slug}" if parent else file.slug
+
+
+def filter_path(query, path: str):
+    """
+    Restrict a MarkdownFile query to the file at a slug path. The folders
+    are matched with one join per level, so the lookup stays a single
+    query however deep the path is.
+    """
+    parts = path.strip("/").split("/")
+    parent_id = None  # ID column of the previous level's folder
+    for folder_slug in parts[:-1]:
+        folder = aliased(Folder)
+        query = query.join(folder, (folder.slug == folder_slug) & (folder.parent_id == parent_id))
+        parent_id = folder.id
+    return query.filter(MarkdownFile.slug == parts[-1], MarkdownFile.folder_id == parent_id)
+
+
+def resolve_path(db: Session, path: str) -> Optional[int]:
+    """ID of the file at a slug path in any status, or None."""
+    target = filter_path(db.query(MarkdownFile.id), path).first()
+    return target.id if target else None
+
+
+def update_file_links(db: Session, file: MarkdownFile, path: str, resolved: Optional[dict] = None) -> None:
+    """
+    Replace a file's outbound link rows from its current content (committed
+    with the session). `resolved` caches target path lookups across calls.
+    """
+    base_dir = posixpath.dirname(path)
+    links = []
+    if resolved is None:
+        resolved = {}
+    seen = set()
+    for _, _, href in iter_hrefs(file.content):
+        target_path = resolve_href(href, base_dir)
+        if target_path is None or href in seen:
+            continue
+        seen.add(href)
+        if target_path not in resolved:
+            resolved[target_path] = resolve_path(db, target_path)
+        links.append(FileLink(href=href, target_path=target_path, target_id=resolved[target_path]))
+    file.links = links
+
+
+def attach_inbound(db: Session, file_id: int, path: str) -> None:
+    """Resolve broken links that point at a file's (new) path."""
+    db.execute(
+        update(FileLink)
+        .where(FileLink.target_id == None, FileLink.target_path == path)
+        .values(target_id=file_id)
+    )
+
+
+def attach_inbound_many(db: Session, paths: dict[int, str]) -> None:
+    """attach_inbound for several files (file ID -> path) in one executemany."""
+    if paths:
+        table = FileLink.__table__
+        db.execute(
+            update(table)
+            .where(table.c.target_id == None, table.c.target_path == bindparam("new_path"))
+            .values(target_id=bindparam("file_id")),
+            [{"file_id": file_id, "new_path": path} for file_id, path in paths.items()]
+        )
+
+
+def detach_inbound(db: Session, file_ids: list[int]) -> None:
+    """Mark links to files that were removed or moved as broken."""
+    if file_ids:
+        db.execute(
+            update(FileLink)
+            .where(FileLink.target_id.in_(file_ids))
+            .values(target_id=None)
+        )
+
+
+def inbound_links(db: Session, file_ids: list[int]) -> list[FileLink]:
+    """Links pointing at any of the given files."""
+    if not file_ids:
+        return []
+    return db.query(FileLink).filter(FileLink.target_id.in_(file_ids)).all()
+
+
+def rewrite_hrefs(content: str, replacements: dict[str, str]) -> str:
+    """Replace link destinations by exact href, keeping everything else as written."""
+    parts = []
+    position = 0
+    for start, end, href in iter_hrefs(content):
+        if href in replacements:
+            parts.append(content[position:start])
+            parts.append(replacements[href])
+            position = end
+    parts.append(content[position:])
+    return "".join(parts)
+
+
+def moved_href(href: str, new_path: str) -> str:
+    """Absolute href to a new path, keeping the original query and fragment."""
+    suffix = re.search(r"[?#].*$", href)
+    return FILES_PREFIX + new_path + (suffix.group(0) if suffix else "")
+
+
+def get_backlinks(db: Session, file_id: int, active_only: bool = True) -> list[Backlink]:
+    """Files linking to a file, ordered by title."""
+    query = (
+        db.query(MarkdownFile, FileLink.href)
+        .join(FileLink, FileLink.source_id == MarkdownFile.id)
+        .filter(FileLink.target_id == file_id)
+    )
+    if active_only:
+        query = query.filter(MarkdownFile.status == FileStatus.ACTIVE)
+    rows = query.order_by(MarkdownFile.title, MarkdownFile.id).all()
+    cache = preload_folder_paths(db, {source.folder_id for source, _ in rows}, {})
+    backlinks = []
+    seen = set()
+    for source, href in rows:
+        if source.id not in seen:
+            seen.add(source.id)
+            backlinks.append(Backlink(source.id, source.title, file_path(db, source, cache), href))
+    return backlinks
+
+
+def get_broken_links(db: Session, limit: Optional[int] = None) -> list[BrokenLink]:
+    """
+    Unresolved links, ordered by source title. The graph is kept current
+    at write time, so this is an indexed lookup, not a scan of every document.
+    """
+    query = (
+        db.query(MarkdownFile, FileLink)
+        .join(FileLink, FileLink.source_id == MarkdownFile.id)
+        .filter(FileLink.target_id == None)
+        .order_by(MarkdownFile.title, FileLink.id)
+    )
+    if limit:
+        query = query.limit(limit)
+    rows = query.all()
+    cache = preload_folder_paths(db, {source.folder_id for source, _ in rows}, {})
+    return [
+        BrokenLink(source.id, source.title, file_path(db, source, cache), link.href, link.target_path)
+        for source, link in rows
+    ]
+
+
+def backfill(db: Session, batch_size: int = 500) -> int:
+    """Re-extract links of every file. Returns the number of files processed."""
+    count = 0
+    last_id = 0
+    cache: dict = {}
+    while True:
+        batch = (
+            db.query(MarkdownFile)
+            .filter(MarkdownFile.id > last_id)
+            .order_by(MarkdownFile.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for file in batch:
+            update_file_links(db, file, file_path(db, file, cache))
+        db.commit()
+        count += len(batch)
+        last_id = batch[-1].id
+        db.expunge_all()
+    return count
@@ -1,7 +1,19 @@
-from sqlalchemy.orm import Session, joinedload
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import bindparam, cast, func, select, update, LargeBinary
+from sqlalchemy.orm import Session, joinedload, load_only
 from typing import Optional
-from app.models.markdown import MarkdownFile, FileStatus
+from app.models.markdown import Folder, MarkdownFile, FileStatus
+from app.models.metadata import FileTag, FileMetadata
 from app.schemas.markdown import MarkdownCreate, MarkdownUpdate
+from app.services import (
+    change_service, download_service, feed_service, job_service, link_service, metadata_service,
+    revision_service, search_service, section_service, suggest_service
+)
+from app.services.pagination import Page, paginate
+
+INDEX_JOB = "file_index"
+INDEX_PRIORITY = 10  # ahead of PDF rendering: search, tags and sections should follow saves quickly
 
 
 def get_file_by_id(db: Session, file_id: int) -> Optional[MarkdownFile]:
@@ -24,14 +36,130 @@ def get_file_by_slug(db: Session, slug: str, folder_id: Optional[int] = None, ac
     return query.first()
 
 
+def available_slug(db: Session, slug: str, folder_id: Optional[int] = None) -> str:
+    """`slug`, or the first free `slug-N` if it is taken in the folder by a file in any status."""
+    taken = {
+        row.slug for row in
+        db.query(MarkdownFile.slug)
+        .filter(
+            MarkdownFile.folder_id == folder_id,
+            (MarkdownFile.slug == slug) | MarkdownFile.slug.startswith(f"{slug}-", autoescape=True)
+        )
+    }
+    if slug not in taken:
+        return slug
+    counter = 1
+    while f"{slug}-{counter}" in taken:
+        counter += 1
+    return f"{slug}-{counter}"
+
+
+def get_file_by_path(db: Session, path: str, active_only: bool = True) -> Optional[MarkdownFile]:
+    """
+    Get markdown file by its path of folder slugs ending in the file slug,
+    e.g. "guides/setup/install". Returns None if any part does not exist.
+    """
+    query = link_service.filter_path(db.query(MarkdownFile).options(joinedload(MarkdownFile.folder)), path)
+    if active_only:
+        query = query.filter(MarkdownFile.status == FileStatus.ACTIVE)
+    return query.first()
+
+
+# Columns needed to render file listings; the content body is never loaded
+LIST_COLUMNS = (
+    MarkdownFile.id,
+    MarkdownFile.title,
+    MarkdownFile.slug,
+    MarkdownFile.folder_id,
+    MarkdownFile.status,
+    MarkdownFile.created_at,
+    MarkdownFile.updated_at,
+)
+
+
 def get_all_files(db: Session, include_archived: bool = False) -> list[MarkdownFile]:
-    """Get all markdown files."""
-    query = db.query(MarkdownFile).options(joinedload(MarkdownFile.folder))
+    """Get all markdown files without loading their content."""
+    query = db.query(MarkdownFile).options(
+        load_only(*LIST_COLUMNS),
+        joinedload(MarkdownFile.folder)
+    )
     if not include_archived:
         query = query.filter(MarkdownFile.status == FileStatus.ACTIVE)
     return query.order_by(MarkdownFile.created_at.desc()).all()
 
 
+def get_folder_files(db: Session, folder_id: Optional[int], include_archived: bool = False) -> list[MarkdownFile]:
+    """Get the files directly inside a folder (the root when folder_id is None) without their content."""
+    query = db.query(MarkdownFile).options(load_only(*LIST_COLUMNS))
+    if folder_id is not None:
+        query = query.filter(MarkdownFile.folder_id == folder_id)
+    else:
+        query = query.filter(MarkdownFile.folder_id == None)
+    if not include_archived:
+        query = query.filter(MarkdownFile.status == FileStatus.ACTIVE)
+    return query.order_by(MarkdownFile.created_at.desc(), MarkdownFile.id.desc()).all()
+
+
+# Sort keys accepted by list_files, each paired with MarkdownFile.id as tie-breaker
+FILE_SORTS = {
+    "created_at": MarkdownFile.created_at,
+    "name": MarkdownFile.title,
+}
+
+
+def list_files(
+    db: Session,
+    include_archived: bool = False,
+    folder_id: Optional[int] = None,
+    root_only: bool = False,
+    status: Optional[FileStatus] = None,
+    updated_since: Optional[datetime] = None,
+    tags: Optional[list[str]] = None,
+    metadata: Optional[dict[str, str]] = None,
+    sort: str = "-created_at",
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    with_total: bool = True,
+) -> Page:
+    """
+    Get one page of markdown files without loading their content.
+    `tags` and `metadata` filter on front matter; every tag and every
+    key/value pair must match.
+    """
+    query = db.query(MarkdownFile).options(
+        load_only(*LIST_COLUMNS),
+        joinedload(MarkdownFile.folder)
+    )
+    if not include_archived:
+        query = query.filter(MarkdownFile.status == FileStatus.ACTIVE)
+    if status is not None:
+        query = query.filter(MarkdownFile.status == status)
+    if root_only:
+        query = query.filter(MarkdownFile.folder_id == None)
+    elif folder_id is not None:
+        query = query.filter(MarkdownFile.folder_id == folder_id)
+    if updated_since is not None:
+        query = query.filter(MarkdownFile.updated_at >= updated_since)
+    for tag in tags or []:
+        query = query.filter(MarkdownFile.id.in_(
+            select(FileTag.file_id).where(FileTag.tag == tag.strip().lower())
+        ))
+    for key, value in (metadata or {}).items():
+        query = query.filter(MarkdownFile.id.in_(
+            select(FileMetadata.file_id).where(FileMetadata.key == key, FileMetadata.value == value)
+        ))
+    
+    return paginate(
+        query,
+        sort,
+        FILE_SORTS[sort.lstrip("-")],
+        MarkdownFile.id,
+        cursor=cursor,
+        limit=limit,
+        with_total=with_total,
+    )
+
+
 def create_file(db: Session, file: MarkdownCreate) -> MarkdownFile:
     """Create a new markdown file."""
     db_file = MarkdownFile(
@@ -42,37 +170,146 @@ def create_file(db: Session, file: MarkdownCreate) -> MarkdownFile:
         status=FileStatus.ACTIVE
     )
     db.add(db_file)
+    db.flush()
+    revision_service.record_revision(db, db_file)
+    schedule_index(db, db_file)
+    download_service.schedule_pdf(db, db_file)
+    path = link_service.file_path(db, db_file)
+    link_service.update_file_links(db, db_file, path)
+    link_service.attach_inbound(db, db_file.id, path)
+    change_service.record(db, change_service.FILE, db_file.id)
     db.commit()
     db.refresh(db_file)
+    suggest_service.file_changed(db_file)
+    feed_service.invalidate()
     return db_file
 
 
-def update_file(db: Session, file_id: int, file_update: MarkdownUpdate) -> MarkdownFile | None:
-    """Update an existing markdown file."""
+def update_file(
+    db: Session,
+    file_id: int,
+    file_update: MarkdownUpdate,
+    rewrite_links: bool = False
+) -> MarkdownFile | None:
+    """
+    Update an existing markdown file. When its slug or folder changes,
+    inbound links are rewritten to the new path if `rewrite_links` is set
+    and reported as broken otherwise.
+    """
     db_file = get_file_by_id(db, file_id)
     if not db_file:
         return None
     
+    previous_title, previous_content = db_file.title, db_file.content
+    previous_location = (db_file.slug, db_file.folder_id)
     update_data = file_update.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_file, field, value)
     
+    # Autosave resends unchanged fields, so derived data only follows real changes
+    content_changed = db_file.content != previous_content
+    if content_changed or db_file.title != previous_title:
+        revision_service.record_revision(db, db_file, previous_content, previous_title)
+        schedule_index(db, db_file)
+        download_service.schedule_pdf(db, db_file)
+    if (db_file.slug, db_file.folder_id) != previous_location:
+        relocate_files(db, [db_file], rewrite_links)
+    elif content_changed:
+        link_service.update_file_links(db, db_file, link_service.file_path(db, db_file))
+    change_service.record(db, change_service.FILE, file_id)
+    
     db.commit()
     db.refresh(db_file)
+    suggest_service.file_changed(db_file)
+    feed_service.invalidate()
     return db_file
 
 
+def index_file(db: Session, file: MarkdownFile) -> None:
+    """Rebuild a file's tags and metadata, sections and search entry from its current content."""
+    metadata_service.update_file_metadata(file)
+    section_service.update_file_sections(file)
+    search_service.index_file(db, file)
+
+
+def schedule_index(db: Session, file: MarkdownFile) -> None:
+    """
+    Bring what is derived from a file's content up to date after a write:
+    as a background job, or within the session when jobs are disabled.
+    Repeated saves before the job runs share one job. The revision and the
+    link graph are not derived here; callers update them in the write.
+    """
+    if not job_service.deferred():
+        index_file(db, file)
+        return
+    job_service.enqueue(db, INDEX_JOB, {"file_id": file.id}, key=f"{INDEX_JOB}:{file.id}", priority=INDEX_PRIORITY)
+
+
+@job_service.handler(INDEX_JOB)
+def _index_job(db: Session, payload: dict) -> None:
+    file = db.get(MarkdownFile, payload["file_id"])
+    if file is not None:
+        index_file(db, file)
+
+
 def delete_file(db: Session, file_id: int) -> bool:
     """Hard delete a markdown file."""
     db_file = get_file_by_id(db, file_id)
     if not db_file:
         return False
     
+    search_service.remove_files(db, [file_id])
     db.delete(db_file)
+    link_service.detach_inbound(db, [file_id])
+    change_service.record(db, change_service.FILE, file_id)
     db.commit()
+    suggest_service.file_removed(file_id)
+    feed_service.invalidate()
+    download_service.discard_pdfs([file_id])
     return True
 
 
+def relocate_files(db: Session, files: list[MarkdownFile], rewrite_links: bool = False) -> None:
+    """
+    Bring the link graph up to date after files moved to new paths, within
+    the caller's transaction: their own relative links are re-resolved,
+    links to their old paths are rewritten in bulk (or left broken), and
+    broken links that match a new path are resolved.
+    """
+    db.flush()
+    cache = link_service.preload_folder_paths(db, {file.folder_id for file in files}, {})
+    paths = {file.id: link_service.file_path(db, file, cache) for file in files}
+    resolved: dict = {}
+    for file in files:
+        link_service.update_file_links(db, file, paths[file.id], resolved)
+    db.flush()
+    
+    stale = [
+        link for link in link_service.inbound_links(db, list(paths))
+        if link.target_path != paths[link.target_id]
+    ]
+    if rewrite_links:
+        replacements = defaultdict(dict)
+        for link in stale:
+            replacements[link.source_id][link.href] = link_service.moved_href(link.href, paths[link.target_id])
+        sources = db.query(MarkdownFile).filter(MarkdownFile.id.in_(list(replacements))).all()
+        link_service.preload_folder_paths(db, {source.folder_id for source in sources}, cache)
+        for source in sources:
+            source_replacements = replacements[source.id]
+            previous_content = source.content
+            source.content = link_service.rewrite_hrefs(previous_content, source_replacements)
+            revision_service.record_revision(db, source, previous_content, source.title)
+            schedule_index(db, source)
+            download_service.schedule_pdf(db, source)
+            link_service.update_file_links(db, source, link_service.file_path(db, source, cache))
+    else:
+        for link in stale:
+            link.target_id = None
+    db.flush()
+    
+    link_service.attach_inbound_many(db, paths)
+
+
 def toggle_archive(db: Session, file_id: int) -> MarkdownFile | None:
     """Toggle archive status of a markdown file."""
     db_file = get_file_by_id(db, file_id)
@@ -83,7 +320,44 @@ def toggle_archive(db: Session, file_id: int) -> MarkdownFile | None:
         db_file.status = FileStatus.ARCHIVED
     else:
         db_file.status = FileStatus.ACTIVE
+    change_service.record(db, change_service.FILE, file_id)
     
     db.commit()
     db.refresh(db_file)
+    suggest_service.file_changed(db_file)
+    feed_service.invalidate()
     return db_file
+
+
+def stored_content_size(db: Session) -> int:
+    """Total bytes of markdown content as stored in the database."""
+    return db.query(func.coalesce(func.sum(func.length(cast(MarkdownFile.content, LargeBinary))), 0)).scalar()
+
+
+def rewrite_content(db: Session, batch_size: int = 200) -> int:
+    """
+    Re-store every file's content with the current compression settings.
+    Works in batches of `batch_size` rows, committing after each batch.
+    Returns the number of rows rewritten.
+    """
+    statement = (
+        update(MarkdownFile.__table__)
+        .where(MarkdownFile.__table__.c.id == bindparam("row_id"))
+        .values(content=bindparam("new_content"))
+    )
+    count = 0
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(MarkdownFile.id, MarkdownFile.content)
+            .where(MarkdownFile.id > last_id)
+            .order_by(MarkdownFile.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.execute(statement, [{"row_id": row.id, "new_content": row.content} for row in rows])
+        db.commit()
+        count += len(rows)
+        last_id = rows[-1].id
+    return count
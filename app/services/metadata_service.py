@@ -0,0 +1,120 @@
+"""Front matter parsing and the tag/metadata index built from it."""
+from datetime import date, datetime
+from typing import Any
+import yaml
+from sqlalchemy.orm import Session
+from app.models.markdown import MarkdownFile
+from app.models.metadata import FileTag, FileMetadata
+
+FRONT_MATTER_DELIMITER = "---"
+
+
+def _front_matter_block(content: str) -> tuple[str, int] | None:
+    """YAML text of a front matter block at the very start of a document and the block's length."""
+    if not content.startswith(FRONT_MATTER_DELIMITER):
+        return None
+    
+    lines = content.split("\n", 1)
+    if lines[0].strip() != FRONT_MATTER_DELIMITER or len(lines) < 2:
+        return None
+    
+    body = lines[1]
+    position = 0
+    for line in body.splitlines(keepends=True):
+        if line.rstrip() in (FRONT_MATTER_DELIMITER, "..."):
+            return body[:position], len(lines[0]) + 1 + position + len(line)
+        position += len(line)
+    return None
+
+
+def front_matter_length(content: str) -> int:
+    """Number of characters taken by the front matter block, 0 if there is none."""
+    block = _front_matter_block(content)
+    return block[1] if block else 0
+
+
+def parse_front_matter(content: str) -> dict[str, Any]:
+    """
+    Parse a YAML front matter block at the very start of a document.
+    Returns an empty dict if there is none or it is not a valid mapping.
+    """
+    block = _front_matter_block(content)
+    if block is None:
+        return {}
+    
+    try:
+        data = yaml.safe_load(block[0])
+    except yaml.YAMLError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _scalar(value: Any) -> str | None:
+    """String form of a scalar front matter value, None for nested structures."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (str, int, float)):
+        return str(value).strip() or None
+    return None
+
+
+def extract(front_matter: dict[str, Any]) -> tuple[set[str], set[tuple[str, str]]]:
+    """
+    Split front matter into normalised tags and (key, value) metadata pairs.
+    Tags may be a list or a comma-separated string; list values of other
+    keys produce one pair per item; nested mappings are ignored.
+    """
+    tags = set()
+    raw_tags = front_matter.get("tags", [])
+    if isinstance(raw_tags, str):
+        raw_tags = raw_tags.split(",")
+    if isinstance(raw_tags, list):
+        for raw_tag in raw_tags:
+            tag = _scalar(raw_tag)
+            if tag:
+                tags.add(tag.lower())
+    
+    pairs = set()
+    for key, raw_value in front_matter.items():
+        key = str(key).strip().lower()
+        if key == "tags" or not key:
+            continue
+        values = raw_value if isinstance(raw_value, list) else [raw_value]
+        for item in values:
+            value = _scalar(item)
+            if value:
+                pairs.add((key, value))
+    
+    return tags, pairs
+
+
+def update_file_metadata(file: MarkdownFile) -> None:
+    """Replace a file's tag and metadata rows from its current content (committed with the session)."""
+    tags, pairs = extract(parse_front_matter(file.content))
+    file.tags = [FileTag(tag=tag) for tag in sorted(tags)]
+    file.meta = [FileMetadata(key=key, value=value) for key, value in sorted(pairs)]
+
+
+def backfill(db: Session, batch_size: int = 500) -> int:
+    """Re-extract metadata for every file. Returns the number of files processed."""
+    count = 0
+    last_id = 0
+    while True:
+        batch = (
+            db.query(MarkdownFile)
+            .filter(MarkdownFile.id > last_id)
+            .order_by(MarkdownFile.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for file in batch:
+            update_file_metadata(file)
+        db.commit()
+        count += len(batch)
+        last_id = batch[-1].id
+        db.expunge_all()
+    return count
@@ -0,0 +1,99 @@
+"""Keyset (cursor) pagination for listing queries."""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded."""
+
+
+@dataclass
+class Page:
+    """A single page of results."""
+    items: list
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+def encode_cursor(sort: str, value: Any, row_id: int) -> str:
+    """Encode the position after a row as an opaque, URL-safe cursor."""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({"s": sort, "v": value, "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, sort: str, column) -> tuple[Any, int]:
+    """Decode a cursor produced by `encode_cursor` for the given sort."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value, row_id = payload["v"], int(payload["i"])
+        if payload["s"] != sort:
+            raise InvalidCursor("Cursor does not match the requested sort order")
+        if column.type.python_type is datetime:
+            value = datetime.fromisoformat(value)
+    except InvalidCursor:
+        raise
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+    return value, row_id
+
+
+def paginate(
+    query: Query,
+    sort: str,
+    sort_column,
+    id_column,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    with_total: bool = True,
+) -> Page:
+    """
+    Return one page of `query` ordered by (sort_column, id_column).
+
+    A leading "-" on `sort` means descending order. The cursor carries the
+    last row's sort key so each page is an index range scan regardless of
+    how deep into the result set it is.
+    """
+    descending = sort.startswith("-")
+    total = query.order_by(None).count() if with_total else None
+
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort, sort_column)
+        position = tuple_(sort_column, id_column)
+        if descending:
+            query = query.filter(position < tuple_(value, row_id))
+        else:
+            query = query.filter(position > tuple_(value, row_id))
+
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, getattr(last, sort_column.key), getattr(last, id_column.key))
+
+    return Page(items=rows, next_cursor=next_cursor, total=total)
+
+
+def page_headers(page: Page) -> dict[str, str]:
+    """Response headers describing a page's position in the full result set."""
+    headers = {}
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    if page.total is not None:
+        headers["X-Total-Count"] = str(page.total)
+    return headers
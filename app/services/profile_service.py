@@ -0,0 +1,260 @@
+"""On-demand request profiling for admins: call tree, SQL and render timings, stored as JSON reports."""
+import cProfile
+import json
+import os
+import pstats
+import re
+import secrets
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+from fastapi import HTTPException, Request
+from app.core import profiling
+from app.core.config import get_settings
+from app.db.database import SessionLocal
+from app.dependencies import get_current_user, oauth2_scheme
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY = re.compile(rb"(^|&)_profile=(1|true|yes)(&|$)")
+REPORT_ID = re.compile(r"^\d{8}T\d{6}-[0-9a-f]{6}$")
+TREE_MAX_DEPTH = 30
+TREE_MAX_CHILDREN = 12
+TREE_MIN_SHARE = 0.005  # of the profiled time; smaller branches are dropped
+TOP_FUNCTIONS = 40
+
+# cProfile hooks the whole thread, so only one request at a time gets a call tree
+_profiler_lock = threading.Lock()
+
+
+def profile_dir() -> Path:
+    return Path(get_settings().PROFILE_DIR)
+
+
+def wants_profile(scope) -> bool:
+    """True if the request asks to be profiled with `X-Profile: 1` or `?_profile=1`."""
+    if PROFILE_QUERY.search(scope.get("query_string", b"")):
+        return True
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value.lower() in (b"1", b"true", b"yes")
+    return False
+
+
+async def authorize(scope) -> Optional[str]:
+    """Username of the requesting user if get_current_user accepts them, otherwise None."""
+    request = Request(scope)
+    db = SessionLocal()
+    try:
+        user = await get_current_user(
+            request,
+            token=await oauth2_scheme(request),
+            access_token=request.cookies.get("access_token"),
+            db=db
+        )
+        return user.username
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+
+def _function_name(func: tuple) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name  # built-in
+    return f"{name} ({_short_path(filename)}:{line})"
+
+
+def _short_path(filename: str) -> str:
+    index = filename.rfind("site-packages/")
+    if index != -1:
+        return filename[index + len("site-packages/"):]
+    index = filename.rfind("/lib/python3")
+    if index != -1:
+        # Standard library: drop the interpreter prefix and version directory
+        return filename[filename.index("/", index + len("/lib/")) + 1:]
+    cwd = os.getcwd() + os.sep
+    return filename[len(cwd):] if filename.startswith(cwd) else filename
+
+
+def call_tree(stats: pstats.Stats) -> list[dict]:
+    """
+    Call tree rebuilt from cProfile's caller/callee totals. A function
+    called from several places appears under each caller with the time
+    spent on that edge; branches below TREE_MIN_SHARE are dropped.
+    """
+    raw = stats.stats
+    children: dict[tuple, list[tuple]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, []).append((func, edge))
+    
+    roots = [func for func, (_, _, _, _, callers) in raw.items() if not callers]
+    total = sum(raw[func][3] for func in roots) or 1e-9
+    
+    def node(func: tuple, calls: int, own: float, cumulative: float, path: frozenset, depth: int) -> dict:
+        entry = {
+            "function": _function_name(func),
+            "calls": calls,
+            "own_ms": round(own * 1000, 3),
+            "total_ms": round(cumulative * 1000, 3),
+            "children": [],
+        }
+        if depth < TREE_MAX_DEPTH:
+            edges = sorted(children.get(func, ()), key=lambda item: item[1][3], reverse=True)
+            for child, (_, child_calls, child_own, child_cumulative) in edges[:TREE_MAX_CHILDREN]:
+                if child in path or child_cumulative < total * TREE_MIN_SHARE:
+                    continue
+                entry["children"].append(
+                    node(child, child_calls, child_own, child_cumulative, path | {child}, depth + 1)
+                )
+        return entry
+    
+    roots.sort(key=lambda func: raw[func][3], reverse=True)
+    return [
+        node(func, raw[func][1], raw[func][2], raw[func][3], frozenset([func]), 0)
+        for func in roots
+        if raw[func][3] >= total * TREE_MIN_SHARE
+    ]
+
+
+def top_functions(stats: pstats.Stats, limit: int = TOP_FUNCTIONS) -> list[dict]:
+    """Functions with the most own time."""
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [
+        {
+            "function": _function_name(func),
+            "calls": calls,
+            "own_ms": round(own * 1000, 3),
+            "total_ms": round(cumulative * 1000, 3),
+        }
+        for func, (_, calls, own, cumulative, _) in rows
+    ]
+
+
+def new_report_id() -> str:
+    return f"{datetime.utcnow():%Y%m%dT%H%M%S}-{secrets.token_hex(3)}"
+
+
+def save_report(report: dict) -> None:
+    """Write a report and keep only the newest PROFILE_KEEP."""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{report['id']}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(report), encoding="utf-8")
+    os.replace(tmp, path)
+    
+    reports = sorted(directory.glob("*.json"))
+    for old in reports[:max(len(reports) - get_settings().PROFILE_KEEP, 0)]:
+        old.unlink(missing_ok=True)
+
+
+def get_report(report_id: str) -> Optional[dict]:
+    if not REPORT_ID.match(report_id):
+        return None
+    path = profile_dir() / f"{report_id}.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def list_reports(limit: int = 100) -> list[dict]:
+    """Summaries of stored reports, newest first."""
+    directory = profile_dir()
+    if not directory.exists():
+        return []
+    summaries = []
+    for path in sorted(directory.glob("*.json"), reverse=True)[:limit]:
+        try:
+            report = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        summaries.append({
+            key: report.get(key)
+            for key in ("id", "created_at", "user", "method", "path", "status", "duration_ms", "sql_count", "sql_ms")
+        })
+    return summaries
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests that carry `X-Profile: 1` or `?_profile=1` when the
+    caller passes get_current_user; other requests go straight through.
+    The response gets X-Profile-Id and X-Profile-Report headers, and the
+    report is written to PROFILE_DIR once the response has been sent.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+        
+        username = await authorize(scope)
+        if username is None:
+            await self.app(scope, receive, send)
+            return
+        
+        report_id = new_report_id()
+        status = 500
+        
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", report_id.encode()),
+                    (b"x-profile-report", f"/admin/profiles/{report_id}".encode()),
+                ]
+            await send(message)
+        
+        profile = profiling.Profile()
+        profiler = cProfile.Profile() if _profiler_lock.acquire(blocking=False) else None
+        token = profiling.activate(profile)
+        started = time.perf_counter()
+        try:
+            if profiler is not None:
+                profile.thread_profilers = []
+                profiler.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+                    _profiler_lock.release()
+        finally:
+            duration = time.perf_counter() - started
+            profiling.deactivate(token)
+            report = {
+                "id": report_id,
+                "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                "user": username,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "status": status,
+                "duration_ms": round(duration * 1000, 3),
+                "sql_count": profile.query_count,
+                "sql_ms": round(profile.query_seconds * 1000, 3),
+                "queries": profile.queries,
+                "spans": profile.spans,
+                "call_tree": None,
+                "top_functions": None,
+                "note": "Another request was being profiled, so no call tree was recorded." if profiler is None else
+                        "The call tree covers the event loop thread while this request ran, plus the work it "
+                        "handed to threads with profiling.run_in_threadpool (e.g. PDF rendering). Other requests "
+                        "running on the loop at the same time can appear in it; FastAPI's own threadpool calls "
+                        "(sync dependencies) do not.",
+            }
+            if profiler is not None:
+                stats = pstats.Stats(profiler)
+                for thread_profiler in profile.thread_profilers:
+                    stats.add(thread_profiler)
+                report["call_tree"] = call_tree(stats)
+                report["top_functions"] = top_functions(stats)
+            save_report(report)
@@ -0,0 +1,19 @@
+"""Markdown to HTML rendering shared by pages, section retrieval and PDF export."""
+import markdown
+from app.core import profiling
+from app.core.metrics import MARKDOWN_RENDER_SECONDS
+
+MARKDOWN_EXTENSIONS = [
+    'extra',
+    'codehilite',
+    'nl2br',
+    'sane_lists',
+    'tables',
+    'toc',
+]
+
+
+def render_markdown(text: str) -> str:
+    """Convert markdown to HTML. Headings get the same anchors as the section index."""
+    with MARKDOWN_RENDER_SECONDS.time(), profiling.span("markdown"):
+        return markdown.Markdown(extensions=MARKDOWN_EXTENSIONS).convert(text)
@@ -0,0 +1,267 @@
+"""
+Revision history stored as line deltas with periodic full snapshots.
+
+A delta is a JSON list of operations applied to the previous revision's
+lines: [n] copies n lines, [-n] skips n lines and "text" inserts text.
+Every REVISION_SNAPSHOT_INTERVAL revisions a full copy is stored, so
+rebuilding any version applies at most that many deltas.
+"""
+import difflib
+import json
+from typing import Optional
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from app.core.config import get_settings
+from app.models.markdown import MarkdownFile
+from app.models.revision import FileRevision
+
+settings = get_settings()
+
+
+def make_delta(old: str, new: str) -> str:
+    """Encode `new` as line operations against `old`."""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append([i2 - i1])
+        else:
+            if i2 > i1:
+                ops.append([i1 - i2])
+            if j2 > j1:
+                ops.append("".join(new_lines[j1:j2]))
+    return json.dumps(ops, ensure_ascii=False, separators=(",", ":"))
+
+
+def apply_delta(old: str, delta: str) -> str:
+    """Rebuild a revision from the previous revision and its delta."""
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    position = 0
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            parts.append(op)
+        elif op[0] >= 0:
+            parts.extend(old_lines[position:position + op[0]])
+            position += op[0]
+        else:
+            position -= op[0]
+    return "".join(parts)
+
+
+def replay(chain: list[FileRevision]) -> str:
+    """Content of the last revision of a chain that starts with a snapshot."""
+    content = chain[0].data
+    for revision in chain[1:]:
+        content = revision.data if revision.is_snapshot else apply_delta(content, revision.data)
+    return content
+
+
+def latest_number(db: Session, file_id: int) -> int:
+    """Number of the file's latest revision, which holds its current title and content (0 if none)."""
+    return _latest(db, file_id)[0]
+
+
+def _latest(db: Session, file_id: int) -> tuple[int, int]:
+    """Latest revision number and latest snapshot number (0 if none)."""
+    latest, snapshot = db.query(
+        func.max(FileRevision.number),
+        func.max(FileRevision.number).filter(FileRevision.is_snapshot == True)
+    ).filter(FileRevision.file_id == file_id).one()
+    return latest or 0, snapshot or 0
+
+
+def _next_number(db: Session, file: MarkdownFile) -> tuple[int, int]:
+    """
+    Claim the file's next revision number by bumping its counter, returning
+    it with the latest snapshot number (0 if none). The UPDATE locks the
+    file row until the session commits, so concurrent saves of one file are
+    numbered one after the other. Files saved before the counter existed
+    continue from their highest revision.
+    """
+    def highest(*criteria):
+        return (
+            select(func.max(FileRevision.number))
+            .where(FileRevision.file_id == file.id, *criteria)
+            .scalar_subquery()
+        )
+    
+    number, snapshot = db.execute(
+        update(MarkdownFile)
+        .where(MarkdownFile.id == file.id)
+        .values(revision_number=func.coalesce(MarkdownFile.revision_number, highest(), 0) + 1)
+        .returning(MarkdownFile.revision_number, highest(FileRevision.is_snapshot == True))
+        .execution_options(synchronize_session=False)
+    ).one()
+    set_committed_value(file, "revision_number", number)
+    return number, snapshot or 0
+
+
+def record_revision(
+    db: Session,
+    file: MarkdownFile,
+    previous_content: Optional[str] = None,
+    previous_title: Optional[str] = None
+) -> FileRevision:
+    """
+    Store the file's current title/content as a new revision (committed with the session).
+    `previous_content` is the content before this save; it seeds the history
+    of files created before revisions were recorded.
+    """
+    loaded = file.revision_number
+    number, snapshot = _next_number(db, file)
+    
+    if number == 1 and previous_content is not None:
+        db.add(FileRevision(
+            file_id=file.id,
+            number=1,
+            title=previous_title or file.title,
+            is_snapshot=True,
+            data=previous_content,
+            size=len(previous_content.encode("utf-8"))
+        ))
+        db.flush()
+        number, snapshot = _next_number(db, file)
+    
+    # A save committed since this file was loaded means previous_content is
+    # not the latest revision, so a delta against it would not replay
+    concurrent = loaded is not None and number != loaded + 1
+    if (snapshot == 0 or previous_content is None or concurrent
+            or number - snapshot >= settings.REVISION_SNAPSHOT_INTERVAL):
+        is_snapshot, data = True, file.content
+    else:
+        is_snapshot, data = False, make_delta(previous_content, file.content)
+    
+    revision = FileRevision(
+        file_id=file.id,
+        number=number,
+        title=file.title,
+        is_snapshot=is_snapshot,
+        data=data,
+        size=len(file.content.encode("utf-8"))
+    )
+    db.add(revision)
+    return revision
+
+
+def list_revisions(db: Session, file_id: int) -> list[FileRevision]:
+    """Revisions of a file, newest first (without loading their data)."""
+    return (
+        db.query(FileRevision)
+        .filter(FileRevision.file_id == file_id)
+        .order_by(FileRevision.number.desc())
+        .with_entities(
+            FileRevision.number,
+            FileRevision.title,
+            FileRevision.is_snapshot,
+            FileRevision.size,
+            FileRevision.created_at
+        )
+        .all()
+    )
+
+
+def get_revision_content(db: Session, file_id: int, number: int) -> tuple[FileRevision, str] | None:
+    """A revision and its full content, rebuilt from the nearest snapshot."""
+    snapshot_number = db.query(func.max(FileRevision.number)).filter(
+        FileRevision.file_id == file_id,
+        FileRevision.number <= number,
+        FileRevision.is_snapshot == True
+    ).scalar()
+    if snapshot_number is None:
+        return None
+    
+    chain = (
+        db.query(FileRevision)
+        .filter(
+            FileRevision.file_id == file_id,
+            FileRevision.number >= snapshot_number,
+            FileRevision.number <= number
+        )
+        .order_by(FileRevision.number)
+        .all()
+    )
+    if not chain or chain[-1].number != number:
+        return None
+    return chain[-1], replay(chain)
+
+
+def compact(db: Session, file_id: int, keep_recent: Optional[int] = None) -> int:
+    """
+    Thin out old revisions of a file: keep the newest `keep_recent` and,
+    before those, the last revision of each day and the one the search
+    index holds. Kept revisions keep their numbers and are re-encoded
+    against their new predecessor.
+    Returns the number of revisions removed.
+    """
+    keep_recent = settings.REVISION_KEEP_RECENT if keep_recent is None else keep_recent
+    revisions = (
+        db.query(FileRevision)
+        .filter(FileRevision.file_id == file_id)
+        .order_by(FileRevision.number)
+        .all()
+    )
+    if len(revisions) <= keep_recent:
+        return 0
+    
+    old, recent = revisions[:len(revisions) - keep_recent], revisions[len(revisions) - keep_recent:]
+    last_per_day = {}
+    for revision in old:
+        last_per_day[revision.created_at.date()] = revision.number
+    keep = set(last_per_day.values()) | {revision.number for revision in recent}
+    # Its search entry can only be removed with the title and body it was indexed from
+    indexed = db.query(MarkdownFile.search_revision).filter(MarkdownFile.id == file_id).scalar()
+    if indexed is not None:
+        keep.add(indexed)
+    if len(keep) == len(revisions):
+        return 0
+    
+    # Materialise every kept version before rewriting the chain
+    kept = []
+    content = ""
+    for revision in revisions:
+        content = revision.data if revision.is_snapshot else apply_delta(content, revision.data)
+        if revision.number in keep:
+            kept.append((revision.number, revision.title, revision.created_at, content))
+    
+    for revision in revisions:
+        db.delete(revision)
+    db.flush()
+    
+    previous = None
+    since_snapshot = 0
+    for number, title, created_at, content in kept:
+        is_snapshot = previous is None or since_snapshot + 1 >= settings.REVISION_SNAPSHOT_INTERVAL
+        since_snapshot = 0 if is_snapshot else since_snapshot + 1
+        db.add(FileRevision(
+            file_id=file_id,
+            number=number,
+            title=title,
+            is_snapshot=is_snapshot,
+            data=content if is_snapshot else make_delta(previous, content),
+            size=len(content.encode("utf-8")),
+            created_at=created_at
+        ))
+        previous = content
+    
+    db.commit()
+    return len(revisions) - len(kept)
+
+
+def compact_all(db: Session, keep_recent: Optional[int] = None) -> tuple[int, int]:
+    """Compact every file with more than `keep_recent` revisions. Returns (files, revisions removed)."""
+    keep_recent = settings.REVISION_KEEP_RECENT if keep_recent is None else keep_recent
+    file_ids = [
+        row.file_id for row in
+        db.query(FileRevision.file_id)
+        .group_by(FileRevision.file_id)
+        .having(func.count(FileRevision.id) > keep_recent)
+    ]
+    removed = 0
+    for file_id in file_ids:
+        removed += compact(db, file_id, keep_recent)
+        db.expunge_all()
+    return len(file_ids), removed
@@ -0,0 +1,326 @@
+"""
+Full-text search over markdown files using SQLite FTS5.
+
+The FTS table is contentless: it holds the index but no copy of the text,
+so compressed and blob-stored bodies are not stored a second time.
+Snippets are cut from the stored bodies of the hits instead. A contentless
+entry can only be removed with the exact title and body it was indexed
+from, so each file records the revision it was indexed at
+(MarkdownFile.search_revision) and old entries are removed using that
+revision.
+"""
+import html
+import re
+from dataclasses import dataclass
+from itertools import groupby
+from typing import Iterable, Optional
+from sqlalchemy import bindparam, func, select, text, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models.markdown import MarkdownFile, FileStatus
+from app.models.revision import FileRevision
+from app.services import revision_service
+from app.services.metadata_service import front_matter_length
+
+FTS_TABLE = "markdown_files_fts"
+FTS_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(title, content, content='', tokenize='porter unicode61')"
+)
+SNIPPET_WORDS = 24
+
+# Private-use characters mark highlights inside snippets until they are escaped
+_MARK_OPEN = "\ue000"
+_MARK_CLOSE = "\ue001"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class SearchHit:
+    """A single ranked search result."""
+    id: int
+    title: str
+    slug: str
+    folder_id: Optional[int]
+    snippet: str
+    score: float
+
+
+def is_enabled(db: Session) -> bool:
+    """Full-text search is only available on SQLite."""
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def ensure_search_index(engine) -> None:
+    """
+    Create the FTS5 table if it does not exist yet. A table of an older
+    definition (which kept a copy of every body) is replaced and rebuilt.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as conn:
+        existing = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).scalar()
+        # SQLite keeps the statement without IF NOT EXISTS
+        outdated = existing is not None and existing != FTS_DDL.replace(" IF NOT EXISTS", "")
+        if outdated:
+            conn.execute(text(f"DROP TABLE {FTS_TABLE}"))
+        conn.execute(text(FTS_DDL))
+    if outdated:
+        with Session(engine) as db:
+            rebuild_index(db)
+
+
+def indexed_text(content: str) -> str:
+    """The part of a body that is indexed and shown in snippets: everything after the front matter."""
+    return content[front_matter_length(content):]
+
+
+def _indexed_versions(db: Session, file_ids: list[int]) -> list[tuple[int, str, str]]:
+    """
+    (file id, title, content) that the search entries of these files were
+    indexed from, rebuilt from their revisions in one query. Files without
+    an entry are left out.
+    """
+    start = (
+        select(FileRevision.file_id, func.max(FileRevision.number).label("number"))
+        .join(MarkdownFile, MarkdownFile.id == FileRevision.file_id)
+        .where(
+            FileRevision.file_id.in_(file_ids),
+            FileRevision.is_snapshot == True,
+            FileRevision.number <= MarkdownFile.search_revision
+        )
+        .group_by(FileRevision.file_id)
+        .subquery()
+    )
+    revisions = (
+        db.query(FileRevision)
+        .join(start, start.c.file_id == FileRevision.file_id)
+        .join(MarkdownFile, MarkdownFile.id == FileRevision.file_id)
+        .filter(FileRevision.number >= start.c.number, FileRevision.number <= MarkdownFile.search_revision)
+        .order_by(FileRevision.file_id, FileRevision.number)
+    )
+    versions = []
+    for file_id, chain in groupby(revisions, key=lambda revision: revision.file_id):
+        chain = list(chain)
+        versions.append((file_id, chain[-1].title, revision_service.replay(chain)))
+    return versions
+
+
+def _delete_entries(db: Session, versions: list[tuple[int, str, str]]) -> None:
+    for file_id, title, content in versions:
+        db.execute(
+            text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, title, content) VALUES ('delete', :id, :title, :content)"),
+            {"id": file_id, "title": title, "content": indexed_text(content)}
+        )
+
+
+def index_file(db: Session, file: MarkdownFile) -> None:
+    """
+    Replace a file's search entry with its current title and body
+    (committed with the session). Nothing changes if the file was saved
+    again since it was loaded; that save queued indexing of its own.
+    """
+    if not is_enabled(db):
+        return
+    db.flush()
+    latest = revision_service.latest_number(db, file.id)
+    if latest == 0:
+        # Saved before revisions were recorded: the entry could not be removed later
+        revision_service.record_revision(db, file)
+        db.flush()
+        latest = 1
+    previous = file.search_revision
+    if previous == latest:
+        return
+    
+    old = _indexed_versions(db, [file.id]) if previous is not None else []
+    # Also takes the write lock, so neither the body nor the entry can change before the swap
+    claimed = db.execute(
+        update(MarkdownFile)
+        .where(
+            MarkdownFile.id == file.id,
+            MarkdownFile.search_revision.is_not_distinct_from(previous),
+            MarkdownFile.title == file.title,
+            MarkdownFile.content_hash.is_not_distinct_from(file.content_hash)
+        )
+        .values(search_revision=latest)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        return
+    set_committed_value(file, "search_revision", latest)
+    _delete_entries(db, old)
+    db.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (:id, :title, :content)"),
+        {"id": file.id, "title": file.title, "content": indexed_text(file.content)}
+    )
+
+
+def remove_files(db: Session, file_ids: Iterable[int]) -> None:
+    """Remove files from the search index before they are deleted (committed with the session)."""
+    file_ids = list(file_ids)
+    if not file_ids or not is_enabled(db):
+        return
+    _delete_entries(db, _indexed_versions(db, file_ids))
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression.
+    Every word must match; the last word also matches as a prefix so
+    results appear while the user is still typing.
+    """
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def make_snippet(body: str, tokens: list[str], size: int = SNIPPET_WORDS) -> str:
+    """
+    About `size` words of `body` around the first word starting with a
+    query token, with such words between highlight markers and "…" where
+    text was cut. Prefix matching stands in for the index's stemming.
+    """
+    pattern = re.compile("|".join(rf"\b{re.escape(token)}\w*" for token in tokens), re.IGNORECASE)
+    first = pattern.search(body)
+    position = first.start() if first else 0
+    # Only split the text near the match into words, not the whole body
+    offset = max(0, position - 16 * size)
+    window = body[offset:position + 16 * size]
+    cut_end = offset + len(window) < len(body)
+    words = list(_TOKEN_RE.finditer(window))
+    # Words at a cut edge may be partial
+    words = words[1 if offset else 0:len(words) - 1 if cut_end else len(words)]
+    if not words:
+        return ""
+    center = next((i for i, word in enumerate(words) if word.end() > position - offset), len(words) - 1)
+    start = max(0, min(center - size // 4, len(words) - size))
+    end = min(len(words), start + size)
+    
+    parts = ["…"] if start > 0 or offset > 0 else []
+    cursor = words[start].start()
+    for word in words[start:end]:
+        parts.append(window[cursor:word.start()])
+        if pattern.fullmatch(word.group()):
+            parts.append(f"{_MARK_OPEN}{word.group()}{_MARK_CLOSE}")
+        else:
+            parts.append(word.group())
+        cursor = word.end()
+    if end < len(words) or cut_end:
+        parts.append("…")
+    return "".join(parts)
+
+
+def _render_snippet(snippet: str) -> str:
+    """Escape a raw snippet and turn highlight markers into <mark> tags."""
+    return (
+        html.escape(snippet)
+        .replace(_MARK_OPEN, "<mark>")
+        .replace(_MARK_CLOSE, "</mark>")
+    )
+
+
+# Every folder with whether it and all its parents are active, and whether
+# it is the folder :scope or below it
+_FOLDER_TREE_CTE = """
+    WITH RECURSIVE tree(id, visible, inside) AS (
+        SELECT id, status = :status, id IS :scope FROM folders WHERE parent_id IS NULL
+        UNION ALL
+        SELECT c.id, t.visible AND c.status = :status, t.inside OR c.id IS :scope
+        FROM folders AS c JOIN tree AS t ON c.parent_id = t.id
+    )
+"""
+
+
+def search(
+    db: Session,
+    query: str,
+    folder_id: Optional[int] = None,
+    include_archived: bool = False,
+    limit: int = 20
+) -> list[SearchHit]:
+    """
+    Search titles and content, best matches first (BM25, titles weighted 10x).
+    `folder_id` restricts results to that folder and its subfolders. Unless
+    `include_archived`, files inside archived folders are filtered out in
+    the query, so hidden files never take the place of visible ones.
+    """
+    match = build_match_query(query)
+    if match is None:
+        return []
+    
+    scoped = folder_id is not None or not include_archived
+    sql = f"""
+        {_FOLDER_TREE_CTE if scoped else ""}
+        SELECT f.id, f.title, f.slug, f.folder_id, bm25({FTS_TABLE}, 10.0, 1.0) AS score
+        FROM {FTS_TABLE}
+        JOIN markdown_files AS f ON f.id = {FTS_TABLE}.rowid
+        {"LEFT JOIN tree AS t ON t.id = f.folder_id" if scoped else ""}
+        WHERE {FTS_TABLE} MATCH :match
+    """
+    params = {
+        "match": match,
+        "limit": limit,
+        "status": FileStatus.ACTIVE.name,
+        "scope": folder_id,
+    }
+    if not include_archived:
+        sql += " AND f.status = :status AND (f.folder_id IS NULL OR t.visible)"
+    if folder_id is not None:
+        sql += " AND t.inside"
+    sql += " ORDER BY score LIMIT :limit"
+    
+    rows = db.execute(text(sql), params).all()
+    bodies = {
+        file.id: file.content
+        for file in db.query(MarkdownFile).filter(MarkdownFile.id.in_([row.id for row in rows]))
+    }
+    tokens = _TOKEN_RE.findall(query)
+    return [
+        SearchHit(
+            id=row.id,
+            title=row.title,
+            slug=row.slug,
+            folder_id=row.folder_id,
+            snippet=_render_snippet(make_snippet(indexed_text(bodies[row.id]), tokens)),
+            score=-row.score
+        )
+        for row in rows
+    ]
+
+
+def rebuild_index(db: Session, batch_size: int = 500) -> int:
+    """Rebuild the whole search index from markdown_files. Returns the number of files indexed."""
+    if not is_enabled(db):
+        return 0
+    db.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('delete-all')"))
+    db.execute(update(MarkdownFile).values(search_revision=None))
+    
+    count = 0
+    last_id = 0
+    while True:
+        batch = (
+            db.query(MarkdownFile)
+            .filter(MarkdownFile.id > last_id)
+            .order_by(MarkdownFile.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for file in batch:
+            index_file(db, file)
+        db.flush()
+        count += len(batch)
+        last_id = batch[-1].id
+        db.expunge_all()
+    
+    db.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"))
+    db.commit()
+    return count
@@ -0,0 +1,159 @@
+"""Heading index: section anchors and byte ranges computed after a file is saved."""
+import re
+from dataclasses import dataclass
+from typing import Optional
+from markdown.extensions.toc import slugify, unique
+from sqlalchemy.orm import Session
+from app.models.markdown import MarkdownFile
+from app.models.section import FileSection
+from app.services.metadata_service import front_matter_length
+
+# Same rules as Python-Markdown's hash and setext header processors
+ATX_HEADING = re.compile(r"^(#{1,6})(.*?)#*\s*$")
+SETEXT_UNDERLINE = re.compile(r"^(=+|-+)[ ]*$")
+FENCE = re.compile(r"^[ ]{0,3}(`{3,}|~{3,})")
+# Inline markup removed before slugifying, mirroring the rendered heading text
+INLINE_LINK = re.compile(r"!?\[([^\]]*)\]\([^)]*\)")
+INLINE_MARKUP = re.compile(r"<[^>]+>|[*_`]")
+
+
+@dataclass
+class Heading:
+    """A heading found in a document, before section ends are known."""
+    level: int
+    title: str
+    start: int
+
+
+def _heading_text(raw: str) -> str:
+    return INLINE_MARKUP.sub("", INLINE_LINK.sub(r"\1", raw)).strip()
+
+
+def find_headings(content: str) -> list[Heading]:
+    """
+    Scan a document for ATX and setext headings, skipping front matter
+    and fenced code blocks. Offsets are in UTF-8 bytes.
+    """
+    headings = []
+    body_start = front_matter_length(content)
+    offset = len(content[:body_start].encode("utf-8"))
+    fence: Optional[str] = None
+    previous: Optional[tuple[str, int]] = None  # paragraph line that may be a setext title
+    
+    for line in content[body_start:].splitlines(keepends=True):
+        text = line.rstrip("\r\n")
+        start, offset = offset, offset + len(line.encode("utf-8"))
+        
+        fence_match = FENCE.match(text)
+        if fence:
+            if fence_match and fence_match.group(1)[0] == fence[0] and len(fence_match.group(1)) >= len(fence):
+                fence = None
+            previous = None
+            continue
+        if fence_match:
+            fence = fence_match.group(1)
+            previous = None
+            continue
+        
+        atx = ATX_HEADING.match(text)
+        if atx and _heading_text(atx.group(2)):
+            headings.append(Heading(len(atx.group(1)), _heading_text(atx.group(2)), start))
+            previous = None
+            continue
+        
+        if previous and SETEXT_UNDERLINE.match(text):
+            title, title_start = previous
+            headings.append(Heading(1 if text[0] == "=" else 2, title, title_start))
+            previous = None
+            continue
+        
+        title = _heading_text(text)
+        previous = (title, start) if title and not text.startswith("    ") else None
+    
+    return headings
+
+
+def build_sections(content: str) -> list[FileSection]:
+    """Section rows for a document, with anchors made unique the way the toc extension does."""
+    headings = find_headings(content)
+    size = len(content.encode("utf-8"))
+    seen_anchors: set[str] = set()
+    sections = []
+    for position, heading in enumerate(headings):
+        end = next(
+            (later.start for later in headings[position + 1:] if later.level <= heading.level),
+            size
+        )
+        anchor = unique(slugify(heading.title, "-"), seen_anchors)
+        sections.append(FileSection(
+            position=position,
+            level=heading.level,
+            title=heading.title,
+            anchor=anchor,
+            start=heading.start,
+            end=end
+        ))
+    return sections
+
+
+def update_file_sections(file: MarkdownFile) -> None:
+    """Replace a file's section rows from its current content (committed with the session)."""
+    file.sections = build_sections(file.content)
+    file.sections_hash = file.content_hash
+
+
+def sections_current(file: MarkdownFile) -> bool:
+    """
+    Whether the stored section rows were built from the file's current body.
+    They lag behind a save until its index job has run.
+    """
+    return file.sections_hash == file.content_hash
+
+
+def get_sections(file: MarkdownFile) -> list[FileSection]:
+    """
+    A file's sections: the stored rows, or built from the body while they
+    are stale, since their byte ranges only fit the body they came from.
+    """
+    if sections_current(file):
+        return file.sections
+    return build_sections(file.content)
+
+
+def get_section(db: Session, file: MarkdownFile, anchor: str) -> Optional[FileSection]:
+    """Get a section of a file by anchor."""
+    if not sections_current(file):
+        return next((section for section in build_sections(file.content) if section.anchor == anchor), None)
+    return (
+        db.query(FileSection)
+        .filter(FileSection.file_id == file.id, FileSection.anchor == anchor)
+        .first()
+    )
+
+
+def section_content(file: MarkdownFile, section: FileSection) -> str:
+    """Raw markdown of one section, sliced from the stored body by byte range."""
+    return str(file.content_view()[section.start:section.end], "utf-8")
+
+
+def backfill(db: Session, batch_size: int = 500) -> int:
+    """Rebuild the heading index for every file. Returns the number of files processed."""
+    count = 0
+    last_id = 0
+    while True:
+        batch = (
+            db.query(MarkdownFile)
+            .filter(MarkdownFile.id > last_id)
+            .order_by(MarkdownFile.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for file in batch:
+            update_file_sections(file)
+        db.commit()
+        count += len(batch)
+        last_id = batch[-1].id
+        db.expunge_all()
+    return count
@@ -0,0 +1,78 @@
+"""Maintenance of content storage: blob migration, consistency checks and GC."""
+from dataclasses import dataclass, field
+from sqlalchemy.orm import Session, load_only
+from app.db.blob_store import collect_garbage, content_hash, get_blob_store
+from app.models.markdown import ContentStorage, MarkdownFile
+
+
+@dataclass
+class CheckReport:
+    """Result of a content storage consistency check."""
+    checked: int = 0
+    missing: list[int] = field(default_factory=list)  # file IDs whose blob is gone
+    corrupt: list[int] = field(default_factory=list)  # file IDs whose body does not match its hash
+    
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.corrupt
+
+
+def _batches(db: Session, batch_size: int, *columns):
+    """Yield files in ID order, `batch_size` rows at a time."""
+    last_id = 0
+    while True:
+        query = db.query(MarkdownFile)
+        if columns:
+            query = query.options(load_only(*columns))
+        batch = query.filter(MarkdownFile.id > last_id).order_by(MarkdownFile.id).limit(batch_size).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+        yield batch
+
+
+def migrate(db: Session, batch_size: int = 200) -> int:
+    """
+    Re-store every body under the current CONTENT_INLINE_MAX: fill in hashes
+    and sizes, and move bodies between the row and the blob store.
+    Returns the number of files processed.
+    """
+    count = 0
+    for batch in _batches(db, batch_size):
+        for file in batch:
+            file.content = file.content
+        db.commit()
+        count += len(batch)
+        db.expunge_all()
+    return count
+
+
+def check(db: Session, batch_size: int = 200, verify_inline: bool = False) -> CheckReport:
+    """Verify that every blob-backed file has its blob and that bodies match their hashes."""
+    store = get_blob_store()
+    report = CheckReport()
+    columns = (MarkdownFile.id, MarkdownFile.content_hash, MarkdownFile.content_storage)
+    for batch in _batches(db, batch_size, *columns):
+        for file in batch:
+            report.checked += 1
+            if file.content_storage == ContentStorage.BLOB.value:
+                if not store.exists(file.content_hash):
+                    report.missing.append(file.id)
+                elif content_hash(store.open(file.content_hash)) != file.content_hash:
+                    report.corrupt.append(file.id)
+            elif verify_inline and file.content_hash:
+                if content_hash(file.content.encode("utf-8")) != file.content_hash:
+                    report.corrupt.append(file.id)
+        db.expunge_all()
+    return report
+
+
+def garbage_collect(db: Session, grace_seconds: float = 3600) -> list[str]:
+    """Delete blobs no file references. Returns the deleted hashes."""
+    referenced = {
+        digest for (digest,) in
+        db.query(MarkdownFile.content_hash)
+        .filter(MarkdownFile.content_storage == ContentStorage.BLOB.value)
+        .distinct()
+    }
+    return collect_garbage(referenced, grace_seconds)
@@ -0,0 +1,250 @@
+"""In-memory prefix index over file titles/slugs and folder names for search-as-you-type."""
+import re
+import threading
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy.orm import Session
+from app.models.markdown import Folder, MarkdownFile, FileStatus
+
+_WORD_START_RE = re.compile(r"(?<!\w)\w", re.UNICODE)
+
+
+@dataclass
+class Entry:
+    """An indexed file or folder."""
+    kind: str  # "file" or "folder"
+    id: int
+    title: str
+    slug: str
+    parent_id: Optional[int]  # folder_id for files, parent_id for folders
+    active: bool
+    keys: tuple[str, ...] = ()
+
+
+def _index_keys(title: str, slug: str) -> tuple[str, ...]:
+    """Every suffix of the title that starts a word, plus the slug."""
+    title = title.lower()
+    keys = {title[match.start():] for match in _WORD_START_RE.finditer(title)}
+    keys.add(slug.lower())
+    return tuple(keys)
+
+
+class PrefixIndex:
+    """
+    Sorted list of (key, kind, id) tuples searched with bisect.
+    A prefix lookup is a binary search followed by a short scan, so it never
+    touches the database once loaded. Writes update it incrementally and
+    bump the generation, so a load that overlapped a write is discarded
+    rather than installed over it.
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: list[tuple[str, str, int]] = []
+        self._entries: dict[tuple[str, int], Entry] = {}
+        self._generation = 0
+        self.loaded = False
+    
+    def load(self, db: Session) -> None:
+        """
+        (Re)build the index from the database. If an entry was written
+        meanwhile, the result may predate it and is dropped; the next lookup
+        loads again.
+        """
+        with self._lock:
+            generation = self._generation
+        entries = {}
+        for row in db.query(Folder.id, Folder.name, Folder.slug, Folder.parent_id, Folder.status):
+            entry = Entry("folder", row.id, row.name, row.slug, row.parent_id, row.status == FileStatus.ACTIVE)
+            entry.keys = _index_keys(row.name, row.slug)
+            entries[("folder", row.id)] = entry
+        files = db.query(
+            MarkdownFile.id, MarkdownFile.title, MarkdownFile.slug, MarkdownFile.folder_id, MarkdownFile.status
+        )
+        for row in files:
+            entry = Entry("file", row.id, row.title, row.slug, row.folder_id, row.status == FileStatus.ACTIVE)
+            entry.keys = _index_keys(row.title, row.slug)
+            entries[("file", row.id)] = entry
+        
+        keys = sorted((key, kind, entry_id) for (kind, entry_id), entry in entries.items() for key in entry.keys)
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries = entries
+            self._keys = keys
+            self.loaded = True
+    
+    def clear(self) -> None:
+        """Drop everything; the next lookup reloads from the database."""
+        with self._lock:
+            self._entries = {}
+            self._keys = []
+            self._generation += 1
+            self.loaded = False
+    
+    def put(self, entry: Entry) -> None:
+        """Insert or replace an entry."""
+        entry.keys = _index_keys(entry.title, entry.slug)
+        with self._lock:
+            self._generation += 1
+            if not self.loaded:
+                return
+            self._remove_keys(entry.kind, entry.id)
+            self._entries[(entry.kind, entry.id)] = entry
+            for key in entry.keys:
+                insort(self._keys, (key, entry.kind, entry.id))
+    
+    def remove(self, kind: str, entry_id: int) -> None:
+        """Remove an entry if present."""
+        with self._lock:
+            self._generation += 1
+            self._remove_keys(kind, entry_id)
+            self._entries.pop((kind, entry_id), None)
+    
+    def _remove_keys(self, kind: str, entry_id: int) -> None:
+        old = self._entries.get((kind, entry_id))
+        if old is None:
+            return
+        for key in old.keys:
+            position = bisect_left(self._keys, (key, kind, entry_id))
+            if position < len(self._keys) and self._keys[position] == (key, kind, entry_id):
+                del self._keys[position]
+    
+    def folder_path(self, folder_id: int) -> Optional[str]:
+        """URL path of an active folder, or None if it or an ancestor is hidden."""
+        parts = []
+        seen = set()
+        while folder_id is not None:
+            folder = self._entries.get(("folder", folder_id))
+            if folder is None or not folder.active or folder_id in seen:
+                return None
+            seen.add(folder_id)
+            parts.append(folder.slug)
+            folder_id = folder.parent_id
+        return "/".join(reversed(parts))
+    
+    def suggest(self, prefix: str, limit: int = 10, scan_limit: int = 500) -> list[dict]:
+        """
+        Top matches for a prefix among active entries.
+        Titles that start with the prefix rank before mid-title word matches,
+        then shorter titles first.
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        
+        with self._lock:
+            candidates = {}
+            position = bisect_left(self._keys, (prefix,))
+            for key, kind, entry_id in self._keys[position:position + scan_limit]:
+                if not key.startswith(prefix):
+                    break
+                entry = self._entries[(kind, entry_id)]
+                if entry.active:
+                    candidates[(kind, entry_id)] = entry
+            
+            ranked = sorted(
+                candidates.values(),
+                key=lambda entry: (not entry.title.lower().startswith(prefix), len(entry.title), entry.title)
+            )
+            
+            results = []
+            for entry in ranked:
+                if entry.kind == "file":
+                    if entry.parent_id is None:
+                        path = entry.slug
+                    else:
+                        folder_path = self.folder_path(entry.parent_id)
+                        if folder_path is None:
+                            continue
+                        path = f"{folder_path}/{entry.slug}"
+                    url = f"/files/{path}"
+                else:
+                    path = self.folder_path(entry.id)
+                    if path is None:
+                        continue
+                    url = f"/?folder={entry.id}"
+                results.append({
+                    "kind": entry.kind,
+                    "id": entry.id,
+                    "title": entry.title,
+                    "slug": entry.slug,
+                    "path": path,
+                    "url": url,
+                })
+                if len(results) >= limit:
+                    break
+            return results
+
+
+index = PrefixIndex()
+
+
+def get_index(db: Session) -> PrefixIndex:
+    """The process-wide index, loaded from the database on first use."""
+    if not index.loaded:
+        index.load(db)
+    return index
+
+
+def file_changed(file: MarkdownFile) -> None:
+    """Update the index after a file was created or modified."""
+    index.put(Entry("file", file.id, file.title, file.slug, file.folder_id, file.status == FileStatus.ACTIVE))
+
+
+def file_removed(file_id: int) -> None:
+    """Update the index after a file was deleted."""
+    index.remove("file", file_id)
+
+
+def folder_changed(folder: Folder) -> None:
+    """Update the index after a folder was created or modified."""
+    index.put(Entry("folder", folder.id, folder.name, folder.slug, folder.parent_id, folder.status == FileStatus.ACTIVE))
+
+
+def load_entries(
+    db: Session, file_ids: set[int], folder_ids: set[int]
+) -> tuple[list[Entry], list[tuple[str, int]]]:
+    """
+    Current entries of the given files and folders, and the (kind, id) of
+    those no longer in the database; for applying another worker's writes.
+    """
+    entries = []
+    if folder_ids:
+        rows = db.query(Folder.id, Folder.name, Folder.slug, Folder.parent_id, Folder.status).filter(
+            Folder.id.in_(folder_ids)
+        )
+        entries += [
+            Entry("folder", row.id, row.name, row.slug, row.parent_id, row.status == FileStatus.ACTIVE)
+            for row in rows
+        ]
+    if file_ids:
+        rows = db.query(
+            MarkdownFile.id, MarkdownFile.title, MarkdownFile.slug, MarkdownFile.folder_id, MarkdownFile.status
+        ).filter(MarkdownFile.id.in_(file_ids))
+        entries += [
+            Entry("file", row.id, row.title, row.slug, row.folder_id, row.status == FileStatus.ACTIVE)
+            for row in rows
+        ]
+    found = {(entry.kind, entry.id) for entry in entries}
+    removed = [
+        (kind, entry_id)
+        for kind, ids in (("file", file_ids), ("folder", folder_ids))
+        for entry_id in ids
+        if (kind, entry_id) not in found
+    ]
+    return entries, removed
+
+
+def apply_entries(entries: list[Entry], removed: list[tuple[str, int]]) -> None:
+    """Put and remove entries returned by load_entries()."""
+    for entry in entries:
+        index.put(entry)
+    for kind, entry_id in removed:
+        index.remove(kind, entry_id)
+
+
+def invalidate() -> None:
+    """Forget the index after bulk changes; it reloads on next use."""
+    index.clear()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Per-request authentication overhead with and without the auth caches.
+
+Measures the token -> user lookup on its own and a cheap authenticated
+endpoint. "uncached" runs with the token and user caches disabled, which
+is what every request paid before they existed: a JWT decode plus a user query.
+
+Usage:
+    python -m benchmarks.auth_overhead --runs 2000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def timed(func, runs: int) -> float:
+    """Median microseconds per call."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def set_caching(enabled: bool) -> None:
+    from app.core.config import get_settings
+    from app.services import auth_service
+
+    ttl = get_settings().AUTH_CACHE_TTL if enabled else 0
+    for cache in (auth_service.token_cache, auth_service.user_cache):
+        cache.ttl = ttl
+        cache.clear()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=2000, help="calls per measurement")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="cms-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{scratch}/bench.db"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["UPLOAD_DIR"] = os.path.join(scratch, "uploads")
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.core.security import create_access_token
+    from app.db.database import SessionLocal, init_db
+    from app.schemas.user import UserCreate
+    from app.services.auth_service import create_user, get_user_by_token
+
+    init_db()
+    db = SessionLocal()
+    create_user(db, UserCreate(username="bench", password="benchmark"))
+    token = create_access_token({"sub": "bench"})
+    auth = {"Authorization": f"Bearer {token}"}
+
+    results = []
+    with TestClient(app) as client:
+        for enabled in (False, True):
+            set_caching(enabled)
+            lookup = timed(lambda: get_user_by_token(db, token), args.runs)
+            results.append(["cached" if enabled else "uncached", lookup])
+        # Interleave modes so drift in the test client affects both equally
+        timings = {False: [], True: []}
+        for _ in range(args.runs):
+            for enabled in (False, True):
+                set_caching(enabled)
+                client.get("/api/admin/files?limit=1", headers=auth).raise_for_status()  # warm
+                start = time.perf_counter()
+                client.get("/api/admin/files?limit=1", headers=auth).raise_for_status()
+                timings[enabled].append(time.perf_counter() - start)
+        for result, enabled in zip(results, (False, True)):
+            result.append(statistics.median(timings[enabled]) * 1e6)
+    db.close()
+
+    print(f"{'mode':<10} {'lookup µs':>10} {'request µs':>11}")
+    for mode, lookup, request in results:
+        print(f"{mode:<10} {lookup:>10.1f} {request:>11.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""Cross-worker cache coherence check.
+
+Starts two worker processes serving the app from the same SQLite file,
+each through its own test client with the change listener running. After
+the reader worker has cached the suggest index, the Atom feed and an
+authenticated user, the writer worker creates, renames, moves, archives
+and deletes content and renames the user. The reader must reflect every
+change within `--max-seconds` (by default twice the poll interval plus
+half a second), without being restarted.
+
+Exits with status 1 if any change was not seen in time.
+
+Usage:
+    python -m benchmarks.cache_coherence --poll-interval 0.2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Callable
+
+
+def worker(connection) -> None:
+    """Serve commands from the parent until it sends None."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.core.security import create_access_token
+    from app.db.database import SessionLocal
+    from app.models.user import User
+    
+    with TestClient(app) as client:
+        connection.send("ready")
+        while True:
+            command = connection.recv()
+            if command is None:
+                break
+            action, args = command[0], command[1:]
+            if action == "request":
+                method, url, kwargs = args
+                response = client.request(method, url, **kwargs)
+                connection.send((response.status_code, response.text))
+            elif action == "token":
+                connection.send(create_access_token({"sub": args[0]}))
+            elif action == "rename_user":
+                with SessionLocal() as db:
+                    user = db.query(User).filter(User.username == args[0]).one()
+                    user.username = args[1]
+                    db.commit()
+                connection.send(None)
+
+
+class Worker:
+    def __init__(self, context, name: str):
+        self.name = name
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=worker, args=(child,), name=name, daemon=True)
+        self.process.start()
+        if self.connection.recv() != "ready":
+            raise SystemExit(f"{name} failed to start")
+    
+    def call(self, *command):
+        self.connection.send(command)
+        return self.connection.recv()
+    
+    def request(self, method: str, url: str, **kwargs) -> tuple[int, str]:
+        return self.call("request", method, url, kwargs)
+    
+    def json(self, method: str, url: str, **kwargs):
+        status, text = self.request(method, url, **kwargs)
+        if status >= 400:
+            raise SystemExit(f"{self.name}: {method} {url} returned {status}: {text}")
+        return json.loads(text) if text else None
+    
+    def close(self) -> None:
+        self.connection.send(None)
+        self.process.join(timeout=10)
+
+
+def wait_for(check: Callable[[], bool], timeout: float) -> float | None:
+    """Seconds until check() held, or None if it didn't within `timeout`."""
+    start = time.perf_counter()
+    while True:
+        if check():
+            return time.perf_counter() - start
+        if time.perf_counter() - start > timeout:
+            return None
+        time.sleep(0.02)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--poll-interval", type=float, default=0.2, help="CHANGE_POLL_INTERVAL of both workers")
+    parser.add_argument("--max-seconds", type=float, help="how long a change may take to reach the reader")
+    args = parser.parse_args()
+    max_seconds = args.max_seconds or args.poll_interval * 2 + 0.5
+    
+    scratch = tempfile.mkdtemp(prefix="cms-coherence-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{scratch}/bench.db"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["UPLOAD_DIR"] = os.path.join(scratch, "uploads")
+    os.environ["PROFILE_DIR"] = os.path.join(scratch, "profiles")
+    os.environ["CHANGE_LISTENER_ENABLED"] = "True"
+    os.environ["CHANGE_POLL_INTERVAL"] = str(args.poll_interval)
+    os.environ["AUTH_CACHE_TTL"] = "600"  # longer than the check, so only invalidation can help
+    
+    from app.db.database import SessionLocal, init_db
+    from app.schemas.user import UserCreate
+    from app.services.auth_service import create_user
+    
+    init_db()
+    with SessionLocal() as db:
+        create_user(db, UserCreate(username="writer", password="benchmark"))
+        create_user(db, UserCreate(username="reader", password="benchmark"))
+    
+    context = multiprocessing.get_context("spawn")
+    writer = Worker(context, "writer")
+    reader = Worker(context, "reader")
+    write_auth = {"Authorization": f"Bearer {writer.call('token', 'writer')}"}
+    read_auth = {"Authorization": f"Bearer {reader.call('token', 'reader')}"}
+    
+    def suggest(prefix: str) -> list[dict]:
+        return reader.json("GET", "/api/suggest", params={"q": prefix})
+    
+    def feed() -> str:
+        return reader.request("GET", "/feed.atom")[1]
+    
+    def authenticated() -> bool:
+        return reader.request("GET", "/api/admin/system/changes", headers=read_auth)[0] == 200
+    
+    results = []
+    
+    def expect(change: str, check: Callable[[], bool]) -> None:
+        results.append((change, wait_for(check, max_seconds)))
+    
+    # Fill the reader's caches before anything changes
+    if suggest("coherence") or "Coherence probe" in feed() or not authenticated():
+        raise SystemExit("unexpected state before the first change")
+    
+    folder = writer.json("POST", "/api/admin/folders/", headers=write_auth, json={
+        "name": "Probe folder", "slug": "probe-folder"
+    })
+    expect("folder created", lambda: any(entry["id"] == folder["id"] for entry in suggest("probe folder")))
+    
+    file = writer.json("POST", "/api/admin/files", headers=write_auth, json={
+        "title": "Coherence probe", "slug": "coherence-probe", "content": "# Probe", "folder_id": folder["id"]
+    })
+    expect("file created (suggest)", lambda: [entry["id"] for entry in suggest("coherence")] == [file["id"]])
+    expect("file created (feed)", lambda: "Coherence probe" in feed())
+    
+    writer.json("PUT", f"/api/admin/files/{file['id']}", headers=write_auth, json={"title": "Renamed probe"})
+    expect("file renamed", lambda: [entry["title"] for entry in suggest("coherence")] == ["Renamed probe"])
+    
+    writer.json("PUT", f"/api/admin/folders/{folder['id']}", headers=write_auth, json={"slug": "moved-folder"})
+    expect("folder moved", lambda: [entry["path"] for entry in suggest("renamed probe")]
+           == ["moved-folder/coherence-probe"])
+    
+    writer.json("PATCH", f"/api/admin/folders/{folder['id']}/archive", headers=write_auth)
+    expect("folder tree archived", lambda: suggest("renamed probe") == [] and "Renamed probe" not in feed())
+    
+    writer.json("PATCH", f"/api/admin/folders/{folder['id']}/archive", headers=write_auth)
+    expect("folder tree restored", lambda: len(suggest("renamed probe")) == 1)
+    
+    writer.request("DELETE", f"/api/admin/files/{file['id']}", headers=write_auth)
+    expect("file deleted", lambda: suggest("renamed probe") == [] and "Renamed probe" not in feed())
+    
+    writer.call("rename_user", "reader", "former-reader")
+    expect("user renamed", lambda: not authenticated())
+    
+    changes = reader.json("GET", "/api/admin/system/changes", headers=write_auth)
+    writer.close()
+    reader.close()
+    
+    print(f"{'change':<26} {'seen by reader after':>20}")
+    for change, seconds in results:
+        print(f"{change:<26} {'not seen' if seconds is None else f'{seconds:.3f}s':>20}")
+    print(f"\nreader applied {changes['applied']} changes up to change_log ID {changes['last_id']}")
+    
+    missed = [change for change, seconds in results if seconds is None]
+    for change in missed:
+        print(f"FAIL: {change} not seen by the reader within {max_seconds:.2f}s")
+    if not missed:
+        print(f"OK: every change reached the reader within {max_seconds:.2f}s")
+    return 1 if missed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Database size and read-latency trade-off of content compression.
+
+Stores the same markdown corpus once per codec in scratch SQLite databases
+and reports file size and the time to load single documents by ID. Each
+codec runs in its own process, which creates the database with init_db()
+and the documents with markdown_service.create_file, so the size includes
+everything a save writes: the search index (an uncompressed copy of every
+body), revisions, sections and links. The size is broken down by table.
+
+Usage:
+    python -m benchmarks.compression --files 500 --size-kb 64
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+WORDS = (
+    "api request response server client cache index query folder file markdown "
+    "render template token session user admin config deploy build release error "
+    "the a of to and in is for with on that by this be are from or as at"
+).split()
+
+
+def make_document(rng: random.Random, size: int) -> str:
+    """Markdown with headings, prose, lists and code blocks, about `size` bytes long."""
+    parts = []
+    length = 0
+    section = 0
+    while length < size:
+        section += 1
+        block = [f"## Section {section}\n"]
+        for _ in range(rng.randint(2, 5)):
+            block.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 90))).capitalize() + ".\n")
+        if rng.random() < 0.5:
+            block.append("\n".join(f"- {' '.join(rng.choice(WORDS) for _ in range(6))}" for _ in range(4)) + "\n")
+        if rng.random() < 0.4:
+            code = "\n".join(f"    result_{i} = client.{rng.choice(WORDS)}(\"{rng.choice(WORDS)}\", {rng.randint(0, 999)})" for i in range(8))
+            block.append(f"```python\n{code}\n```\n")
+        text = "\n".join(block) + "\n"
+        parts.append(text)
+        length += len(text)
+    return "".join(parts)
+
+
+def table_sizes(engine) -> dict[str, int]:
+    """Bytes used per table (indexes included), from SQLite's dbstat table."""
+    from app.services.search_service import FTS_TABLE
+
+    with engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT m.tbl_name, SUM(s.pgsize) FROM dbstat AS s "
+            "JOIN sqlite_master AS m ON m.name = s.name GROUP BY m.tbl_name"
+        ).all()
+    sizes = {}
+    for table, size in rows:
+        # FTS5 keeps its data in shadow tables named after the virtual table
+        name = FTS_TABLE if table.startswith(FTS_TABLE) else table
+        sizes[name] = sizes.get(name, 0) + size
+    return sizes
+
+
+def run(codec: str, documents: list[str], scratch: str, reads: int) -> dict:
+    """Store the corpus with one codec and measure size and read latency; runs in a fresh process."""
+    from benchmarks.corpus import configure
+
+    directory = os.path.join(scratch, codec)
+    os.makedirs(directory)
+    configure(directory)
+    os.environ["CONTENT_COMPRESSION"] = codec
+    os.environ["CONTENT_COMPRESSION_THRESHOLD"] = "1024"
+
+    from app.db.database import SessionLocal, engine, init_db
+    from app.models.markdown import MarkdownFile
+    from app.schemas.markdown import MarkdownCreate
+    from app.services import job_service, markdown_service
+    from app.services.search_service import FTS_TABLE
+
+    init_db()
+    with SessionLocal() as db:
+        file_ids = [
+            markdown_service.create_file(
+                db, MarkdownCreate(title=f"Document {i}", slug=f"document-{i}", content=content)
+            ).id
+            for i, content in enumerate(documents)
+        ]
+        job_service.run_pending(db)
+    sizes = table_sizes(engine)
+    engine.dispose()
+
+    rng = random.Random(1)
+    timings = []
+    with SessionLocal() as db:
+        for _ in range(reads):
+            index = rng.randrange(len(documents))
+            start = time.perf_counter()
+            content = db.get(MarkdownFile, file_ids[index]).content
+            timings.append(time.perf_counter() - start)
+            assert content == documents[index]
+            db.expunge_all()
+    engine.dispose()
+
+    mb = 1024 * 1024
+    return {
+        "codec": codec,
+        "db_mb": os.path.getsize(os.path.join(directory, "bench.db")) / mb,
+        "files_mb": sizes.get("markdown_files", 0) / mb,
+        "fts_mb": sizes.get(FTS_TABLE, 0) / mb,
+        "revisions_mb": sizes.get("file_revisions", 0) / mb,
+        "read_median_us": statistics.median(timings) * 1e6,
+        "read_p95_us": statistics.quantiles(timings, n=20)[-1] * 1e6,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=500, help="number of documents")
+    parser.add_argument("--size-kb", type=int, default=64, help="approximate size of each document")
+    parser.add_argument("--reads", type=int, default=2000, help="random reads per codec")
+    parser.add_argument("--codecs", default="none,zlib", help="comma-separated codecs to compare")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    documents = [make_document(rng, int(rng.uniform(0.25, 1.75) * args.size_kb * 1024)) for _ in range(args.files)]
+    scratch = tempfile.mkdtemp(prefix="cms-bench-")
+    print(f"Corpus: {args.files} documents, {sum(map(len, documents)) / 1024 / 1024:.1f} MB of markdown")
+
+    print(f"{'codec':<8} {'db MB':>8} {'files MB':>9} {'search MB':>10} {'revisions MB':>13} "
+          f"{'read median us':>16} {'read p95 us':>12}")
+    # The app binds its engine at import, so each codec gets a fresh process
+    context = multiprocessing.get_context("spawn")
+    for codec in args.codecs.split(","):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run, codec, documents, scratch, args.reads).result()
+        print(f"{result['codec']:<8} {result['db_mb']:>8.1f} {result['files_mb']:>9.1f} {result['fts_mb']:>10.1f} "
+              f"{result['revisions_mb']:>13.1f} {result['read_median_us']:>16.0f} {result['read_p95_us']:>12.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Synthetic corpus generator for benchmarks.
+
+Creates a scratch directory holding a SQLite database, an uploads
+directory and a corpus.json manifest. The database gets `--folders` root
+folders, each the top of a chain `--depth` levels deep, and `--files`
+documents spread over every level (and the root). Documents are about
+`--size-kb` long; `--code-density` is the share of sections with a fenced
+code block and `--images` the number of images each document embeds.
+Documents are created through markdown_service, so search index, link
+graph, sections and metadata are populated as in production. The same
+arguments and `--seed` always produce the same corpus. `--spec` reads
+them from a JSON file instead, such as benchmarks/reference_corpus.json.
+
+Usage:
+    python -m benchmarks.corpus --out /tmp/corpus --folders 10 --depth 4 --files 500
+    python -m benchmarks.corpus --out /tmp/corpus --spec benchmarks/reference_corpus.json
+"""
+
+import argparse
+import json
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from dataclasses import asdict, dataclass, field
+
+WORDS = (
+    "api request response server client cache index query folder file markdown "
+    "render template token session user admin config deploy build release error "
+    "the a of to and in is for with on that by this be are from or as at"
+).split()
+
+MANIFEST = "corpus.json"
+# Small corpus the committed suite baseline (benchmarks/baseline.json) was recorded on
+REFERENCE_SPEC = "benchmarks/reference_corpus.json"
+
+
+@dataclass
+class CorpusSpec:
+    folders: int = 10
+    depth: int = 4
+    files: int = 500
+    size_kb: int = 16
+    code_density: float = 0.3
+    images: int = 1
+    seed: int = 1
+
+
+@dataclass
+class Corpus:
+    """What was generated, for the benchmarks to pick their targets from."""
+    spec: CorpusSpec
+    directory: str
+    root_folder_ids: list[int] = field(default_factory=list)
+    # Depth (0 = no folder) -> slug path of a document at that depth
+    paths_by_depth: dict[int, str] = field(default_factory=dict)
+    file_ids: list[int] = field(default_factory=list)
+    images: list[str] = field(default_factory=list)
+    seconds: float = 0.0
+
+
+def configure(directory: str) -> None:
+    """Point the app's settings at a corpus directory; call before importing app modules."""
+    os.environ["DATABASE_URL"] = f"sqlite:///{directory}/bench.db"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["UPLOAD_DIR"] = os.path.join(directory, "uploads")
+    os.environ["CONTENT_BLOB_DIR"] = os.path.join(directory, "blobs")
+    os.environ["PROFILE_DIR"] = os.path.join(directory, "profiles")
+    # One process; the listener's polls would only add to the statement counts
+    os.environ["CHANGE_LISTENER_ENABLED"] = "False"
+    # Queued indexing is run by generate(); no job threads run during measurements
+    os.environ["JOB_WORKERS"] = "0"
+    os.environ["PDF_PRERENDER"] = "False"
+
+
+def make_png(rng: random.Random, size: int = 64) -> bytes:
+    """Valid RGB PNG of `size` x `size` noise."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    
+    rows = b"".join(b"\x00" + rng.randbytes(size * 3) for _ in range(size))
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+def make_document(rng: random.Random, index: int, spec: CorpusSpec, images: list[str]) -> str:
+    """Markdown with front matter, headings, prose, lists, code blocks and images, about size_kb long."""
+    size = spec.size_kb * 1024
+    parts = [
+        f"---\ntags: [bench, {rng.choice(WORDS)}, group-{index % 7}]\nowner: team-{index % 5}\n---\n",
+        f"# Document {index}\n\n",
+    ]
+    parts.extend(f"![Figure {n}](/uploads/{images[(index + n) % len(images)]})\n\n" for n in range(spec.images))
+    length = sum(map(len, parts))
+    section = 0
+    while length < size:
+        section += 1
+        block = [f"## Section {section}\n"]
+        for _ in range(rng.randint(2, 5)):
+            block.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 90))).capitalize() + ".\n")
+        if rng.random() < 0.5:
+            block.append("\n".join(f"- {' '.join(rng.choice(WORDS) for _ in range(6))}" for _ in range(4)) + "\n")
+        if rng.random() < spec.code_density:
+            code = "\n".join(
+                f"result_{i} = client.{rng.choice(WORDS)}(\"{rng.choice(WORDS)}\", {rng.randint(0, 999)})"
+                for i in range(rng.randint(4, 16))
+            )
+            block.append(f"```python\n{code}\n```\n")
+        text = "\n".join(block) + "\n"
+        parts.append(text)
+        length += len(text)
+    return "".join(parts)
+
+
+def generate(spec: CorpusSpec, directory: str) -> Corpus:
+    """Generate a corpus into `directory` (configure() must have pointed the app at it)."""
+    from app.db.database import SessionLocal, init_db
+    from app.schemas.markdown import FolderCreate, MarkdownCreate
+    from app.services import folder_service, job_service, link_service, markdown_service
+    
+    started = time.perf_counter()
+    rng = random.Random(spec.seed)
+    corpus = Corpus(spec=spec, directory=directory)
+    
+    uploads = os.environ["UPLOAD_DIR"]
+    os.makedirs(uploads, exist_ok=True)
+    for n in range(max(spec.images, 1) * 4):
+        name = f"corpus-{n}.png"
+        with open(os.path.join(uploads, name), "wb") as f:
+            f.write(make_png(rng))
+        corpus.images.append(name)
+    
+    init_db()
+    db = SessionLocal()
+    try:
+        # (folder ID, depth); None is the root
+        levels: list[tuple] = [(None, 0)]
+        for root in range(spec.folders):
+            parent_id = None
+            for depth in range(1, spec.depth + 1):
+                parent_id = folder_service.create_folder(db, FolderCreate(
+                    name=f"Folder {root}.{depth}", slug=f"folder-{root}-{depth}", parent_id=parent_id
+                )).id
+                if depth == 1:
+                    corpus.root_folder_ids.append(parent_id)
+                levels.append((parent_id, depth))
+        
+        for index in range(spec.files):
+            folder_id, depth = levels[index % len(levels)]
+            db_file = markdown_service.create_file(db, MarkdownCreate(
+                title=f"Document {index}",
+                slug=f"document-{index}",
+                content=make_document(rng, index, spec, corpus.images),
+                folder_id=folder_id,
+            ))
+            corpus.file_ids.append(db_file.id)
+            if depth not in corpus.paths_by_depth:
+                corpus.paths_by_depth[depth] = link_service.file_path(db, db_file)
+        job_service.run_pending(db)
+    finally:
+        db.close()
+    
+    corpus.seconds = time.perf_counter() - started
+    with open(os.path.join(directory, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(asdict(corpus), f, indent=2)
+    return corpus
+
+
+def load(directory: str) -> Corpus:
+    """Read the manifest of a previously generated corpus."""
+    with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+        data = json.load(f)
+    data["spec"] = CorpusSpec(**data["spec"])
+    data["directory"] = directory
+    data["paths_by_depth"] = {int(depth): path for depth, path in data["paths_by_depth"].items()}
+    return Corpus(**data)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = CorpusSpec()
+    parser.add_argument("--folders", type=int, default=defaults.folders, help="root folders")
+    parser.add_argument("--depth", type=int, default=defaults.depth, help="folder levels below each root folder")
+    parser.add_argument("--files", type=int, default=defaults.files, help="documents")
+    parser.add_argument("--size-kb", type=int, default=defaults.size_kb, help="approximate size of each document")
+    parser.add_argument("--code-density", type=float, default=defaults.code_density,
+                        help="share of sections with a fenced code block (0-1)")
+    parser.add_argument("--images", type=int, default=defaults.images, help="images embedded in each document")
+    parser.add_argument("--seed", type=int, default=defaults.seed, help="random seed")
+    parser.add_argument("--spec", help=f"JSON file with the arguments above, e.g. {REFERENCE_SPEC}; replaces them")
+
+
+def spec_from_args(args: argparse.Namespace) -> CorpusSpec:
+    if args.spec:
+        with open(args.spec, encoding="utf-8") as f:
+            return CorpusSpec(**json.load(f))
+    return CorpusSpec(
+        folders=args.folders,
+        depth=args.depth,
+        files=args.files,
+        size_kb=args.size_kb,
+        code_density=args.code_density,
+        images=args.images,
+        seed=args.seed,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", help="directory to create (default: a new temporary directory)")
+    add_arguments(parser)
+    args = parser.parse_args()
+    
+    directory = args.out or tempfile.mkdtemp(prefix="cms-corpus-")
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(os.path.join(directory, "bench.db")):
+        parser.error(f"{directory} already holds a corpus")
+    configure(directory)
+    
+    corpus = generate(spec_from_args(args), directory)
+    print(f"Generated {len(corpus.file_ids)} documents in {len(corpus.root_folder_ids) * corpus.spec.depth} folders "
+          f"into {directory} in {corpus.seconds:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
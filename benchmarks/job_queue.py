@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""Background job queue check.
+
+Against a scratch database, checks that:
+    
+    dedup       repeated saves of a file leave one pending job per kind
+    sections    while a file's index job is pending, its sections are
+                built from the saved body, not read from stale rows
+    priority    indexing runs before PDF rendering
+    retry       a failing job is retried with backoff until it succeeds,
+                and fails for good after JOB_MAX_ATTEMPTS
+    end_to_end  after a save through the app, the job threads bring search
+                and the pre-rendered PDF up to date
+    restart     jobs queued by one process, including one whose process
+                died while running it, are finished by the next process
+
+and times `--saves` saves of a `--size-kb` document with indexing inline,
+queued, and queued with PDF pre-rendering. Exits with status 1 if a check
+fails.
+
+Usage:
+    python -m benchmarks.job_queue --saves 50 --size-kb 64
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RESTART_CHILD = """
+import os, sys
+from app.db.database import SessionLocal, init_db
+from app.schemas.markdown import MarkdownCreate
+from app.services import job_service, markdown_service
+init_db()
+with SessionLocal() as db:
+    for n in range(5):
+        markdown_service.create_file(db, MarkdownCreate(
+            title=f"Restart {n}", slug=f"restart-{n}", content=f"# Restart {n}\\n\\nsurvivor{n}"
+        ))
+    # Take one job and die without finishing it
+    job_service.claim(db)
+os._exit(0)
+"""
+
+RESTART_SECOND = """
+import json, time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.db.database import SessionLocal
+from app.services import job_service
+with TestClient(app):
+    deadline = time.monotonic() + {timeout}
+    while time.monotonic() < deadline:
+        with SessionLocal() as db:
+            counts = job_service.status(db, limit=1)["counts"]
+        if not counts["pending"] and not counts["running"]:
+            break
+        time.sleep(0.1)
+print(json.dumps(counts))
+"""
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--saves", type=int, default=50, help="saves timed per mode")
+    parser.add_argument("--size-kb", type=int, default=64, help="size of the saved document")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for jobs to finish")
+    args = parser.parse_args()
+    
+    scratch = tempfile.mkdtemp(prefix="cms-jobs-")
+    env = {
+        "DATABASE_URL": f"sqlite:///{scratch}/bench.db",
+        "UPLOAD_DIR": os.path.join(scratch, "uploads"),
+        "PROFILE_DIR": os.path.join(scratch, "profiles"),
+        "PDF_CACHE_DIR": os.path.join(scratch, "pdf"),
+        "CHANGE_LISTENER_ENABLED": "False",
+        "JOB_POLL_INTERVAL": "0.1",
+        "JOB_RETRY_BASE": "0.05",
+        "JOB_MAX_ATTEMPTS": "3",
+        "JOB_LEASE_SECONDS": "1",
+        "ADMISSION_ENABLED": "False",
+        # Off by default; on here so the PDF jobs can be checked
+        "PDF_PRERENDER": "True",
+    }
+    os.environ.update(env)
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.core.config import get_settings
+    from app.core.security import create_access_token
+    from app.db.database import SessionLocal, init_db
+    from app.models.job import Job
+    from app.models.markdown import MarkdownFile
+    from app.schemas.markdown import MarkdownCreate, MarkdownUpdate
+    from app.schemas.user import UserCreate
+    from app.services import auth_service, download_service, job_service, markdown_service, section_service
+    
+    init_db()
+    db = SessionLocal()
+    auth_service.create_user(db, UserCreate(username="bench", password="benchmark"))
+    failures = []
+    
+    def check(name: str, ok: bool, detail: str) -> None:
+        print(f"{name:<12} {'ok' if ok else 'FAIL':<5} {detail}")
+        if not ok:
+            failures.append(name)
+    
+    def jobs(**filters) -> list:
+        db.expire_all()
+        return db.query(Job).filter_by(**filters).order_by(Job.id).all()
+    
+    body = ("Lorem ipsum dolor sit amet, queue benchmark text. " * 24 + "\n\n") * max(args.size_kb, 1)
+    
+    # Dedup, stale sections and priority, with no job threads running
+    file = markdown_service.create_file(db, MarkdownCreate(title="Dedup", slug="dedup", content="# Dedup"))
+    for n in range(10):
+        markdown_service.update_file(db, file.id, MarkdownUpdate(content=f"# Dedup\n\nversion {n}"))
+    pending = jobs(status=job_service.PENDING)
+    kinds = sorted(job.kind for job in pending)
+    check("dedup", kinds == [markdown_service.INDEX_JOB, download_service.PDF_JOB],
+          f"11 saves left {len(pending)} pending job(s): {', '.join(kinds)}")
+    markdown_service.update_file(db, file.id, MarkdownUpdate(content="# Moved\n\nIntro.\n\n## Added\n\nNew text."))
+    saved = db.get(MarkdownFile, file.id)
+    section = section_service.get_section(db, saved, "added")
+    text = section_service.section_content(saved, section) if section else None
+    check("sections", not section_service.sections_current(saved) and text == "## Added\n\nNew text.",
+          f"section 'added' before the index job ran: {text!r}")
+    first = job_service.claim(db)
+    check("priority", first is not None and first.kind == markdown_service.INDEX_JOB,
+          f"first claimed: {first.kind if first else None}")
+    job_service.run(db, first)
+    job_service.run_pending(db)
+    
+    # Retries with backoff
+    calls = []
+    
+    @job_service.handler("bench_flaky")
+    def flaky(db, payload):
+        calls.append(time.monotonic())
+        if len(calls) <= payload["failures"]:
+            raise RuntimeError("flaky")
+    
+    def run_until_settled(job_id: int) -> Job:
+        deadline = time.monotonic() + args.timeout
+        while time.monotonic() < deadline:
+            job_service.run_pending(db)
+            job = db.get(Job, job_id)
+            db.refresh(job)
+            if job.status in (job_service.DONE, job_service.FAILED):
+                return job
+            time.sleep(0.01)
+        return job
+    
+    job_service.enqueue(db, "bench_flaky", {"failures": 2})
+    db.commit()
+    job = run_until_settled(jobs(kind="bench_flaky")[-1].id)
+    gaps = [later - earlier for earlier, later in zip(calls, calls[1:])]
+    backoff_ok = all(gap >= job_service.backoff(n + 1) * 0.9 for n, gap in enumerate(gaps))
+    check("retry", job.status == job_service.DONE and job.attempts == 3 and backoff_ok,
+          f"{job.status} after {job.attempts} attempts, gaps {', '.join(f'{gap:.2f}s' for gap in gaps)}")
+    calls.clear()
+    job_service.enqueue(db, "bench_flaky", {"failures": 10})
+    db.commit()
+    job = run_until_settled(jobs(kind="bench_flaky")[-1].id)
+    check("give up", job.status == job_service.FAILED and job.attempts == 3 and "flaky" in (job.last_error or ""),
+          f"{job.status} after {job.attempts} attempts")
+    
+    # Save latency, indexing inline vs queued, with the default of no PDF pre-rendering
+    timed_id = markdown_service.create_file(db, MarkdownCreate(title="Timed", slug="timed", content=body)).id
+    latency = {}
+    for mode, enabled, prerender in (("inline", False, False), ("queued", True, False), ("queued + PDF", True, True)):
+        job_service.settings.JOBS_ENABLED = enabled
+        get_settings().PDF_PRERENDER = prerender
+        samples = []
+        for n in range(args.saves):
+            start = time.perf_counter()
+            markdown_service.update_file(db, timed_id, MarkdownUpdate(content=f"{body}\n{mode} {n}"))
+            samples.append(time.perf_counter() - start)
+        latency[mode] = statistics.median(samples) * 1000
+    job_service.run_pending(db)
+    
+    # Through the app with job threads running
+    auth = {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}
+    with TestClient(app) as client:
+        response = client.put(f"/api/admin/files/{timed_id}", headers=auth, json={"content": "# Timed\n\nzanzibar"})
+        response.raise_for_status()
+        start = time.perf_counter()
+        searched = None
+        while time.perf_counter() - start < args.timeout:
+            if client.get("/api/search", params={"q": "zanzibar"}).json():
+                searched = time.perf_counter() - start
+                break
+            time.sleep(0.02)
+        db.expire_all()
+        pdf_state = None
+        while time.perf_counter() - start < args.timeout:
+            pending = jobs(key=f"{download_service.PDF_JOB}:{timed_id}")[-1]
+            if pending.status in (job_service.DONE, job_service.FAILED):
+                pdf_state = pending.status
+                break
+            time.sleep(0.02)
+        cached = download_service.cached_pdf(db.get(MarkdownFile, timed_id)) if pdf_state == job_service.DONE else None
+        if cached is not None:
+            cached.close()
+        status = client.get("/api/admin/system/jobs", headers=auth).json()
+    check("end_to_end", searched is not None and cached is not None,
+          f"search caught up after {searched if searched is None else f'{searched:.2f}s'}, "
+          f"PDF job {pdf_state}, pre-rendered PDF {'found' if cached else 'missing'}")
+    db.close()
+    
+    # Restart: a process queues jobs and dies holding one; the next process finishes them
+    child_env = {**os.environ, "DATABASE_URL": f"sqlite:///{scratch}/restart.db", "PDF_PRERENDER": "False"}
+    subprocess.run([sys.executable, "-c", RESTART_CHILD], env=child_env, check=True)
+    result = subprocess.run(
+        [sys.executable, "-c", RESTART_SECOND.format(timeout=args.timeout)],
+        env=child_env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        check("restart", False, result.stderr.strip().splitlines()[-1] if result.stderr else "worker failed")
+    else:
+        counts = json.loads(result.stdout.strip().splitlines()[-1])
+        done = counts["done"].get(markdown_service.INDEX_JOB, 0)
+        check("restart", done == 5 and not counts["pending"] and not counts["running"],
+              f"{done} of 5 queued index jobs done after restart")
+    
+    print(f"\nsave latency (median of {args.saves}, {args.size_kb} KB): "
+          f"indexing inline {latency['inline']:.1f} ms, queued {latency['queued']:.1f} ms, "
+          f"queued with PDF pre-rendering {latency['queued + PDF']:.1f} ms")
+    print(f"queue after the app run: {status['counts']}")
+    if failures:
+        print(f"\nFAIL: {', '.join(failures)}")
+        return 1
+    print("\nOK: every check passed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
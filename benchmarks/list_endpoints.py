@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Memory and latency benchmark for the file listing endpoints.
+
+Seeds a scratch SQLite database with large documents and measures the
+home page, ``/api/files`` and ``/api/admin/files``.
+
+Usage:
+    python -m benchmarks.list_endpoints --files 200 --size-kb 512
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def seed(files: int, size_kb: int, folders: int) -> None:
+    """Fill the scratch database with folders and large documents."""
+    from app.db.database import SessionLocal, init_db
+    from app.models.markdown import Folder, MarkdownFile
+
+    init_db()
+    db = SessionLocal()
+    try:
+        folder_rows = [Folder(name=f"Folder {i}", slug=f"folder-{i}") for i in range(folders)]
+        db.add_all(folder_rows)
+        db.flush()
+
+        paragraph = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 16 + "\n\n"
+        body = "# Large document\n\n" + paragraph * (size_kb * 1024 // len(paragraph) + 1)
+        for i in range(files):
+            folder = folder_rows[i % folders] if folders and i % 3 else None
+            db.add(MarkdownFile(
+                title=f"Document {i}",
+                slug=f"document-{i}",
+                content=body,
+                folder_id=folder.id if folder else None,
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def measure(client, url: str, runs: int, headers: dict | None = None) -> dict:
+    """Return median latency and peak traced memory for a GET request."""
+    timings = []
+    peak = 0
+    for _ in range(runs):
+        tracemalloc.start()
+        start = time.perf_counter()
+        response = client.get(url, headers=headers)
+        timings.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        response.raise_for_status()
+    return {
+        "url": url,
+        "median_ms": statistics.median(timings) * 1000,
+        "peak_mb": peak / (1024 * 1024),
+        "bytes": len(response.content),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200, help="number of documents")
+    parser.add_argument("--size-kb", type=int, default=512, help="size of each document")
+    parser.add_argument("--folders", type=int, default=10, help="number of root folders")
+    parser.add_argument("--runs", type=int, default=5, help="requests per endpoint")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="cms-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{scratch}/bench.db"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["UPLOAD_DIR"] = os.path.join(scratch, "uploads")
+
+    print(f"Seeding {args.files} documents of {args.size_kb} KB into {scratch} ...")
+    seed(args.files, args.size_kb, args.folders)
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.core.security import create_access_token
+    from app.db.database import SessionLocal
+    from app.schemas.user import UserCreate
+    from app.services.auth_service import create_user
+
+    db = SessionLocal()
+    try:
+        create_user(db, UserCreate(username="bench", password="benchmark"))
+    finally:
+        db.close()
+    auth = {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}
+
+    with TestClient(app) as client:
+        results = [
+            measure(client, "/", args.runs),
+            measure(client, "/api/files", args.runs),
+            measure(client, "/api/admin/files", args.runs, headers=auth),
+        ]
+
+    print(f"{'endpoint':<20} {'median ms':>10} {'peak MB':>10} {'bytes':>12}")
+    for result in results:
+        print(f"{result['url']:<20} {result['median_ms']:>10.1f} {result['peak_mb']:>10.1f} {result['bytes']:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Cost of the /metrics instrumentation per request and per database query.
+
+Requests go straight through a minimal ASGI app, bare and wrapped in
+MetricsMiddleware, so the difference is the middleware alone: timing,
+status capture, the per-request query context and four metric updates.
+Queries run `SELECT 1` on in-memory SQLite engines with and without the
+query timing listeners from app/db/database.py.
+
+Usage:
+    python -m benchmarks.metrics_overhead --runs 200000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+
+class _Route:
+    path = "/bench/{item_id}"
+
+
+async def endpoint(scope, receive, send):
+    # Stands in for the router, which records the matched route on the scope
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def noop_send(message):
+    pass
+
+
+async def noop_receive():
+    return {"type": "http.request", "body": b""}
+
+
+def request_cost(app, runs: int) -> float:
+    """Mean microseconds per request, best of five rounds."""
+    async def round_():
+        start = time.perf_counter()
+        for _ in range(runs):
+            await app({"type": "http", "method": "GET", "path": "/bench/1"}, noop_receive, noop_send)
+        return time.perf_counter() - start
+    
+    loop = asyncio.new_event_loop()
+    try:
+        return min(loop.run_until_complete(round_()) for _ in range(5)) / runs * 1e6
+    finally:
+        loop.close()
+
+
+def query_costs(engines: list, runs: int) -> list[float]:
+    """Median microseconds per `SELECT 1` for each engine, over interleaved batches of 1000."""
+    from sqlalchemy import text
+    
+    statement = text("SELECT 1")
+    connections = [engine.connect() for engine in engines]
+    timings = [[] for _ in engines]
+    for _ in range(max(runs // 1000, 5)):
+        # Alternate engines so machine noise hits both equally
+        for conn, samples in zip(connections, timings):
+            start = time.perf_counter()
+            for _ in range(1000):
+                conn.execute(statement)
+            samples.append((time.perf_counter() - start) / 1000)
+    for conn in connections:
+        conn.close()
+    return [statistics.median(samples) * 1e6 for samples in timings]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=200000, help="requests/queries per measurement")
+    args = parser.parse_args()
+    
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    
+    from sqlalchemy import create_engine, event
+    from app.core.metrics import MetricsMiddleware
+    from app.db import database
+    
+    bare = request_cost(endpoint, args.runs)
+    instrumented = request_cost(MetricsMiddleware(endpoint), args.runs)
+    
+    plain_engine = create_engine("sqlite://")
+    timed_engine = create_engine("sqlite://")
+    event.listen(timed_engine, "do_execute", database._timed_execute)
+    event.listen(timed_engine, "do_execute_no_params", database._timed_execute_no_params)
+    plain, timed = query_costs([plain_engine, timed_engine], args.runs)
+    
+    print(f"{'':<10} {'bare µs':>9} {'metrics µs':>11} {'overhead µs':>12}")
+    print(f"{'request':<10} {bare:>9.2f} {instrumented:>11.2f} {instrumented - bare:>12.2f}")
+    print(f"{'query':<10} {plain:>9.2f} {timed:>11.2f} {timed - plain:>12.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
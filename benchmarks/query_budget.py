@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""Per-endpoint SQL query budgets: catches N+1 regressions.
+
+Seeds a scratch database with a folder tree, documents with front matter,
+headings, cross links and revisions, then requests every route through a
+test client and counts the SQL statements each request issues. The tree
+is then grown (more folders, files, links and revisions) and every route
+is measured again. Routes taking a file path are also measured for a file
+at the root and one `--depth` folders deep.
+
+A route fails if it issues more statements than its budget in BUDGETS,
+or if its count grows with the amount of data or the folder depth (an N+1). Routes missing
+from BUDGETS fail too, so new endpoints must declare one. In-process
+caches are cleared before each request, so counts are for a cold request.
+
+Usage:
+    python -m benchmarks.query_budget
+    python -m benchmarks.query_budget --grow 3 --verbose
+
+Exits with status 1 when any route fails.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+
+@dataclass
+class Budget:
+    """At most `queries` statements for one request; `setup` returns fresh path values for destructive routes."""
+    queries: int
+    params: Optional[dict] = None
+    json: Optional[dict] = None
+    data: Optional[dict] = None
+    files: Optional[Callable[[], dict]] = None
+    setup: Optional[Callable[["Seed"], dict]] = None
+    anonymous: bool = False
+
+
+def _markdown_upload():
+    return {"file": ("Budget upload.md", b"# Uploaded\n\nBody", "text/markdown")}
+
+
+def _image_upload():
+    # Smallest valid GIF
+    gif = b"GIF89a\x01\x00\x01\x00\x00\x00\x00;"
+    return {"file": ("pixel.gif", gif, "image/gif")}
+
+
+# (method, route path) -> budget. Counts include the user lookup of
+# authenticated routes (the auth caches are cleared before each request).
+BUDGETS: dict[tuple[str, str], Budget] = {
+    ("POST", "/api/token"): Budget(1, data={"username": "budget", "password": "budget-password"}, anonymous=True),
+    ("GET", "/api/admin/files"): Budget(3),
+    ("GET", "/api/admin/files/{file_id}"): Budget(2),
+    ("POST", "/api/admin/files"): Budget(
+        11, setup=lambda seed: {"json": {"title": "New", "slug": seed.unique("new"), "content": seed.body(0)}}
+    ),
+    ("POST", "/api/admin/files/upload"): Budget(11, files=_markdown_upload),
+    ("PUT", "/api/admin/files/{file_id}"): Budget(11, setup=lambda seed: {
+        "file_id": seed.scratch_file(), "json": {"title": "Renamed", "content": seed.body(1)}
+    }),
+    ("DELETE", "/api/admin/files/{file_id}"): Budget(15, setup=lambda seed: {"file_id": seed.scratch_file()}),
+    ("PATCH", "/api/admin/files/{file_id}/archive"): Budget(5, setup=lambda seed: {"file_id": seed.scratch_file()}),
+    ("GET", "/api/admin/files/links/broken"): Budget(3),
+    ("GET", "/api/admin/files/{file_id}/backlinks"): Budget(4),
+    ("GET", "/api/admin/files/{file_id}/revisions"): Budget(3),
+    ("GET", "/api/admin/files/{file_id}/revisions/{number}"): Budget(3),
+    ("POST", "/api/admin/files/{file_id}/revisions/{number}/restore"): Budget(
+        6, setup=lambda seed: {"file_id": seed.scratch_file(), "number": 1}
+    ),
+    ("GET", "/api/admin/files/download/{file_id}/markdown"): Budget(2),
+    ("GET", "/api/admin/files/download/{file_id}/pdf"): Budget(2),
+    ("POST", "/api/admin/folders/"): Budget(5, setup=lambda seed: {
+        "json": {"name": "New folder", "slug": seed.unique("folder")}
+    }),
+    ("GET", "/api/admin/folders/"): Budget(3),
+    ("GET", "/api/admin/folders/root"): Budget(2),
+    ("GET", "/api/admin/folders/{folder_id}"): Budget(2),
+    ("PUT", "/api/admin/folders/{folder_id}"): Budget(12, setup=lambda seed: {
+        "folder_id": seed.scratch_folder(), "json": {"slug": seed.unique("moved")}
+    }),
+    ("DELETE", "/api/admin/folders/{folder_id}"): Budget(21, setup=lambda seed: {"folder_id": seed.scratch_folder()}),
+    ("PATCH", "/api/admin/folders/{folder_id}/archive"): Budget(8, setup=lambda seed: {"folder_id": seed.scratch_folder()}),
+    ("POST", "/api/admin/images/upload"): Budget(1, files=_image_upload),
+    ("DELETE", "/api/admin/images/{filename}"): Budget(1, setup=lambda seed: {"filename": seed.scratch_image()}),
+    ("GET", "/api/files"): Budget(2, anonymous=True),
+    ("GET", "/api/files/download/{file_id}/markdown"): Budget(1, anonymous=True),
+    ("GET", "/api/files/download/{file_id}/pdf"): Budget(1, anonymous=True),
+    ("GET", "/api/files/{file_path:path}/_backlinks"): Budget(3, anonymous=True),
+    ("GET", "/api/files/{file_path:path}/_sections"): Budget(2, anonymous=True),
+    ("GET", "/api/files/{file_path:path}/_sections/{anchor}"): Budget(2, anonymous=True),
+    ("GET", "/api/files/{file_path:path}"): Budget(1, anonymous=True),
+    ("GET", "/api/folders/{folder_id}/contents"): Budget(3, anonymous=True),
+    ("GET", "/api/search"): Budget(3, params={"q": "budget"}, anonymous=True),
+    ("GET", "/api/suggest"): Budget(2, params={"q": "guide"}, anonymous=True),
+    ("GET", "/api/admin/system/admission"): Budget(1),
+    ("GET", "/api/admin/system/loop"): Budget(1),
+    ("GET", "/api/admin/system/startup"): Budget(1),
+    ("GET", "/api/admin/system/changes"): Budget(1),
+    ("GET", "/api/admin/system/jobs"): Budget(4),
+    ("GET", "/api/admin/system/jobs/{job_id}"): Budget(2, setup=lambda seed: {"job_id": seed.failed_job()}),
+    ("POST", "/api/admin/system/jobs/{job_id}/retry"): Budget(3, setup=lambda seed: {"job_id": seed.failed_job()}),
+    ("GET", "/api/admin/system/profiles"): Budget(1),
+    ("GET", "/api/admin/system/profiles/{report_id}"): Budget(1),
+    ("GET", "/"): Budget(3, anonymous=True),
+    ("GET", "/files/{file_path:path}"): Budget(4, anonymous=True),
+    ("GET", "/admin/login"): Budget(0),
+    ("POST", "/admin/login"): Budget(1, data={"username": "budget", "password": "budget-password"}, anonymous=True),
+    ("GET", "/admin/logout"): Budget(0, anonymous=True),
+    ("GET", "/admin/dashboard"): Budget(1),
+    ("GET", "/admin/files"): Budget(1),
+    ("GET", "/admin/dashboard/old"): Budget(2),
+    ("GET", "/admin/editor"): Budget(2),
+    ("GET", "/admin/editor/{file_id}"): Budget(3),
+    ("GET", "/admin/view/{file_id}"): Budget(5),
+    ("GET", "/admin/profiles"): Budget(1),
+    ("GET", "/admin/profiles/{report_id}"): Budget(1),
+    ("GET", "/sitemap.xml"): Budget(1, anonymous=True),
+    ("GET", "/sitemap-{page:int}.xml"): Budget(4, anonymous=True),
+    ("GET", "/feed.atom"): Budget(3, anonymous=True),
+    ("GET", "/health"): Budget(0, anonymous=True),
+    ("GET", "/metrics"): Budget(0, anonymous=True),
+    ("GET", "/docs"): Budget(1),
+    ("GET", "/redoc"): Budget(1),
+    ("GET", "/openapi.json"): Budget(0),
+}
+
+
+class Seed:
+    """Builds and grows the scratch content tree; the probe entities stay the same across rounds."""
+    
+    def __init__(self, db):
+        self.db = db
+        self.counter = 0
+        self.probe_folder = None
+        self.probe_file = None
+        self.path_file = None  # file of {file_path:path}; the probe file unless set
+        self.roots = 0
+    
+    def unique(self, prefix: str) -> str:
+        self.counter += 1
+        return f"{prefix}-{self.counter}"
+    
+    def body(self, index: int, links: tuple[str, ...] = ()) -> str:
+        link_lines = "\n".join(f"- [Related {n}](/files/{path})" for n, path in enumerate(links))
+        return (
+            f"---\ntags: [budget, guide, tag-{index % 5}]\nowner: team-{index % 3}\n---\n"
+            f"# Budget document {index}\n\nIntroduction mentioning budget.\n\n"
+            f"## Setup\n\nSteps.\n\n### Details\n\nMore.\n\n## Usage\n\n{link_lines}\n"
+        )
+    
+    def folder(self, name: str, parent_id: Optional[int]) -> int:
+        from app.schemas.markdown import FolderCreate
+        from app.services import folder_service
+        return folder_service.create_folder(
+            self.db, FolderCreate(name=name, slug=self.unique("folder"), parent_id=parent_id)
+        ).id
+    
+    def file(self, folder_id: Optional[int], links: tuple[str, ...] = ()) -> int:
+        from app.schemas.markdown import MarkdownCreate
+        from app.services import markdown_service
+        self.counter += 1
+        return markdown_service.create_file(self.db, MarkdownCreate(
+            title=f"Guide {self.counter}", slug=f"guide-{self.counter}",
+            content=self.body(self.counter, links), folder_id=folder_id
+        )).id
+    
+    def grow(self, roots: int, files_per_folder: int, revisions: int) -> None:
+        """Add `roots` three-level folder trees with files, links to the probe file and probe revisions."""
+        from app.schemas.markdown import MarkdownUpdate
+        from app.services import job_service, link_service, markdown_service
+        
+        if self.probe_folder is None:
+            self.probe_folder = self.folder("Probe", None)
+            self.probe_file = self.file(self.probe_folder)
+        probe_path = link_service.file_path(self.db, markdown_service.get_file_by_id(self.db, self.probe_file))
+        
+        self.roots += roots
+        for _ in range(roots):
+            root = self.folder("Root", None)
+            for child in [root] + [self.folder("Child", root) for _ in range(2)]:
+                for folder_id in (child, self.folder("Leaf", child)):
+                    for _ in range(files_per_folder):
+                        self.file(folder_id, links=(probe_path, "missing/page"))
+            for _ in range(files_per_folder):
+                self.file(None, links=(probe_path,))
+            self.file(self.probe_folder, links=(probe_path,))
+            self.folder("Probe child", self.probe_folder)
+        
+        for n in range(revisions):
+            markdown_service.update_file(self.db, self.probe_file, MarkdownUpdate(content=self.body(n, (probe_path,))))
+        # Reads are measured against the stored tags and sections, as once the job workers caught up
+        job_service.run_pending(self.db)
+    
+    def file_at_depth(self, depth: int) -> int:
+        """A file linked from the probe file, below a chain of `depth` new folders."""
+        from app.services import job_service, link_service, markdown_service
+        folder_id = None
+        for _ in range(depth):
+            folder_id = self.folder("Depth", folder_id)
+        probe_path = link_service.file_path(self.db, markdown_service.get_file_by_id(self.db, self.probe_file))
+        file_id = self.file(folder_id, links=(probe_path,))
+        job_service.run_pending(self.db)
+        return file_id
+    
+    def scratch_file(self) -> int:
+        return self.file(self.probe_folder)
+    
+    def scratch_folder(self) -> int:
+        """A folder whose subfolders and files grow with the seeded tree."""
+        folder_id = self.folder("Scratch", None)
+        for _ in range(self.roots):
+            sub = self.folder("Scratch child", folder_id)
+            for target in (folder_id, sub, self.folder("Scratch leaf", sub)):
+                self.file(target)
+        return folder_id
+    
+    def failed_job(self) -> int:
+        from app.models.job import Job
+        job = Job(kind="file_index", key=self.unique("budget-job"), payload={}, status="failed", attempts=5)
+        self.db.add(job)
+        self.db.commit()
+        return job.id
+    
+    def scratch_image(self) -> str:
+        from app.core.config import get_settings
+        name = f"{self.unique('budget')}.gif"
+        os.makedirs(get_settings().UPLOAD_DIR, exist_ok=True)
+        with open(os.path.join(get_settings().UPLOAD_DIR, name), "wb") as f:
+            f.write(b"GIF89a")
+        return name
+
+
+def path_values(seed: Seed, report_id: str) -> dict:
+    from app.services import link_service, markdown_service
+    path_file = markdown_service.get_file_by_id(seed.db, seed.path_file or seed.probe_file)
+    return {
+        "file_id": seed.probe_file,
+        "folder_id": seed.probe_folder,
+        "file_path:path": link_service.file_path(seed.db, path_file),
+        "anchor": "setup",
+        "number": 1,
+        "report_id": report_id,
+        "page:int": 1,
+    }
+
+
+def clear_caches() -> None:
+    from app.services import auth_service, download_service, feed_service, suggest_service
+    auth_service.token_cache.clear()
+    auth_service.user_cache.clear()
+    download_service.encoded_bodies.clear()
+    feed_service.invalidate()
+    suggest_service.invalidate()
+
+
+def measure_all(client, seed: Seed, auth: dict, counter: list, report_id: str, routes=None) -> dict:
+    """Statement count (or an error string) per (method, route), for `routes` or all of BUDGETS."""
+    results = {}
+    for (method, route), budget in BUDGETS.items():
+        if routes is not None and (method, route) not in routes:
+            continue
+        values = path_values(seed, report_id)
+        request = {"params": budget.params, "json": budget.json, "data": budget.data}
+        if budget.files:
+            request["files"] = budget.files()
+        if budget.setup:
+            extra = budget.setup(seed)
+            request["json"] = extra.pop("json", request["json"])
+            values.update(extra)
+        url = route
+        for name, value in values.items():
+            url = url.replace("{" + name + "}", str(value))
+        
+        seed.db.expire_all()
+        clear_caches()
+        before = counter[0]
+        response = client.request(
+            method, url, headers=None if budget.anonymous else auth, follow_redirects=False,
+            **{key: value for key, value in request.items() if value is not None}
+        )
+        count = counter[0] - before
+        results[(method, route)] = count if response.status_code < 400 else f"HTTP {response.status_code}"
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--roots", type=int, default=2, help="folder trees seeded in the first round")
+    parser.add_argument("--files", type=int, default=2, help="files per folder")
+    parser.add_argument("--grow", type=int, default=3, help="the second round adds this many times the first")
+    parser.add_argument("--depth", type=int, default=4, help="folder depth of the deep file for path routes")
+    parser.add_argument("--verbose", action="store_true", help="print every route, not just failures")
+    args = parser.parse_args()
+    
+    scratch = tempfile.mkdtemp(prefix="cms-bench-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{scratch}/bench.db"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ["UPLOAD_DIR"] = os.path.join(scratch, "uploads")
+    os.environ["PROFILE_DIR"] = os.path.join(scratch, "profiles")
+    # Budgets are for the handlers; admission and login throttling stay out of the way
+    os.environ["ADMISSION_ENABLED"] = "False"
+    os.environ["LOGIN_FREE_ATTEMPTS"] = "1000000"
+    # The change listener queries from its own thread, which the counter can't tell apart
+    os.environ["CHANGE_LISTENER_ENABLED"] = "False"
+    # Writes queue their jobs as in production, but no thread here runs them
+    os.environ["JOB_WORKERS"] = "0"
+    
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from app.main import app
+    from app.core.security import create_access_token
+    from app.db.database import SessionLocal, engine, init_db
+    from app.schemas.user import UserCreate
+    from app.services import feed_service
+    from app.services.auth_service import create_user
+    
+    # Small sitemap pages, so the seeded files split into /sitemap-N.xml pages
+    feed_service.SITEMAP_MAX_URLS = 10
+    
+    init_db()
+    db = SessionLocal()
+    create_user(db, UserCreate(username="budget", password="budget-password"))
+    auth = {"Authorization": f"Bearer {create_access_token({'sub': 'budget'})}"}
+    
+    counter = [0]
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*_):
+        counter[0] += 1
+    
+    declared = set(BUDGETS)
+    missing = sorted(
+        (method, route.path)
+        for route in app.routes
+        for method in sorted(getattr(route, "methods", None) or ())
+        if method != "HEAD" and (method, route.path) not in declared
+    )
+    
+    seed = Seed(db)
+    rounds = []
+    with TestClient(app) as client:
+        # A stored profile for the profile report routes
+        report_id = client.get("/health", headers={**auth, "X-Profile": "1"}).headers["x-profile-id"]
+        for roots in (args.roots, args.roots * args.grow):
+            seed.grow(roots, args.files, revisions=roots * 2)
+            rounds.append(measure_all(client, seed, auth, counter, report_id))
+        path_routes = {key for key in BUDGETS if "{file_path:path}" in key[1]}
+        depths = {}
+        for depth in (0, args.depth):
+            seed.path_file = seed.file_at_depth(depth)
+            depths[depth] = measure_all(client, seed, auth, counter, report_id, routes=path_routes)
+    db.close()
+    
+    failures = 0
+    print(f"{'route':<62} {'budget':>6} {'small':>8} {'large':>8}")
+    for (method, route), budget in BUDGETS.items():
+        small, large = (result[(method, route)] for result in rounds)
+        problems = []
+        for count in (small, large):
+            if isinstance(count, str):
+                problems.append(count)
+            elif count > budget.queries:
+                problems.append("over budget")
+        if isinstance(small, int) and isinstance(large, int) and large > small:
+            problems.append("grows with rows")
+        if (method, route) in path_routes:
+            shallow, deep = depths[0][(method, route)], depths[args.depth][(method, route)]
+            problems.extend(count for count in (shallow, deep) if isinstance(count, str))
+            if isinstance(shallow, int) and isinstance(deep, int) and deep > shallow:
+                problems.append(f"grows with depth ({shallow} at depth 0, {deep} at depth {args.depth})")
+        problems = sorted(set(problems))
+        failures += bool(problems)
+        if problems or args.verbose:
+            print(f"{method + ' ' + route:<62} {budget.queries:>6} {small!s:>8} {large!s:>8}  {', '.join(problems)}")
+    for method, route in missing:
+        failures += 1
+        print(f"{method + ' ' + route:<62} {'-':>6} {'':>8} {'':>8}  no budget declared")
+    
+    print(f"\n{len(BUDGETS)} routes, {failures} failing")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
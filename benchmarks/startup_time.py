@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Worker cold start time, with a budget check for CI.
+
+Starts fresh interpreters that import the app, run its startup handlers
+and serve one request through a test client, and reports the startup
+phases from app/core/startup.py. The first start creates the scratch
+database; later starts should find the schema fingerprint current and
+skip schema creation. One more start under `python -X importtime` lists
+the slowest imports.
+
+Exits with status 1 if the median time to the first response exceeds
+`--max-seconds`, if a warm start checked the schema, or if a module that
+should load lazily (see LAZY_MODULES) was imported during startup.
+
+Usage:
+    python -m benchmarks.startup_time --runs 5 --max-seconds 2.5
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Heavy modules only needed by rare requests; they must not load at startup
+LAZY_MODULES = ("weasyprint",)
+
+CHILD = """
+import json, sys
+from app.core import startup
+from app.main import app
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    client.get("/health").raise_for_status()
+report = startup.report()
+report["lazy_loaded"] = [name for name in {lazy!r} if name in sys.modules]
+print(json.dumps(report))
+"""
+
+
+def start_worker(env: dict, importtime: bool = False) -> tuple[dict, float, str]:
+    """(startup report, wall seconds, stderr) of one fresh interpreter."""
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + [
+        "-c", CHILD.format(lazy=LAZY_MODULES)
+    ]
+    start = time.perf_counter()
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise SystemExit(f"Worker failed to start:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), wall, result.stderr
+
+
+def slowest_imports(stderr: str, limit: int) -> list[tuple[str, float, float]]:
+    """(module, self ms, cumulative ms) of app modules and top-level packages, by cumulative time."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if depth == 0 or name.startswith("app."):
+            rows.append((name, int(own) / 1000, int(cumulative) / 1000))
+    return sorted(rows, key=lambda row: row[2], reverse=True)[:limit]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="warm starts to time")
+    parser.add_argument("--max-seconds", type=float, default=2.5,
+                        help="budget for the median time from app import to first response")
+    parser.add_argument("--imports", type=int, default=15, help="slowest imports to list")
+    args = parser.parse_args()
+    
+    scratch = tempfile.mkdtemp(prefix="cms-startup-")
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{scratch}/bench.db",
+        "SECRET_KEY": os.environ.get("SECRET_KEY", "benchmark"),
+        "UPLOAD_DIR": os.path.join(scratch, "uploads"),
+        "PROFILE_DIR": os.path.join(scratch, "profiles"),
+    }
+    
+    cold, cold_wall, _ = start_worker(env)
+    warm = [start_worker(env) for _ in range(args.runs)]
+    _, _, importtime = start_worker(env, importtime=True)
+    
+    phases = [key for key, value in cold.items() if isinstance(value, float) and key != "before_app_import"]
+    print(f"{'phase (s)':<22} {'cold':>8} {'warm median':>12}")
+    for phase in phases:
+        values = [report[phase] for report, _, _ in warm if report.get(phase) is not None]
+        print(f"{phase:<22} {cold[phase]:>8.3f} {statistics.median(values) if values else float('nan'):>12.3f}")
+    print(f"{'process wall time':<22} {cold_wall:>8.3f} {statistics.median(wall for _, wall, _ in warm):>12.3f}")
+    
+    print(f"\n{'slowest imports':<40} {'self ms':>9} {'total ms':>9}")
+    for name, own, cumulative in slowest_imports(importtime, args.imports):
+        print(f"{name:<40} {own:>9.1f} {cumulative:>9.1f}")
+    
+    failures = []
+    first_response = statistics.median(report["first_request"] for report, _, _ in warm)
+    if first_response > args.max_seconds:
+        failures.append(f"median time to first response {first_response:.3f}s exceeds {args.max_seconds:.3f}s")
+    if any(report.get("schema_checked") for report, _, _ in warm):
+        failures.append("a warm start checked the schema although its fingerprint was current")
+    lazy = sorted({name for report in [cold] + [report for report, _, _ in warm] for name in report["lazy_loaded"]})
+    if lazy:
+        failures.append(f"imported during startup: {', '.join(lazy)}")
+    
+    print()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print(f"OK: median time to first response {first_response:.3f}s (budget {args.max_seconds:.3f}s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Scripted benchmark suite with JSON results and baseline comparison.
+
+Runs each scenario against a synthetic corpus (see benchmarks/corpus.py)
+through a test client. Each scenario is warmed up first and then timed
+over `--runs` requests. The report has median, p95, min and mean
+latency, the SQL statements per request and the response size. Scenarios:
+
+    home                  GET /
+    view_file_depth_N     GET /files/... for a document N folders deep
+    api_files             GET /api/files
+    admin_files           GET /api/admin/files
+    pdf_download          GET /api/files/download/{id}/pdf
+    upload                POST /api/admin/files/upload (a size_kb document)
+    archive_tree          PATCH /api/admin/folders/{id}/archive on a root folder chain
+
+`--output` writes the results as JSON. `--baseline` compares them with an
+earlier output and exits with status 1 if any median regressed by more
+than `--threshold` (relative) and `--min-delta-ms` (absolute). Both
+files must come from the same corpus arguments. `--corpus` reuses a
+directory made by benchmarks.corpus; it is copied first, because upload
+and archive change it. benchmarks/baseline.json was recorded on the
+corpus in benchmarks/reference_corpus.json (`--spec`); its timings are
+only comparable on similar hardware.
+
+Usage:
+    python -m benchmarks.suite --spec benchmarks/reference_corpus.json --runs 20 --baseline benchmarks/baseline.json
+    python -m benchmarks.suite --files 300 --output baseline.json
+    python -m benchmarks.suite --files 300 --baseline baseline.json
+    python -m benchmarks.suite --corpus /tmp/corpus --only home,api_files
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable
+
+from benchmarks import corpus as corpus_module
+
+
+@dataclass
+class Context:
+    client: object
+    corpus: corpus_module.Corpus
+    auth: dict
+    upload_body: bytes
+
+
+@dataclass
+class Scenario:
+    name: str
+    request: Callable[[Context], object]  # issues one request, returns the response
+    # Requests whose effect must be undone afterwards, e.g. archive toggles
+    after: Callable[[Context, int], None] = lambda ctx, requests: None
+
+
+def _archive_target(ctx: Context) -> int:
+    return ctx.corpus.root_folder_ids[0]
+
+
+def _restore_archive(ctx: Context, requests: int) -> None:
+    # Each request toggles; an odd number leaves the tree archived
+    if requests % 2:
+        ctx.client.patch(f"/api/admin/folders/{_archive_target(ctx)}/archive", headers=ctx.auth).raise_for_status()
+
+
+def build_scenarios(corpus: corpus_module.Corpus) -> list[Scenario]:
+    scenarios = [Scenario("home", lambda ctx: ctx.client.get("/"))]
+    for depth, path in sorted(corpus.paths_by_depth.items()):
+        scenarios.append(Scenario(f"view_file_depth_{depth}", lambda ctx, path=path: ctx.client.get(f"/files/{path}")))
+    scenarios += [
+        Scenario("api_files", lambda ctx: ctx.client.get("/api/files")),
+        Scenario("admin_files", lambda ctx: ctx.client.get("/api/admin/files", headers=ctx.auth)),
+        Scenario("pdf_download", lambda ctx: ctx.client.get(
+            f"/api/files/download/{ctx.corpus.file_ids[-1]}/pdf"
+        )),
+        Scenario("upload", lambda ctx: ctx.client.post(
+            "/api/admin/files/upload",
+            files={"file": ("Bench upload.md", ctx.upload_body, "text/markdown")},
+            headers=ctx.auth,
+        )),
+    ]
+    if corpus.root_folder_ids:
+        scenarios.append(Scenario(
+            "archive_tree",
+            lambda ctx: ctx.client.patch(f"/api/admin/folders/{_archive_target(ctx)}/archive", headers=ctx.auth),
+            after=_restore_archive,
+        ))
+    return scenarios
+
+
+def run_scenario(ctx: Context, scenario: Scenario, runs: int, warmup: int, statements: list) -> dict:
+    timings = []
+    queries = []
+    size = 0
+    for n in range(warmup + runs):
+        before = statements[0]
+        start = time.perf_counter()
+        response = scenario.request(ctx)
+        elapsed = time.perf_counter() - start
+        response.raise_for_status()
+        if n >= warmup:
+            timings.append(elapsed)
+            queries.append(statements[0] - before)
+            size = len(response.content)
+    scenario.after(ctx, warmup + runs)
+    timings.sort()
+    return {
+        "runs": runs,
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[min(int(len(timings) * 0.95), len(timings) - 1)] * 1000, 3),
+        "min_ms": round(timings[0] * 1000, 3),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 3),
+        "queries": max(queries),
+        "bytes": size,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list[tuple[str, str, str]]:
+    """(scenario, verdict, detail) rows; the verdict is regression, improved, ok, new or missing."""
+    rows = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            rows.append((name, "new", f"{result['median_ms']:.1f} ms"))
+            continue
+        delta = result["median_ms"] - previous["median_ms"]
+        ratio = delta / previous["median_ms"] if previous["median_ms"] else 0.0
+        detail = f"{previous['median_ms']:.1f} -> {result['median_ms']:.1f} ms ({ratio:+.0%})"
+        if result["queries"] != previous["queries"]:
+            detail += f", queries {previous['queries']} -> {result['queries']}"
+        if abs(delta) >= min_delta_ms and abs(ratio) > threshold:
+            rows.append((name, "regression" if delta > 0 else "improved", detail))
+        else:
+            rows.append((name, "ok", detail))
+    rows.extend((name, "missing", "not run") for name in baseline if name not in results)
+    return rows
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", help="directory made by benchmarks.corpus (copied; default: generate one)")
+    corpus_module.add_arguments(parser)
+    parser.add_argument("--runs", type=int, default=10, help="timed requests per scenario")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed requests per scenario")
+    parser.add_argument("--only", help="comma-separated scenario names")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative median slowdown that fails")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="smaller median changes never fail")
+    args = parser.parse_args()
+    
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    
+    scratch = tempfile.mkdtemp(prefix="cms-suite-")
+    if args.corpus:
+        directory = os.path.join(scratch, "corpus")
+        shutil.copytree(args.corpus, directory)
+        corpus = corpus_module.load(directory)
+    else:
+        directory = scratch
+        corpus = None
+    spec = asdict(corpus.spec if corpus else corpus_module.spec_from_args(args))
+    if baseline is not None and baseline["corpus"] != spec:
+        print(f"Baseline corpus {baseline['corpus']} differs from this run's {spec}", file=sys.stderr)
+        shutil.rmtree(scratch, ignore_errors=True)
+        return 2
+    corpus_module.configure(directory)
+    if corpus is None:
+        print(f"Generating corpus in {directory} ...", file=sys.stderr)
+        corpus = corpus_module.generate(corpus_module.spec_from_args(args), directory)
+    
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from app.main import app
+    from app.core.security import create_access_token
+    from app.db.database import SessionLocal, engine
+    from app.schemas.user import UserCreate
+    from app.services.auth_service import create_user
+    
+    db = SessionLocal()
+    try:
+        create_user(db, UserCreate(username="bench", password="benchmark"))
+    finally:
+        db.close()
+    
+    statements = [0]
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*_):
+        statements[0] += 1
+    
+    scenarios = build_scenarios(corpus)
+    if args.only:
+        wanted = set(args.only.split(","))
+        unknown = wanted - {scenario.name for scenario in scenarios}
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+        scenarios = [scenario for scenario in scenarios if scenario.name in wanted]
+    
+    upload_body = corpus_module.make_document(
+        random.Random(corpus.spec.seed), 0, corpus.spec, corpus.images
+    ).encode("utf-8")
+    results = {}
+    with TestClient(app) as client:
+        ctx = Context(client, corpus, {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}, upload_body)
+        for scenario in scenarios:
+            results[scenario.name] = run_scenario(ctx, scenario, args.runs, args.warmup, statements)
+    shutil.rmtree(scratch, ignore_errors=True)
+    
+    report = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": spec,
+        "runs": args.runs,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    
+    print(f"{'scenario':<22} {'median ms':>10} {'p95 ms':>10} {'queries':>8} {'bytes':>10}")
+    for name, result in results.items():
+        print(f"{name:<22} {result['median_ms']:>10.1f} {result['p95_ms']:>10.1f} "
+              f"{result['queries']:>8} {result['bytes']:>10}")
+    
+    if baseline is None:
+        return 0
+    rows = compare(results, baseline["results"], args.threshold, args.min_delta_ms)
+    print(f"\nAgainst baseline {args.baseline} (revision {baseline.get('revision')}):")
+    for name, verdict, detail in rows:
+        print(f"{name:<22} {verdict:<11} {detail}")
+    return 1 if any(verdict == "regression" for _, verdict, _ in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""Maintenance commands for the markdown CMS.
+
+Usage:
+    python manage.py migrate
+    python manage.py rebuild-search
+    python manage.py backfill-metadata
+    python manage.py backfill-sections
+    python manage.py backfill-links
+    python manage.py broken-links
+    python manage.py compact-revisions
+    python manage.py compress-content
+    python manage.py blob-migrate
+    python manage.py blob-check
+    python manage.py blob-gc
+    python manage.py export-static --output site
+    python manage.py run-jobs [--forever]
+"""
+
+import argparse
+import sys
+from app.db.database import SessionLocal, init_db
+
+
+def migrate(args):
+    """Create missing tables, columns and indexes even if the schema fingerprint is current."""
+    init_db(force=True)
+    print("✓ Schema is up to date")
+    return 0
+
+
+def rebuild_search(args):
+    """Rebuild the full-text search index from existing files."""
+    from app.services import search_service
+    
+    db = SessionLocal()
+    try:
+        if not search_service.is_enabled(db):
+            print("❌ Full-text search requires an SQLite database")
+            return 1
+        print("Rebuilding search index...")
+        count = search_service.rebuild_index(db, batch_size=args.batch_size)
+        print(f"✓ Indexed {count} file(s)")
+        return 0
+    finally:
+        db.close()
+
+
+def backfill_metadata(args):
+    """Extract front matter tags and metadata for existing files."""
+    from app.services import metadata_service
+    
+    db = SessionLocal()
+    try:
+        print("Extracting front matter metadata...")
+        count = metadata_service.backfill(db, batch_size=args.batch_size)
+        print(f"✓ Processed {count} file(s)")
+        return 0
+    finally:
+        db.close()
+
+
+def backfill_sections(args):
+    """Build the heading/section index for existing files."""
+    from app.services import section_service
+    
+    db = SessionLocal()
+    try:
+        print("Indexing sections...")
+        count = section_service.backfill(db, batch_size=args.batch_size)
+        print(f"✓ Processed {count} file(s)")
+        return 0
+    finally:
+        db.close()
+
+
+def backfill_links(args):
+    """Extract and resolve internal links of existing files."""
+    from app.services import link_service
+    
+    db = SessionLocal()
+    try:
+        print("Indexing internal links...")
+        count = link_service.backfill(db, batch_size=args.batch_size)
+        print(f"✓ Processed {count} file(s)")
+        return 0
+    finally:
+        db.close()
+
+
+def broken_links(args):
+    """List internal links whose target does not exist."""
+    from app.services import link_service
+    
+    db = SessionLocal()
+    try:
+        links = link_service.get_broken_links(db)
+        for link in links:
+            print(f"❌ {link.source_path}: {link.href} (no file at {link.target_path})")
+        if not links:
+            print("✓ No broken links")
+        return 1 if links else 0
+    finally:
+        db.close()
+
+
+def compact_revisions(args):
+    """Thin out old revisions, keeping recent ones and one per day before that."""
+    from app.services import revision_service
+    
+    db = SessionLocal()
+    try:
+        print("Compacting revision history...")
+        files, removed = revision_service.compact_all(db, keep_recent=args.keep_recent)
+        print(f"✓ Removed {removed} revision(s) from {files} file(s)")
+        return 0
+    finally:
+        db.close()
+
+
+def compress_content(args):
+    """Re-store existing content using the configured compression settings."""
+    from app.core.config import get_settings
+    from app.db.database import engine
+    from app.services import markdown_service
+    
+    settings = get_settings()
+    db = SessionLocal()
+    try:
+        print(f"Compression: {settings.CONTENT_COMPRESSION} "
+              f"(threshold {settings.CONTENT_COMPRESSION_THRESHOLD} bytes)")
+        before = markdown_service.stored_content_size(db)
+        count = markdown_service.rewrite_content(db, batch_size=args.batch_size)
+        after = markdown_service.stored_content_size(db)
+        print(f"✓ Rewrote {count} file(s): {before / 1024 / 1024:.1f} MB -> {after / 1024 / 1024:.1f} MB")
+        if args.vacuum:
+            print("Reclaiming free space (VACUUM)...")
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.exec_driver_sql("VACUUM")
+            print("✓ Done")
+        return 0
+    finally:
+        db.close()
+
+
+def blob_migrate(args):
+    """Move bodies between rows and the blob store per CONTENT_INLINE_MAX and fill in hashes."""
+    from app.services import storage_service
+    
+    db = SessionLocal()
+    try:
+        print("Migrating content storage...")
+        count = storage_service.migrate(db, batch_size=args.batch_size)
+        print(f"✓ Processed {count} file(s)")
+        return 0
+    finally:
+        db.close()
+
+
+def blob_check(args):
+    """Check that stored bodies exist and match their content hashes."""
+    from app.services import storage_service
+    
+    db = SessionLocal()
+    try:
+        print("Checking content storage...")
+        report = storage_service.check(db, verify_inline=args.verify_inline)
+        print(f"Checked {report.checked} file(s)")
+        for file_id in report.missing:
+            print(f"❌ File {file_id}: blob missing")
+        for file_id in report.corrupt:
+            print(f"❌ File {file_id}: content does not match its hash")
+        if report.ok:
+            print("✓ Content storage is consistent")
+            return 0
+        return 1
+    finally:
+        db.close()
+
+
+def blob_gc(args):
+    """Delete blobs that no file references."""
+    from app.services import storage_service
+    
+    db = SessionLocal()
+    try:
+        print("Collecting unreferenced blobs...")
+        deleted = storage_service.garbage_collect(db, grace_seconds=args.grace_seconds)
+        print(f"✓ Deleted {len(deleted)} blob(s)")
+        return 0
+    finally:
+        db.close()
+
+
+def export_static(args):
+    """Render active documents to static HTML, rebuilding only changed pages."""
+    from app.services import export_service
+    
+    db = SessionLocal()
+    try:
+        print(f"Exporting to {args.output}...")
+        result = export_service.export_site(db, args.output, workers=args.workers, force=args.force)
+        print(
+            f"✓ Rendered {result.rendered}, unchanged {result.unchanged}, "
+            f"removed {result.removed} page(s) in {result.seconds:.1f}s"
+        )
+        return 0
+    finally:
+        db.close()
+
+
+def run_jobs(args):
+    """Run queued background jobs until none is due, or keep running them with --forever."""
+    import time
+    # Importing the services that queue jobs registers their handlers
+    from app.services import download_service, job_service, markdown_service
+    
+    if args.forever:
+        runner = job_service.JobRunner(args.workers, job_service.settings.JOB_POLL_INTERVAL)
+        print(f"Running jobs with {args.workers} thread(s); Ctrl+C to stop")
+        runner.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            runner.stop()
+        print(f"✓ Ran {runner.processed} job(s)")
+        return 0
+    
+    db = SessionLocal()
+    try:
+        count = job_service.run_pending(db)
+        failed = job_service.status(db, job_service.FAILED, limit=1)["counts"][job_service.FAILED]
+        print(f"✓ Ran {count} job(s)")
+        if failed:
+            print(f"❌ Failed jobs: {', '.join(f'{kind} ({n})' for kind, n in sorted(failed.items()))}")
+        return 0
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FastAPI Markdown CMS maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    command = commands.add_parser("migrate", help=migrate.__doc__)
+    command.set_defaults(handler=migrate)
+    
+    command = commands.add_parser("rebuild-search", help=rebuild_search.__doc__)
+    command.add_argument("--batch-size", type=int, default=500)
+    command.set_defaults(handler=rebuild_search)
+    
+    command = commands.add_parser("backfill-metadata", help=backfill_metadata.__doc__)
+    command.add_argument("--batch-size", type=int, default=500)
+    command.set_defaults(handler=backfill_metadata)
+    
+    command = commands.add_parser("backfill-sections", help=backfill_sections.__doc__)
+    command.add_argument("--batch-size", type=int, default=500)
+    command.set_defaults(handler=backfill_sections)
+    
+    command = commands.add_parser("backfill-links", help=backfill_links.__doc__)
+    command.add_argument("--batch-size", type=int, default=500)
+    command.set_defaults(handler=backfill_links)
+    
+    command = commands.add_parser("broken-links", help=broken_links.__doc__)
+    command.set_defaults(handler=broken_links)
+    
+    command = commands.add_parser("compact-revisions", help=compact_revisions.__doc__)
+    command.add_argument("--keep-recent", type=int, default=None)
+    command.set_defaults(handler=compact_revisions)
+    
+    command = commands.add_parser("compress-content", help=compress_content.__doc__)
+    command.add_argument("--batch-size", type=int, default=200)
+    command.add_argument("--vacuum", action="store_true", help="shrink the database file afterwards")
+    command.set_defaults(handler=compress_content)
+    
+    command = commands.add_parser("blob-migrate", help=blob_migrate.__doc__)
+    command.add_argument("--batch-size", type=int, default=200)
+    command.set_defaults(handler=blob_migrate)
+    
+    command = commands.add_parser("blob-check", help=blob_check.__doc__)
+    command.add_argument("--verify-inline", action="store_true", help="also verify hashes of inline bodies")
+    command.set_defaults(handler=blob_check)
+    
+    command = commands.add_parser("blob-gc", help=blob_gc.__doc__)
+    command.add_argument("--grace-seconds", type=float, default=3600,
+                         help="keep blobs written more recently than this")
+    command.set_defaults(handler=blob_gc)
+    
+    command = commands.add_parser("export-static", help=export_static.__doc__)
+    command.add_argument("--output", default="site", help="output directory")
+    command.add_argument("--workers", type=int, default=None, help="render processes (default: CPU count)")
+    command.add_argument("--force", action="store_true", help="render every page, not only those the build manifest marks as changed")
+    command.set_defaults(handler=export_static)
+    
+    command = commands.add_parser("run-jobs", help=run_jobs.__doc__)
+    command.add_argument("--forever", action="store_true", help="keep polling for jobs, e.g. as a worker process")
+    command.add_argument("--workers", type=int, default=2, help="threads running jobs with --forever")
+    command.set_defaults(handler=run_jobs)
+    
+    args = parser.parse_args()
+    init_db()
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())